@@ -8,6 +8,7 @@ class CustomUserAdmin(UserAdmin):
     model = User
 
     list_display = ("username", "email", "role", "is_staff", "is_superuser")
+    list_select_related = ("role",)
 
     fieldsets = UserAdmin.fieldsets + (
         ("Custom fields", {"fields": ("role",)}),
@@ -23,4 +23,4 @@ class AccountsConfig(AppConfig):
             )
 
         # Connect the handler so it runs after migrations for this app
-        post_migrate.connect(configure_site, sender=self)
\ No newline at end of file
+        post_migrate.connect(configure_site, sender=self)
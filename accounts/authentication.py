@@ -0,0 +1,66 @@
+"""
+JWT authentication for plain (non-DRF) Django views, e.g. async streaming views.
+
+Performs the same checks as permissions.IsAuthenticatedWithValidToken:
+token present, signed by backend, not expired, user exists and is active.
+
+Roles are a handful of rows that practically never change, so they are read from the
+shared catalog snapshot (api.catalog) and attached to the authenticated user - the role
+permission checks (request.user.role) then need no extra query per request.
+"""
+
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+
+def cached_role(role_id):
+    from api.catalog import role
+
+    return role(role_id)
+
+
+def attach_role(user):
+    """Set ``user.role`` from the catalog snapshot so accessing it does not hit the DB."""
+    role = cached_role(user.role_id)
+    if role is not None:
+        type(user).role.field.set_cached_value(user, role)
+    return user
+
+
+class CachedRoleJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication whose user comes with the role from the catalog snapshot."""
+
+    def get_user(self, validated_token):
+        return attach_role(super().get_user(validated_token))
+
+
+def authenticate_jwt(request, allow_query_token=False):
+    """
+    Return the user for the Bearer token of a Django HttpRequest.
+
+    ``allow_query_token`` also accepts ``?token=<jwt>`` - browser EventSource
+    cannot send an Authorization header.
+    Raises AuthenticationFailed when the token is missing or invalid.
+    """
+    auth_header = request.META.get("HTTP_AUTHORIZATION", "")
+    if auth_header.startswith("Bearer "):
+        raw_token = auth_header.split(" ", 1)[1]
+    elif allow_query_token and request.GET.get("token"):
+        raw_token = request.GET["token"]
+    else:
+        raise AuthenticationFailed({
+            "detail": "Authentication credentials were not provided.",
+            "code": "no_token"
+        })
+
+    authentication = CachedRoleJWTAuthentication()
+    try:
+        validated_token = authentication.get_validated_token(raw_token.encode())
+    except (InvalidToken, TokenError) as e:
+        raise AuthenticationFailed({
+            "detail": f"Token is invalid: {str(e)}",
+            "code": "invalid_token"
+        })
+
+    return authentication.get_user(validated_token)
@@ -1,15 +1,16 @@
 from rest_framework import serializers
 from .models import User, Role
+from .sparse_fields import SparseFieldsMixin
 
 # na konvertnutie json dat do django modelu a naopak cca
 
-class RoleSerializer(serializers.ModelSerializer):
+class RoleSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Role
         fields = ["id", "name", "description"]
         read_only_fields = ["id"]
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     
     class Meta:
         model = User
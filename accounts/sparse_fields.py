@@ -0,0 +1,87 @@
+"""
+Sparse fieldsets pre zoznamové endpointy: ``?fields=id,name`` alebo ``?exclude=description``.
+
+View si parametre načíta (requested_fields), zúži queryset (sparse_queryset -> only() len so
+stĺpcami, ktoré vybrané polia čítajú, a select_related len pre vzťahy, ktoré ešte treba) a vybrané
+polia pošle serializéru v kontexte ``{"fields": ...}``. Serializér ostatné polia vyhodí už v
+get_fields(), takže nevyžiadané SerializerMethodField ani vnorené serializéry sa vôbec nepočítajú.
+
+Platí len pre koreňový serializér - vnorené serializéry (napr. activity v activity_slot) ostávajú celé.
+"""
+
+from rest_framework import serializers
+
+
+def _split(value):
+    return [name.strip() for name in (value or "").split(",") if name.strip()]
+
+
+def _select_related_paths(select_related, prefix=""):
+    """Flatten Query.select_related ({"a": {"b": {}}}) into ["a", "a__b"]."""
+    if not isinstance(select_related, dict):
+        return []
+    paths = []
+    for name, nested in select_related.items():
+        path = f"{prefix}{name}"
+        paths.append(path)
+        paths.extend(_select_related_paths(nested, f"{path}__"))
+    return paths
+
+
+class SparseFieldsMixin:
+    # pole serializera -> polia modelu, ktore cita (pre SerializerMethodField a polia so source="*")
+    sparse_sources = {}
+
+    _available_fields = None
+
+    @classmethod
+    def available_fields(cls):
+        if cls.__dict__.get("_available_fields") is None:
+            cls._available_fields = list(cls().fields)
+        return cls._available_fields
+
+    @classmethod
+    def requested_fields(cls, params):
+        """
+        Field names selected by ``?fields=`` / ``?exclude=`` in serializer order, None when
+        neither is given. Raises ValueError for unknown names.
+        """
+        fields, exclude = _split(params.get("fields")), _split(params.get("exclude"))
+        if not fields and not exclude:
+            return None
+        available = cls.available_fields()
+        unknown = [name for name in fields + exclude if name not in available]
+        if unknown:
+            raise ValueError(f"Neznáme polia: {', '.join(unknown)}. Dostupné sú: {', '.join(available)}.")
+        return [name for name in available if (not fields or name in fields) and name not in exclude]
+
+    @classmethod
+    def sparse_queryset(cls, queryset, selected):
+        """Load only the columns (and joins) the selected fields read."""
+        if selected is None:
+            return queryset
+        model = queryset.model
+        concrete = {field.name for field in model._meta.concrete_fields}
+        fields = cls().fields
+        columns = {model._meta.pk.name}
+        for name in selected:
+            sources = cls.sparse_sources.get(name)
+            if sources is None:
+                source = fields[name].source
+                sources = () if source == "*" else (source.split(".")[0],)
+            columns.update(source for source in sources if source in concrete)
+
+        related = [path for path in _select_related_paths(queryset.query.select_related) if path.split("__")[0] in columns]
+        queryset = queryset.select_related(None)
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.only(*columns)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selected = self.context.get("fields")
+        root = self.root
+        is_root = self is root or (isinstance(self.parent, serializers.ListSerializer) and self.parent is root)
+        if selected is None or not is_root:
+            return fields
+        return {name: field for name, field in fields.items() if name in selected}
@@ -1,3 +1,35 @@
-from django.test import TestCase
+from django.core import mail
+from django.test import TestCase, override_settings
 
-# Create your tests here.
+from jobs.models import Job
+from jobs.queue import run_jobs
+
+from .models import User
+
+
+@override_settings(
+    EMAIL_BACKEND="jobs.backends.QueuedEmailBackend",
+    JOBS_EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+)
+class ResetPasswordTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="student", email="student@kp.sk", password="heslo")
+
+    def test_reset_mail_is_queued_and_sent_by_worker(self):
+        response = self.client.post("/api/accounts/reset_password/", {"email": "student@kp.sk"}, content_type="application/json")
+
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(Job.objects.filter(task="jobs.send_email", status=Job.Status.PENDING).count(), 1)
+
+        self.assertEqual(run_jobs(), 1)
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["student@kp.sk"])
+        self.assertIn("reset-password-confirm/?uid=", mail.outbox[0].body)
+
+    def test_unknown_email_queues_nothing(self):
+        response = self.client.post("/api/accounts/reset_password/", {"email": "nikto@kp.sk"}, content_type="application/json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Job.objects.exists())
@@ -11,7 +11,6 @@ from djoser.views import UserViewSet
 from .models import User, Role
 from .serializer import UserSerializer, RoleSerializer
 from .permissions import IsAuthenticatedWithValidToken
-from .ms_graph import MicrosoftGraphClient
 import logging
 
 logger = logging.getLogger(__name__)
@@ -328,6 +327,9 @@ def get_microsoft_users(request):
     Returns:
         JSON response with list of users from Microsoft Graph
     """
+    # MS Graph klient (requests) sa nacita az pri pouziti, nie pri starte workera
+    from .ms_graph import MicrosoftGraphClient
+
     try:
         graph_client = MicrosoftGraphClient()
         
@@ -386,6 +388,9 @@ def get_microsoft_user_by_id(request, user_id):
     Returns:
         JSON response with user details
     """
+    # MS Graph klient (requests) sa nacita az pri pouziti, nie pri starte workera
+    from .ms_graph import MicrosoftGraphClient
+
     try:
         graph_client = MicrosoftGraphClient()
         
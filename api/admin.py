@@ -1,24 +1,180 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.admin import ModelAdmin
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.html import format_html
+
 from .models import Activity, ActivitySlot, Reservation
+from .reservations import bulk_change_status
+from .search import is_supported as search_is_supported, search_activity_ids
 
 # registracia modelov, aby sa dali spravovat cez django admin panel
 
-class ActivityAdmin(ModelAdmin):
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator, ktorý nerobí COUNT(*) cez celú tabuľku.
+
+    Počíta sa najviac COUNT_LIMIT riadkov (COUNT nad poddotazom s LIMIT). Ak je ich menej, počet
+    je presný; inak sa pre nefiltrovaný zoznam použije odhad veľkosti tabuľky (PostgreSQL
+    pg_class.reltuples, inde MAX(id)) a pre filtrovaný zoznam sa stránkuje len po COUNT_LIMIT.
+    """
+
+    COUNT_LIMIT = 10_000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        capped = queryset.order_by()[:self.COUNT_LIMIT].count()
+        if capped < self.COUNT_LIMIT or queryset.query.has_filters():
+            return capped
+        return max(capped, self._table_estimate(queryset.model))
+
+    @staticmethod
+    def _table_estimate(model):
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [model._meta.db_table])
+            else:
+                cursor.execute(f"SELECT MAX({model._meta.pk.column}) FROM {model._meta.db_table}")
+            row = cursor.fetchone()
+        return int(row[0] or 0) if row else 0
+
+
+class FastChangeListAdmin(ModelAdmin):
+    """Spoločné nastavenia pre veľké tabuľky: odhad počtu, bez druhého COUNT(*) a bez facetov."""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+    list_per_page = 50
+    # stabilne poradie cez primarny kluc (aj pre autocomplete, ktory inak nema ordering)
+    ordering = ("-pk",)
+
+    # cez search index sa hlada nazov aktivity, ostatne polia len presnou zhodou (vyuziju unique/FK index);
+    # None = model nema vazbu na aktivitu
+    activity_lookup = None
+    exact_search_fields = ()
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term or (self.activity_lookup and not search_is_supported()):
+            return super().get_search_results(request, queryset, search_term)
+
+        condition = Q()
+        if term.isdigit():
+            condition |= Q(pk=int(term))
+        for field in self.exact_search_fields:
+            condition |= self._lookup(field, term)
+        if self.activity_lookup:
+            condition |= self._lookup(f"{self.activity_lookup}__in", search_activity_ids(term, limit=1000))
+        return queryset.filter(condition), False
+
+    def _lookup(self, lookup, value):
+        """
+        Lookup cez FK prepíše na ``fk_id IN (SELECT ...)``: OR podmienky potom zostanú
+        na stĺpcoch hlavnej tabuľky s indexom namiesto JOINu, ktorý vynúti scan celej tabuľky.
+        """
+        name, _, rest = lookup.partition("__")
+        field = self.model._meta.get_field(name)
+        if not rest or not field.is_relation or rest in ("in", "exact"):
+            return Q(**{lookup: value})
+        related = field.related_model._default_manager.filter(**{rest: value}).values("pk")
+        return Q(**{f"{field.attname}__in": related})
+
+
+class ActivityFilter(admin.SimpleListFilter):
+    """
+    Filter podľa aktivity bez načítania všetkých aktivít do bočného panelu.
+    V paneli je len práve vybraná aktivita, filter sa zapína odkazom v stĺpci aktivity.
+    """
+
+    title = "aktivita"
+    parameter_name = "activity"
+
+    def lookups(self, request, model_admin):
+        value = self.value()
+        if not value or not value.isdigit():
+            return ()
+        activity = Activity.objects.filter(pk=value).only("name").first()
+        return [(value, activity.name if activity else f"#{value}")]
+
+    def queryset(self, request, queryset):
+        value = self.value()
+        if value and value.isdigit():
+            return queryset.filter(**{self.field_path: value})
+        return queryset
+
+
+class ActivitySlotActivityFilter(ActivityFilter):
+    field_path = "activity_id"
+
+
+class ReservationActivityFilter(ActivityFilter):
+    field_path = "activity_slot__activity_id"
+
+
+class ActivityAdmin(FastChangeListAdmin):
     model = Activity
     list_display = ("name", "description", "capacity", "room", "category", "role", "color")
+    list_select_related = ("role",)
     search_fields = ("name", "description", "room", "category")
     list_filter = ("role", "category")
+    autocomplete_fields = ("created_by",)
+    activity_lookup = "id"
+    exact_search_fields = ("room", "category")
+
 
-class ActivitySlotAdmin(ModelAdmin):
+class ActivitySlotAdmin(FastChangeListAdmin):
     model = ActivitySlot
-    list_display = ("activity", "teacher", "start_date", "end_date")
+    list_display = ("activity_link", "teacher", "start_date", "end_date")
+    list_select_related = ("activity", "teacher")
     search_fields = ("activity__name", "teacher__username")
-class ReservationAdmin(ModelAdmin):
+    list_filter = (ActivitySlotActivityFilter,)
+    autocomplete_fields = ("activity", "teacher")
+    activity_lookup = "activity_id"
+    exact_search_fields = ("teacher__username",)
+
+    def get_queryset(self, request):
+        # __str__ slotu je nazov aktivity (autocomplete v ReservationAdmin)
+        return super().get_queryset(request).select_related("activity")
+
+    @admin.display(description="aktivita", ordering="activity__name")
+    def activity_link(self, obj):
+        return format_html('<a href="?activity={}">{}</a>', obj.activity_id, obj.activity.name)
+
+
+class ReservationAdmin(FastChangeListAdmin):
     model = Reservation
-    list_display = ("user", "activity_slot__activity", "status", "created_at", "activity_slot__start_date", "activity_slot__end_date")
+    list_display = ("user", "activity_link", "status", "created_at", "activity_slot__start_date", "activity_slot__end_date")
+    list_select_related = ("user", "activity_slot__activity")
     search_fields = ("user__username", "activity_slot__activity__name")
-    list_filter = ("status", "activity_slot__activity")
+    list_filter = ("status", ReservationActivityFilter)
+    autocomplete_fields = ("user", "activity_slot")
+    actions = ("approve_reservations", "cancel_reservations")
+    activity_lookup = "activity_slot__activity_id"
+    exact_search_fields = ("user__username", "user__email")
+
+    @admin.display(description="aktivita", ordering="activity_slot__activity__name")
+    def activity_link(self, obj):
+        return format_html('<a href="?activity={}">{}</a>', obj.activity_slot.activity_id, obj.activity_slot.activity.name)
+
+    # admin actions pouzivaju rovnaku logiku ako bulk endpoint (jeden UPDATE + kontrola prechodov statusu)
+    def _change_status(self, request, queryset, new_status):
+        results = bulk_change_status(new_status, ids=list(queryset.values_list("id", flat=True)))
+        updated = sum(1 for result in results.values() if result == "updated")
+        skipped = len(results) - updated
+        self.message_user(request, f"Zmenených rezervácií: {updated}, preskočených: {skipped}.", messages.SUCCESS)
+
+    @admin.action(description="Schváliť vybrané rezervácie")
+    def approve_reservations(self, request, queryset):
+        self._change_status(request, queryset, Reservation.Status.APPROVED)
+
+    @admin.action(description="Zrušiť vybrané rezervácie")
+    def cancel_reservations(self, request, queryset):
+        self._change_status(request, queryset, Reservation.Status.CANCELLED)
 
 
 admin.site.register(Activity, ActivityAdmin)
@@ -0,0 +1,109 @@
+"""
+Archivácia (hot/cold split) starých slotov a rezervácií.
+
+Sloty, ktoré skončili pred retenčným oknom (ARCHIVE_RETENTION_DAYS), sa spolu so svojimi
+rezerváciami presunú do tabuliek ArchivedActivitySlot / ArchivedReservation. Hlavné tabuľky
+(a ich indexy) tak obsahujú len aktuálne dáta a dotazy na budúce sloty / kontrolu kapacity
+nezávisia od toho, koľko rokov histórie sa nazbieralo. História sa číta z archívu
+(reservations/history/).
+
+Presun beží po dávkach slotov, každá dávka vo vlastnej krátkej transakcii. Mazanie z hlavných
+tabuliek beží so suppress_hooks(): nejde o zmazanie z pohľadu klientov (change log) ani
+štatistík (denné súhrny ostávajú).
+"""
+
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import ActivitySlot, ArchivedActivitySlot, ArchivedReservation, Reservation
+from .signals import suppress_hooks
+
+
+def retention_cutoff(days=None):
+    return timezone.now() - timedelta(days=settings.ARCHIVE_RETENTION_DAYS if days is None else days)
+
+
+def archive_batch(cutoff, batch_size=1000):
+    """Move up to ``batch_size`` slots that ended before ``cutoff`` with their reservations. Returns (slots, reservations)."""
+    with transaction.atomic():
+        # najstarsie sloty cez index api_slot_range_idx (end_date, start_date)
+        slot_ids = list(
+            ActivitySlot.objects.filter(end_date__lt=cutoff)
+            .order_by("end_date")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not slot_ids:
+            return 0, 0
+
+        slots = {
+            slot["id"]: slot
+            for slot in ActivitySlot.objects.filter(id__in=slot_ids).values("id", "activity_id", "teacher_id", "start_date", "end_date")
+        }
+        reservations = list(
+            Reservation.objects.filter(activity_slot_id__in=slot_ids)
+            .values("id", "user_id", "activity_slot_id", "note", "status", "created_at")
+        )
+
+        ArchivedActivitySlot.objects.bulk_create([ArchivedActivitySlot(**slot) for slot in slots.values()], batch_size=500)
+        ArchivedReservation.objects.bulk_create([
+            ArchivedReservation(
+                **reservation,
+                activity_id=slots[reservation["activity_slot_id"]]["activity_id"],
+                teacher_id=slots[reservation["activity_slot_id"]]["teacher_id"],
+                start_date=slots[reservation["activity_slot_id"]]["start_date"],
+                end_date=slots[reservation["activity_slot_id"]]["end_date"],
+            )
+            for reservation in reservations
+        ], batch_size=500)
+
+        with suppress_hooks():
+            Reservation.objects.filter(activity_slot_id__in=slot_ids).delete()
+            ActivitySlot.objects.filter(id__in=slot_ids).delete()
+
+    return len(slot_ids), len(reservations)
+
+
+def archive_past(cutoff, batch_size=1000, max_batches=None):
+    """Archive in batches until nothing older than ``cutoff`` is left. Yields (slots, reservations) per batch."""
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        slots, reservations = archive_batch(cutoff, batch_size)
+        if not slots:
+            return
+        batches += 1
+        yield slots, reservations
+
+
+def encode_cursor(reservation):
+    raw = f"{reservation.start_date.isoformat()}|{reservation.id}"
+    return urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(value):
+    """Opaque cursor -> (start_date, id). Raises ValueError for a malformed cursor."""
+    raw = urlsafe_b64decode(value + "=" * (-len(value) % 4)).decode()
+    start, _, reservation_id = raw.partition("|")
+    start_date = parse_datetime(start)
+    if start_date is None or not reservation_id.isdigit():
+        raise ValueError("invalid cursor")
+    return start_date, int(reservation_id)
+
+
+def history_page(queryset, cursor=None, limit=50):
+    """
+    Keyset pagination (start_date DESC, id DESC) over ArchivedReservation - every page is one
+    index range scan, no OFFSET. Returns (items, next_cursor or None).
+    """
+    queryset = queryset.order_by("-start_date", "-id")
+    if cursor:
+        start_date, reservation_id = decode_cursor(cursor)
+        queryset = queryset.filter(Q(start_date__lt=start_date) | Q(start_date=start_date, id__lt=reservation_id))
+    items = list(queryset[:limit + 1])
+    next_cursor = encode_cursor(items[limit - 1]) if len(items) > limit else None
+    return items[:limit], next_cursor
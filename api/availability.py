@@ -0,0 +1,361 @@
+"""
+Index voľnej kapacity slotov v pamäti procesu (activity-slots/, najbližšie voľné sloty - slots/next-available/).
+
+Pre každú aktivitu drží zoradené polia začiatkov slotov (a k nim koniec, id slotu a počet
+nezrušených rezervácií) pre sloty, ktoré skončili najskôr pred AVAILABILITY_INDEX_PAST_DAYS dňami.
+Rozsah slotov aj najbližší voľný slot sa nájde binárnym vyhľadávaním v poli začiatkov, bez dotazu do DB;
+najbližšie voľné sloty naprieč aktivitami spája next_free_slots (halda s jedným slotom na aktivitu).
+
+Aktuálnosť:
+- index sa postaví jedným dotazom z primárnej DB pri prvom použití (a znova po
+  AVAILABILITY_INDEX_MAX_AGE_SECONDS),
+- zmeny v tomto procese (signály rezervácií, slotov a aktivít, api.signals) po commite označia
+  dotknuté aktivity ako neaktuálne a tie sa pri ďalšom čítaní načítajú znova (jeden dotaz pre všetky),
+- zmeny z iných procesov sa dočítajú z change logu (api.ChangeLogEntry) najviac raz za
+  AVAILABILITY_INDEX_CHECK_SECONDS; verzia indexu je id posledného spracovaného záznamu. Aj zmazaná
+  rezervácia má v logu svoj slot, takže sa znova načíta len jej aktivita. Ak je nových záznamov
+  priveľa, index sa postaví celý znova,
+- index sa stavia mimo zámku (ostatné vlákna zatiaľ čítajú starý index, pri prvej stavbe DB)
+  a hotový sa len vymení.
+
+Mimo indexovaného okna, v neukončenej transakcii (index by videl necommitnuté dáta) alebo pri
+AVAILABILITY_INDEX=0 sa rovnaký výsledok načíta z DB. Súlad s DB kontroluje príkaz
+check_availability_index.
+"""
+
+import heapq
+import logging
+import threading
+import time
+from bisect import bisect_left
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import ActivitySlot, ChangeLogEntry, Reservation
+
+logger = logging.getLogger(__name__)
+
+PRIMARY = "default"
+# viac novych zaznamov v change logu naraz -> lacnejsie je postavit index znova
+MAX_TAIL_ENTRIES = 1000
+# zaznamy z transakcii, ktore commitli neskor ako zaznamy s vyssim id (PostgreSQL)
+TAIL_LOOKBACK = timedelta(seconds=5)
+
+_lock = threading.Lock()
+# stavba indexu bezi len v jednom vlakne naraz a mimo _lock
+_build_lock = threading.Lock()
+_index = None
+
+
+def slot_rows(*filters, using=PRIMARY):
+    """(id, activity_id, start_date, end_date, reserved, capacity) ordered by activity, start, id."""
+    return (
+        ActivitySlot.objects.using(using)
+        .filter(*filters)
+        .annotate(reserved=Count("reservation", filter=~Q(reservation__status=Reservation.Status.CANCELLED)))
+        .order_by("activity_id", "start_date", "id")
+        .values_list("id", "activity_id", "start_date", "end_date", "reserved", "activity__capacity")
+    )
+
+
+class ActivitySlots:
+    """Slots of one activity as parallel lists sorted by (start, id). Never mutated after creation."""
+
+    __slots__ = ("capacity", "starts", "ends", "ids", "reserved")
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.starts = []
+        self.ends = []
+        self.ids = []
+        self.reserved = []
+
+    def append(self, slot_id, start, end, reserved):
+        self.ids.append(slot_id)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.reserved.append(reserved)
+
+    def in_range(self, start, end):
+        """Slots with start >= ``start`` and end <= ``end`` as (id, start, end, reserved)."""
+        result = []
+        index = bisect_left(self.starts, start)
+        while index < len(self.starts) and self.starts[index] <= end:
+            if self.ends[index] <= end:
+                result.append((self.ids[index], self.starts[index], self.ends[index], self.reserved[index]))
+            index += 1
+        return result
+
+    def free_index(self, position, min_duration=None, before=None):
+        """Position of the first slot at or after ``position`` with free capacity (starting before ``before``)."""
+        for index in range(position, len(self.starts)):
+            if before is not None and self.starts[index] >= before:
+                return None
+            if self.reserved[index] < self.capacity and (
+                min_duration is None or self.ends[index] - self.starts[index] >= min_duration
+            ):
+                return index
+        return None
+
+    def next_free(self, after, min_duration=None):
+        """First slot starting at or after ``after`` with free capacity, None when there is none."""
+        index = self.free_index(bisect_left(self.starts, after), min_duration)
+        if index is None:
+            return None
+        return self.ids[index], self.starts[index], self.ends[index], self.reserved[index]
+
+
+class AvailabilityIndex:
+    def __init__(self, window_start):
+        self.window_start = window_start
+        self.activities = {}
+        self.slot_activity = {}
+        self.dirty = set()
+        self.cursor = 0
+        self.built_at = time.monotonic()
+        self.synced_at = self.built_at
+        self.needs_rebuild = False
+        # id zaznamov z posledneho okna TAIL_LOOKBACK (spracuju sa len raz)
+        self.recent = set()
+
+    @classmethod
+    def build(cls, past_days=None):
+        past_days = settings.AVAILABILITY_INDEX_PAST_DAYS if past_days is None else past_days
+        index = cls(timezone.now() - timedelta(days=past_days))
+        # kurzor pred nacitanim slotov - zmeny pocas stavby sa docitaju pri najblizsej synchronizacii
+        entries = ChangeLogEntry.objects.using(PRIMARY)
+        index.cursor = entries.order_by("-id").values_list("id", flat=True).first() or 0
+        index.recent = set(entries.filter(created_at__gte=timezone.now() - TAIL_LOOKBACK).values_list("id", flat=True))
+        index.load(slot_rows(Q(end_date__gte=index.window_start)))
+        return index
+
+    def load(self, rows, activity_ids=()):
+        """Replace the slots of ``activity_ids`` (and of every activity in ``rows``) with ``rows``."""
+        activities = {activity_id: None for activity_id in activity_ids}
+        for slot_id, activity_id, start, end, reserved, capacity in rows:
+            slots = activities.get(activity_id)
+            if slots is None:
+                slots = activities[activity_id] = ActivitySlots(capacity)
+            slots.append(slot_id, start, end, reserved)
+        for activity_id, slots in activities.items():
+            previous = self.activities.pop(activity_id, None)
+            if previous is not None:
+                for slot_id in previous.ids:
+                    self.slot_activity.pop(slot_id, None)
+            if slots is not None:
+                self.activities[activity_id] = slots
+                self.slot_activity.update((slot_id, activity_id) for slot_id in slots.ids)
+
+    def reload_dirty(self):
+        if not self.dirty:
+            return
+        activity_ids, self.dirty = self.dirty, set()
+        self.load(slot_rows(Q(activity_id__in=activity_ids, end_date__gte=self.window_start)), activity_ids)
+
+    def mark_dirty(self, slot_ids=(), activity_ids=()):
+        self.dirty.update(activity_ids)
+        self.dirty.update(self.slot_activity[slot_id] for slot_id in slot_ids if slot_id in self.slot_activity)
+
+    def sync(self):
+        """Apply changes of other processes from the change log."""
+        entries = list(
+            ChangeLogEntry.objects.using(PRIMARY)
+            .filter(Q(id__gt=self.cursor) | Q(created_at__gte=timezone.now() - TAIL_LOOKBACK))
+            .order_by("id")
+            .values_list("id", "model", "object_id", "data")[:MAX_TAIL_ENTRIES + 1]
+        )
+        self.synced_at = time.monotonic()
+        if len(entries) > MAX_TAIL_ENTRIES:
+            self.needs_rebuild = True
+            return
+        seen, self.recent = self.recent, {entry[0] for entry in entries}
+        for entry_id, model, object_id, data in entries:
+            if entry_id <= self.cursor and entry_id in seen:
+                continue
+            self.cursor = max(self.cursor, entry_id)
+            if model == "activity":
+                self.dirty.add(object_id)
+            elif model == "activity_slot":
+                self.mark_dirty(slot_ids=[object_id], activity_ids=[data["activity_id"]] if data else [])
+            elif data is not None:
+                self.mark_dirty(slot_ids=[data["activity_slot_id"]])
+            else:
+                # zaznam zmazania zo starsej verzie bez snapshotu - slot nepozname
+                self.needs_rebuild = True
+
+    def covers(self, start):
+        return start >= self.window_start
+
+    def slots(self, activity_id):
+        self.reload_dirty()
+        return self.activities.get(activity_id)
+
+
+def get_index():
+    """Current index of this process, None when it must not be used (see module docstring)."""
+    if not settings.AVAILABILITY_INDEX or connections[PRIMARY].in_atomic_block:
+        return None
+    with _lock:
+        index = _index
+        now = time.monotonic()
+        if index is not None and now - index.synced_at >= settings.AVAILABILITY_INDEX_CHECK_SECONDS:
+            index.sync()
+        if index is not None and not index.needs_rebuild and now - index.built_at < settings.AVAILABILITY_INDEX_MAX_AGE_SECONDS:
+            index.reload_dirty()
+            return index
+
+    # prvu stavbu pockaju vsetky vlakna, dalsie robi jedno a ostatne zatial pouziju stary index
+    if _build_lock.acquire(blocking=index is None):
+        try:
+            if _index is index:
+                _rebuild(index)
+        finally:
+            _build_lock.release()
+    with _lock:
+        if _index is None or _index.needs_rebuild:
+            # stary index vynechal zmeny (privela zaznamov v logu) - kym sa stavia novy, cita sa z DB
+            return None
+        _index.reload_dirty()
+        return _index
+
+
+def _rebuild(previous):
+    global _index
+    started = time.perf_counter()
+    index = AvailabilityIndex.build()
+    logger.info(
+        "Availability index built: %s activities, %s slots in %.1f ms",
+        len(index.activities), len(index.slot_activity), (time.perf_counter() - started) * 1000,
+    )
+    with _lock:
+        if previous is not None:
+            # zmeny tohto procesu commitnute pocas stavby (change log ich doplni az pri synchronizacii)
+            index.dirty |= previous.dirty
+        _index = index
+
+
+def invalidate(slot_ids=(), activity_ids=()):
+    """After commit mark the activities of the given slots/activities for reload (signal receivers)."""
+    slot_ids, activity_ids = list(slot_ids), list(activity_ids)
+
+    def mark():
+        with _lock:
+            if _index is not None:
+                _index.mark_dirty(slot_ids, activity_ids)
+
+    transaction.on_commit(mark, using=PRIMARY)
+
+
+def slots_in_range(activity_id, start, end):
+    """[(slot_id, start, end, reserved), ...] of activity-slots/ - from the index, otherwise from the DB."""
+    index = get_index()
+    if index is not None and index.covers(start):
+        with _lock:
+            slots = index.slots(activity_id)
+        return [] if slots is None else slots.in_range(start, end)
+    # bez indexu cita z DB podla app.db_router (aj z repliky)
+    rows = slot_rows(Q(activity_id=activity_id, start_date__gte=start, end_date__lte=end), using=None)
+    return [(slot_id, slot_start, slot_end, reserved) for slot_id, _, slot_start, slot_end, reserved, _ in rows]
+
+
+def next_free_slot(activity_id, after, min_duration=None):
+    """(slot_id, start, end, reserved) of the first slot with free capacity from ``after``, None if there is none."""
+    index = get_index()
+    if index is not None and index.covers(after):
+        with _lock:
+            slots = index.slots(activity_id)
+        return None if slots is None else slots.next_free(after, min_duration)
+    # v DB az po prvy vyhovujuci slot (rovnaky filter ako ActivitySlots.next_free)
+    for slot_id, _, start, end, reserved, capacity in slot_rows(Q(activity_id=activity_id, start_date__gte=after), using=None).iterator():
+        if reserved < capacity and (min_duration is None or end - start >= min_duration):
+            return slot_id, start, end, reserved
+    return None
+
+
+def next_free_slots(activity_ids, after, before, min_duration=None, limit=10):
+    """
+    First ``limit`` slots with free capacity of the given activities (None = all) starting in
+    [after, before), ordered by start across activities, as
+    (slot_id, activity_id, start, end, reserved, capacity).
+    """
+    index = get_index()
+    if index is not None and index.covers(after):
+        with _lock:
+            index.reload_dirty()
+            activities = index.activities if activity_ids is None else {
+                activity_id: index.activities[activity_id] for activity_id in activity_ids if activity_id in index.activities
+            }
+        return _merge_free(activities, after, before, min_duration, limit)
+
+    # v DB: sloty v poradi indexu api_slot_start_idx, obsadenost korelovanym poddotazom (bez GROUP BY),
+    # takze sa da skoncit po prvych `limit` riadkoch
+    reserved = (
+        Reservation.objects.filter(activity_slot=OuterRef("pk"))
+        .exclude(status=Reservation.Status.CANCELLED)
+        .values("activity_slot")
+        .annotate(count=Count("id"))
+        .values("count")
+    )
+    slots = ActivitySlot.objects.filter(start_date__gte=after, start_date__lt=before)
+    if activity_ids is not None:
+        slots = slots.filter(activity_id__in=activity_ids)
+    if min_duration is not None:
+        slots = slots.filter(end_date__gte=F("start_date") + min_duration)
+    slots = (
+        slots.annotate(reserved=Coalesce(Subquery(reserved), 0))
+        .filter(reserved__lt=F("activity__capacity"))
+        .order_by("start_date", "id")
+        .values_list("id", "activity_id", "start_date", "end_date", "reserved", "activity__capacity")
+    )
+    return list(slots[:limit])
+
+
+def _merge_free(activities, after, before, min_duration, limit):
+    """k-way merge of the per-activity sorted slots; the heap holds the next free slot of each activity."""
+    heads = []
+    for activity_id, slots in activities.items():
+        position = slots.free_index(bisect_left(slots.starts, after), min_duration, before)
+        if position is not None:
+            heads.append((slots.starts[position], slots.ids[position], activity_id, position))
+    heapq.heapify(heads)
+
+    result = []
+    while heads and len(result) < limit:
+        start, slot_id, activity_id, position = heapq.heappop(heads)
+        slots = activities[activity_id]
+        result.append((slot_id, activity_id, start, slots.ends[position], slots.reserved[position], slots.capacity))
+        position = slots.free_index(position + 1, min_duration, before)
+        if position is not None:
+            heapq.heappush(heads, (slots.starts[position], slots.ids[position], activity_id, position))
+    return result
+
+
+def verify(index, activity_ids=None):
+    """Compare the index with the database; returns a list of human readable differences."""
+    expected = AvailabilityIndex(index.window_start)
+    filters = [Q(end_date__gte=index.window_start)]
+    if activity_ids is not None:
+        filters.append(Q(activity_id__in=activity_ids))
+    expected.load(slot_rows(*filters))
+
+    differences = []
+    checked = set(expected.activities) | (set(index.activities) if activity_ids is None else set(activity_ids))
+    for activity_id in sorted(checked):
+        actual, wanted = index.activities.get(activity_id), expected.activities.get(activity_id)
+        if actual is None or wanted is None:
+            if actual is not wanted:
+                differences.append(f"aktivita {activity_id}: v indexe {'chýba' if actual is None else 'navyše'}")
+            continue
+        if actual.capacity != wanted.capacity:
+            differences.append(f"aktivita {activity_id}: kapacita {actual.capacity} != {wanted.capacity}")
+        actual_rows = list(zip(actual.ids, actual.starts, actual.ends, actual.reserved))
+        wanted_rows = list(zip(wanted.ids, wanted.starts, wanted.ends, wanted.reserved))
+        if actual_rows != wanted_rows:
+            wrong = {row[0] for row in set(actual_rows) ^ set(wanted_rows)}
+            differences.append(f"aktivita {activity_id}: nesedia sloty {sorted(wrong)[:10]}")
+    return differences
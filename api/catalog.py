@@ -0,0 +1,370 @@
+"""
+Zdieľaný snapshot katalógu (aktivity + role) pre všetkých workerov na jednom stroji.
+
+Katalóg sa zapíše do jedného binárneho súboru (CATALOG_SNAPSHOT_DIR, meno podľa DB) a každý worker
+si ho namapuje cez mmap - stránky sú v page cache raz pre všetky procesy, čítanie nejde do DB
+a nič sa neparsuje vopred:
+
+    hlavička   magic, verzia, počet aktivít, počet rolí, offset textov
+    aktivity   stĺpce int64 (id, capacity, role, created_by) a pre každý textový stĺpec
+               offsety (uint32) a dĺžky (int32, -1 = NULL) do bloku textov
+    role       to isté pre id, name, description
+    texty      UTF-8 bajty všetkých textov za sebou (opening_hours ako JSON)
+
+Stĺpce sa čítajú priamo z mapovanej pamäte (memoryview.cast), aktivita sa hľadá binárnym
+vyhľadávaním podľa id a dekódujú sa len texty riadku, ktorý sa číta.
+
+Verzia katalógu je v DB (CatalogVersion, spoločná pre všetky stroje). Zmena aktivity alebo role
+(api.signals) ju v tej istej transakcii zvýši - od commitu čitatelia starší súbor nepoužijú a čítajú
+z DB - a zaradí job api.publish_catalog (api.tasks) s odkladom CATALOG_PUBLISH_DELAY_SECONDS; kým čaká,
+ďalšie zmeny nový job nepridajú, takže hromadná úprava znamená jeden publish. publish() prečíta verziu
+z DB a až potom dáta (súbor nikdy nemá staršie dáta, než hovorí jeho verzia), zapíše nový súbor vedľa
+a nahradí ním starý (os.replace - čitatelia starého súboru dočítajú bez chyby). Ručne (napr. po zmene
+mimo ORM): príkaz publish_catalog, ktorý verziu najprv sám zvýši.
+Čítanie nikdy nepublikuje. Worker porovná súbor na disku (inode, mtime) s namapovaným a nový
+namapuje, ak sa zmenila verzia v hlavičke; najviac raz za CATALOG_CHECK_SECONDS si prečíta verziu
+z DB (proces, ktorý zmenu urobil, hneď po commite). Snapshot starší ako verzia v DB (zmena ešte nie
+je publikovaná, súbor na inom stroji, ako beží job worker) sa nepoužije - pri viacerých strojoch má
+byť CATALOG_SNAPSHOT_DIR zdieľaný adresár.
+
+Ak snapshot nie je k dispozícii (chýba, je zastaraný) alebo v ňom záznam chýba, volajúci dostane
+dáta z DB ako predtým.
+"""
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from accounts.models import Role
+from jobs.models import Job
+from jobs.queue import enqueue
+
+from .models import Activity, CatalogVersion
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"KPCATLG1"
+# magic, verzia, pocet aktivit, pocet roli, offset bloku textov
+HEADER = struct.Struct("<8sQIIQ")
+NULL = -1
+PRIMARY = "default"
+PUBLISH_TASK = "api.publish_catalog"
+
+# poradie poli zodpoveda ActivitySerializer / RoleSerializer
+ACTIVITY_INTS = ("id", "capacity", "role", "created_by")
+ACTIVITY_TEXTS = ("name", "description", "available_hours", "opening_hours", "color", "category", "room", "image_key")
+ROLE_INTS = ("id",)
+ROLE_TEXTS = ("name", "description")
+JSON_TEXTS = {"opening_hours"}
+
+_lock = threading.Lock()
+_snapshot = None
+_checked_at = 0.0
+_published_version = None
+
+
+def snapshot_path(using=PRIMARY):
+    """Snapshot file of the given database (test DB and dev DB never share one)."""
+    name = str(connections[using].settings_dict["NAME"])
+    digest = hashlib.sha1(name.encode()).hexdigest()[:12]
+    return os.path.join(settings.CATALOG_SNAPSHOT_DIR, f"catalog-{digest}.bin")
+
+
+# --- zapis ---
+
+def _pack_table(rows, ints, texts, blob):
+    parts = [array("q", [NULL if row[name] is None else row[name] for row in rows]).tobytes() for name in ints]
+    for name in texts:
+        offsets, lengths = array("I"), array("i")
+        for row in rows:
+            value = row[name]
+            if value is None:
+                offsets.append(0)
+                lengths.append(NULL)
+                continue
+            data = (json.dumps(value, separators=(",", ":")) if name in JSON_TEXTS else value).encode()
+            offsets.append(len(blob))
+            lengths.append(len(data))
+            blob += data
+        parts += [offsets.tobytes(), lengths.tobytes()]
+    return b"".join(parts)
+
+
+def encode(version, activities, roles):
+    """Serialize catalog rows (dicts keyed by field name, sorted by id) into the snapshot format."""
+    blob = bytearray()
+    tables = _pack_table(activities, ACTIVITY_INTS, ACTIVITY_TEXTS, blob) + _pack_table(roles, ROLE_INTS, ROLE_TEXTS, blob)
+    blob_offset = HEADER.size + len(tables)
+    return HEADER.pack(MAGIC, version, len(activities), len(roles), blob_offset) + tables + bytes(blob)
+
+
+def publish(using=PRIMARY, bump=True):
+    """
+    Build the snapshot from the database and atomically replace the file. Returns its version.
+    ``bump=False`` publishes the version already recorded in the database (changes through the ORM
+    bumped it themselves), ``bump=True`` first marks every published snapshot as stale.
+    """
+    if bump:
+        _bump_version(using)
+    recorded = CatalogVersion.objects.using(using).filter(pk=1).values_list("version", flat=True).first()
+    # verzia sa cita pred datami - subor nikdy nema starsie data, nez hovori jeho verzia
+    version = recorded if recorded is not None else time.time_ns()
+    activities = list(Activity.objects.using(using).order_by("id").values(*ACTIVITY_INTS, *ACTIVITY_TEXTS))
+    roles = list(Role.objects.using(using).order_by("id").values(*ROLE_INTS, *ROLE_TEXTS))
+    data = encode(version, activities, roles)
+
+    path = snapshot_path(using)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    if recorded is None:
+        CatalogVersion.objects.using(using).get_or_create(pk=1, defaults={"version": version, "published_at": timezone.now()})
+    else:
+        CatalogVersion.objects.using(using).filter(pk=1, version=version).update(published_at=timezone.now())
+    logger.info("Catalog snapshot %s published: %s activities, %s roles, %s bytes", version, len(activities), len(roles), len(data))
+    return version
+
+
+def _bump_version(using=PRIMARY):
+    # bez zaznamu este nic publikovane nebolo -> nie je co zneplatnit
+    CatalogVersion.objects.using(using).filter(pk=1).update(version=F("version") + 1)
+
+
+def _forget_version():
+    global _checked_at
+    _checked_at = float("-inf")
+
+
+def schedule_publish(**kwargs):
+    """
+    Signal receiver: mark published snapshots as stale and let the job worker republish shortly.
+    Both are part of the surrounding transaction (nothing on rollback); while a job is pending,
+    further changes add no new one.
+    """
+    _bump_version()
+    transaction.on_commit(_forget_version)
+    run_at = timezone.now() + timedelta(seconds=settings.CATALOG_PUBLISH_DELAY_SECONDS)
+    job = enqueue(PUBLISH_TASK, dedup_key=PUBLISH_TASK, run_at=run_at)
+    if job.status == Job.Status.RUNNING:
+        # bezici publish uz mohol precitat data pred touto zmenou
+        enqueue(PUBLISH_TASK, dedup_key=f"{PUBLISH_TASK}:again", run_at=run_at)
+
+
+# --- citanie ---
+
+class _Table:
+    def __init__(self, view, offset, count, ints, texts):
+        self.count = count
+        self.ints = {}
+        self.texts = {}
+        for name in ints:
+            self.ints[name] = view[offset:offset + 8 * count].cast("q")
+            offset += 8 * count
+        for name in texts:
+            offsets = view[offset:offset + 4 * count].cast("I")
+            lengths = view[offset + 4 * count:offset + 8 * count].cast("i")
+            self.texts[name] = (offsets, lengths)
+            offset += 8 * count
+        self.end = offset
+
+    def find(self, pk):
+        ids = self.ints["id"]
+        index = bisect_left(ids, pk)
+        return index if index < self.count and ids[index] == pk else None
+
+
+class Snapshot:
+    """Read-only view of one mapped snapshot file."""
+
+    def __init__(self, path, file_id, buffer):
+        self.path = path
+        self.file_id = file_id
+        self._buffer = buffer
+        view = memoryview(buffer)
+        magic, self.version, activity_count, role_count, blob_offset = HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a catalog snapshot")
+        self.activities = _Table(view, HEADER.size, activity_count, ACTIVITY_INTS, ACTIVITY_TEXTS)
+        self.roles = _Table(view, self.activities.end, role_count, ROLE_INTS, ROLE_TEXTS)
+        self._blob = view[blob_offset:]
+        self._role_objects = {}
+
+    @classmethod
+    def open(cls, path):
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(path, (stat.st_ino, stat.st_mtime_ns, stat.st_size), buffer)
+
+    def _text(self, table, name, index):
+        offsets, lengths = table.texts[name]
+        length = lengths[index]
+        if length == NULL:
+            return None
+        value = str(self._blob[offsets[index]:offsets[index] + length], "utf-8")
+        return json.loads(value) if name in JSON_TEXTS else value
+
+    def _row(self, table, index, ints, texts):
+        row = {name: table.ints[name][index] for name in ints}
+        row.update((name, self._text(table, name, index)) for name in texts)
+        return row
+
+    def activity(self, activity_id):
+        """Activity as ActivitySerializer data (plain dict), None when not in the snapshot."""
+        index = self.activities.find(activity_id)
+        if index is None:
+            return None
+        row = self._row(self.activities, index, ACTIVITY_INTS, ACTIVITY_TEXTS)
+        if row["created_by"] == NULL:
+            row["created_by"] = None
+        return {name: row[name] for name in _activity_fields()}
+
+    def find_activities(self, role=None, category=None, room=None):
+        """Ids of activities with the given role id / category / room (None = any value)."""
+        table = self.activities
+        ids, roles = table.ints["id"], table.ints["role"]
+        result = []
+        for index in range(table.count):
+            if role is not None and roles[index] != role:
+                continue
+            if category is not None and self._text(table, "category", index) != category:
+                continue
+            if room is not None and self._text(table, "room", index) != room:
+                continue
+            result.append(ids[index])
+        return result
+
+    def role(self, role_id):
+        """Role instance (built once per snapshot), None when not in the snapshot."""
+        role = self._role_objects.get(role_id)
+        if role is None:
+            index = self.roles.find(role_id)
+            if index is None:
+                return None
+            role = Role(**self._row(self.roles, index, ROLE_INTS, ROLE_TEXTS))
+            role._state.adding = False
+            role._state.db = PRIMARY
+            self._role_objects[role_id] = role
+        return role
+
+
+def _activity_fields():
+    from .serializer import ActivitySerializer
+
+    return ActivitySerializer.available_fields()
+
+
+def _file_id(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def _latest_version():
+    """Catalog version in the database (shared by all hosts), read at most once per CATALOG_CHECK_SECONDS."""
+    global _checked_at, _published_version
+    now = time.monotonic()
+    if now - _checked_at >= settings.CATALOG_CHECK_SECONDS:
+        _published_version = CatalogVersion.objects.using(PRIMARY).filter(pk=1).values_list("version", flat=True).first()
+        _checked_at = now
+    return _published_version
+
+
+def get_snapshot():
+    """
+    Current mapped snapshot, (re)mapped when the file changed. None when there is no snapshot file
+    or it is older than the version in the database (unpublished change, file of another host) -
+    never publishes.
+    """
+    path = snapshot_path()
+    snapshot = _snapshot
+    if snapshot is None or snapshot.path != path or snapshot.file_id != _file_id(path):
+        with _lock:
+            snapshot = _remap(path)
+    if snapshot is None:
+        return None
+    latest = _latest_version()
+    if latest is None or snapshot.version < latest:
+        return None
+    return snapshot
+
+
+def _remap(path):
+    global _snapshot
+    snapshot = _snapshot if _snapshot is not None and _snapshot.path == path else None
+    file_id = _file_id(path)
+    if file_id is None:
+        return None
+    if snapshot is not None and snapshot.file_id == file_id:
+        return snapshot
+    try:
+        mapped = Snapshot.open(path)
+    except (OSError, ValueError) as e:
+        logger.error(f"Catalog snapshot {path} cannot be mapped: {e}")
+        return snapshot
+    # novy subor s rovnakou verziou (napr. touch) -> ostane povodne mapovanie
+    if snapshot is not None and snapshot.version == mapped.version:
+        snapshot.file_id = mapped.file_id
+        return snapshot
+    _snapshot = mapped
+    return mapped
+
+
+def activities(ids):
+    """{id: ActivitySerializer data} for the given ids; ids missing in the snapshot are read from the DB."""
+    snapshot = get_snapshot()
+    found = {}
+    missing = []
+    for activity_id in ids:
+        data = snapshot.activity(activity_id) if snapshot is not None else None
+        if data is None:
+            missing.append(activity_id)
+        else:
+            found[activity_id] = data
+    if missing:
+        from .serializer import ActivitySerializer
+
+        rows = Activity.objects.filter(id__in=missing)
+        # aktivita moze byt v DB a nie v snapshote (napr. bulk_create bez signalov), doplni ju az publish_catalog
+        found.update((activity.id, ActivitySerializer(activity).data) for activity in rows)
+    return found
+
+
+def activity(activity_id):
+    return activities([activity_id]).get(activity_id)
+
+
+def activity_ids(role=None, category=None, room=None):
+    """Ids of matching activities (see Snapshot.find_activities), from the DB when there is no snapshot."""
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        return snapshot.find_activities(role=role, category=category, room=room)
+    filters = {"role_id": role, "category": category, "room": room}
+    activities = Activity.objects.filter(**{name: value for name, value in filters.items() if value is not None})
+    return list(activities.order_by("id").values_list("id", flat=True))
+
+
+def role(role_id):
+    """Role from the snapshot, falling back to the database."""
+    snapshot = get_snapshot()
+    role = snapshot.role(role_id) if snapshot is not None else None
+    if role is None:
+        role = Role.objects.filter(pk=role_id).first()
+    return role
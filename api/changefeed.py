@@ -0,0 +1,162 @@
+"""
+Change feed (append-only log) of Activity, ActivitySlot and Reservation mutations.
+
+Every save/delete writes one ChangeLogEntry (see api.signals). Clients keep a
+cursor (the last seen entry id) and call changes/?since=<cursor> to get only
+the deltas visible to their role. Old entries are removed by
+python manage.py compact_changelog; a cursor older than the retained log
+must do a full resync.
+
+Ids are assigned on INSERT but become visible on COMMIT, so on PostgreSQL a
+slower transaction can commit a lower id after a client already read past it.
+The returned cursor therefore never moves past entries younger than
+CHANGE_FEED_LOOKBACK_SECONDS: they are sent again on the next poll and the
+client skips the seq values it has already applied.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Max, Min, Q, Subquery
+from django.utils import timezone
+
+from .models import Activity, ActivitySlot, ChangeLogEntry, Reservation
+
+MODEL_NAMES = {
+    Activity: "activity",
+    ActivitySlot: "activity_slot",
+    Reservation: "reservation",
+}
+
+
+class CursorExpired(Exception):
+    """The requested cursor points into the already compacted part of the log."""
+
+
+def serialize_instance(instance):
+    """Flat snapshot of the instance (FKs as ids) stored with the entry."""
+    return {field.attname: getattr(instance, field.attname) for field in instance._meta.concrete_fields}
+
+
+def visibility_fields(instance):
+    """role_id / user_id / teacher_id used to filter entries per requesting user."""
+    if isinstance(instance, Activity):
+        return {"role_id": instance.role_id}
+    if isinstance(instance, ActivitySlot):
+        return {"role_id": instance.activity.role_id, "teacher_id": instance.teacher_id}
+    # Reservation - slot moze byt uz nacitany (select_related), inak len jeden lahky dotaz
+    if Reservation.activity_slot.is_cached(instance):
+        teacher_id = instance.activity_slot.teacher_id
+    else:
+        teacher_id = ActivitySlot.objects.filter(id=instance.activity_slot_id).values_list("teacher_id", flat=True).first()
+    return {"user_id": instance.user_id, "teacher_id": teacher_id}
+
+
+def build_entry(instance, operation):
+    return ChangeLogEntry(
+        model=MODEL_NAMES[type(instance)],
+        object_id=instance.pk,
+        operation=operation,
+        # aj pri zmazani - konzumenti logu (index dostupnosti) potrebuju napr. slot zmazanej rezervacie
+        data=serialize_instance(instance),
+        **visibility_fields(instance),
+    )
+
+
+def record_change(instance, operation):
+    build_entry(instance, operation).save()
+
+
+def record_changes(instances, operation):
+    """Bulk variant for code paths that bypass model signals (queryset.update())."""
+    ChangeLogEntry.objects.bulk_create([build_entry(instance, operation) for instance in instances])
+
+
+def visible_entries(user):
+    entries = ChangeLogEntry.objects.all()
+    if user.is_superuser or (user.role and user.role.name == "admin"):
+        return entries
+
+    if user.role and user.role.name == "teacher":
+        # ucitel vidi vsetky aktivity a sloty, rezervacie len pre svoje sloty
+        return entries.filter(~Q(model="reservation") | Q(teacher_id=user.id))
+
+    # student vidi aktivity/sloty pre svoju rolu a len svoje rezervacie
+    return entries.filter(
+        Q(model__in=["activity", "activity_slot"], role_id=user.role_id) |
+        Q(model="reservation", user_id=user.id)
+    )
+
+
+def _young_cutoff():
+    return timezone.now() - timedelta(seconds=getattr(settings, "CHANGE_FEED_LOOKBACK_SECONDS", 60))
+
+
+def _cursor_before(since, young_id):
+    """Newest entry after ``since`` older than the first young entry (an id gap may be an uncommitted transaction)."""
+    return ChangeLogEntry.objects.filter(id__gt=since, id__lt=young_id).aggregate(max_id=Max("id"))["max_id"] or since
+
+
+def safe_cursor(since, max_id):
+    """
+    Highest id <= ``max_id`` that a client can store as its cursor.
+
+    Entries younger than the lookback may still have lower ids committed after
+    them, so the cursor stops at the newest committed entry older than all of
+    them (never below ``since``); an id gap in front of them may be a
+    transaction that has not committed yet.
+    """
+    young_id = (
+        ChangeLogEntry.objects
+        .filter(id__gt=since, id__lte=max_id, created_at__gte=_young_cutoff())
+        .aggregate(min_id=Min("id"))["min_id"]
+    )
+    if young_id is None:
+        return max_id
+    return _cursor_before(since, young_id)
+
+
+def current_cursor():
+    """Cursor for a client that is about to download full lists (bootstrap), in one query (see safe_cursor)."""
+    cutoff = _young_cutoff()
+    first_young = ChangeLogEntry.objects.filter(created_at__gte=cutoff).order_by("id").values("id")[:1]
+    bounds = ChangeLogEntry.objects.aggregate(
+        max_id=Max("id"),
+        young_id=Min("id", filter=Q(created_at__gte=cutoff)),
+        before_young=Max("id", filter=Q(id__lt=Subquery(first_young))),
+    )
+    if bounds["young_id"] is None:
+        return bounds["max_id"] or 0
+    return bounds["before_young"] or 0
+
+
+def get_changes(user, since, limit):
+    """
+    Return (entries, next_cursor, has_more) for entries after ``since``.
+
+    ``since=0`` starts from the oldest retained entry. The first query only reads
+    MIN/MAX of the primary key (index-only), so the common "nothing changed" poll
+    costs exactly one cheap query.
+    """
+    bounds = ChangeLogEntry.objects.aggregate(min_id=Min("id"), max_id=Max("id"))
+    max_id = bounds["max_id"] or 0
+    if max_id <= since:
+        return [], max_id, False
+
+    # kurzor je starsi ako najstarsi zachovany zaznam - klient mohol nieco vynechat, musi spravit full resync
+    if since and bounds["min_id"] is not None and since < bounds["min_id"] - 1:
+        raise CursorExpired()
+
+    cursor = safe_cursor(since, max_id)
+    entries = list(
+        visible_entries(user)
+        .filter(id__gt=since, id__lte=max_id)
+        .order_by("id")[:limit + 1]
+    )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    if has_more and entries[-1].id <= cursor:
+        return entries, entries[-1].id, True
+    # zvysok za cerstvymi zaznamami dostane klient, az zostarnu - inak by strankoval stale tu istu stranku
+    return entries, cursor, False
+
@@ -0,0 +1,220 @@
+"""
+In-process pub/sub for live slot occupancy (Server-Sent Events).
+
+Views that change reservations call publish_slot_occupancy(); after the
+transaction commits an event {"slotId": ...} is broadcast to the channel
+"activity:<id>". Only a process that has subscribers on the channel loads the
+slot's occupancy (one query) and delivers it, so bookings nobody watches cost
+no extra query. SSE subscribers (api.views.stream_activity_occupancy) wait on
+an asyncio.Queue, so an idle connection costs no CPU - which needs an ASGI
+server (app.asgi, the Docker image runs uvicorn workers).
+
+The broadcast backend is pluggable (settings.OCCUPANCY_BROADCAST_BACKEND):
+- api.events.LocalBroadcast    - single process (default, runserver / one worker)
+- api.events.PostgresBroadcast - LISTEN/NOTIFY, for several gunicorn/uvicorn workers
+"""
+
+import asyncio
+import json
+import logging
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count, Q
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """One subscriber (one open SSE connection) bound to its event loop."""
+
+    def __init__(self, broadcast, channel, maxsize=100):
+        self.broadcast = broadcast
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def deliver(self, message):
+        # volane z lubovolneho threadu, do queue sa zapisuje len v threade event loopu
+        self.loop.call_soon_threadsafe(self._put, message)
+
+    def _put(self, message):
+        if self.queue.full():
+            # pomaly klient - zahodime najstarsiu spravu, posledny stav je dolezitejsi
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout=None):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def close(self):
+        self.broadcast.unsubscribe(self)
+
+
+class LocalBroadcast:
+    """Delivers messages only to subscribers in the current process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel)
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+    def has_subscribers(self, channel):
+        with self._lock:
+            return channel in self._subscribers
+
+    def dispatch(self, channel, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        # obsadenost sa nacita len v procese, kde ju niekto odobera
+        if not subscribers:
+            return
+        message = slot_occupancy(event["slotId"])
+        if message is None:
+            return
+        for subscription in subscribers:
+            try:
+                subscription.deliver(message)
+            except RuntimeError:
+                # event loop subscriberu uz neexistuje
+                self.unsubscribe(subscription)
+
+    def publish(self, channel, event):
+        self.dispatch(channel, event)
+
+
+class PostgresBroadcast(LocalBroadcast):
+    """
+    Fan-out across processes with PostgreSQL LISTEN/NOTIFY.
+
+    publish() sends a NOTIFY with the event (ids only, no table is read), a background
+    thread in every process LISTENs and dispatches to its local subscribers (including
+    the publishing process) - only processes with subscribers load the occupancy.
+    """
+
+    pg_channel = "occupancy_events"
+
+    def __init__(self):
+        super().__init__()
+        self._listener = None
+        self._listener_lock = threading.Lock()
+
+    def _connect(self):
+        import psycopg2
+
+        db = settings.DATABASES["default"]
+        connection = psycopg2.connect(
+            dbname=db["NAME"], user=db["USER"], password=db["PASSWORD"], host=db["HOST"], port=db["PORT"]
+        )
+        connection.autocommit = True
+        return connection
+
+    def subscribe(self, channel):
+        self._ensure_listener()
+        return super().subscribe(channel)
+
+    def publish(self, channel, event):
+        from django.db import connection
+
+        payload = json.dumps({"channel": channel, "event": event})
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [self.pg_channel, payload])
+
+    def _ensure_listener(self):
+        with self._listener_lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name="occupancy-listener", daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        import select
+
+        connection = self._connect()
+        with connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {self.pg_channel}")
+        while True:
+            if select.select([connection], [], [], 60) == ([], [], []):
+                continue
+            connection.poll()
+            while connection.notifies:
+                notify = connection.notifies.pop(0)
+                try:
+                    data = json.loads(notify.payload)
+                    channel, event = data["channel"], data["event"]
+                except (ValueError, KeyError):
+                    logger.warning("Invalid occupancy notification payload.")
+                    continue
+                try:
+                    self.dispatch(channel, event)
+                except Exception as e:
+                    logger.error(f"Dispatching occupancy event failed: {e}")
+                    # spojenie listener threadu do DB mohlo spadnut, dalsi dispatch otvori nove
+                    close_old_connections()
+
+
+_broadcast = None
+_broadcast_lock = threading.Lock()
+
+
+def get_broadcast():
+    global _broadcast
+    if _broadcast is None:
+        with _broadcast_lock:
+            if _broadcast is None:
+                backend = getattr(settings, "OCCUPANCY_BROADCAST_BACKEND", "api.events.LocalBroadcast")
+                _broadcast = import_string(backend)()
+    return _broadcast
+
+
+def activity_channel(activity_id):
+    return f"activity:{activity_id}"
+
+
+def slot_occupancy(slot_id):
+    """Current occupancy payload of one slot (same keys as get_activity_slots), None if it no longer exists."""
+    from .models import ActivitySlot, Reservation
+
+    slot = (
+        ActivitySlot.objects.filter(id=slot_id)
+        .annotate(reserved_count=Count("reservation", filter=~Q(reservation__status=Reservation.Status.CANCELLED)))
+        .values("id", "start_date", "end_date", "activity__capacity", "reserved_count")
+        .first()
+    )
+    if slot is None:
+        return None
+    return {
+        "slotId": slot["id"],
+        "start_date": slot["start_date"].isoformat(),
+        "end_date": slot["end_date"].isoformat(),
+        "reservedCount": slot["reserved_count"],
+        "isFull": slot["reserved_count"] >= slot["activity__capacity"],
+    }
+
+
+def publish_slot_occupancy(activity_id, slot_id):
+    """Announce a change of the slot's occupancy to subscribers of its activity once the transaction commits."""
+    channel = activity_channel(activity_id)
+
+    def _publish():
+        try:
+            get_broadcast().publish(channel, {"slotId": slot_id})
+        except Exception as e:
+            # live update nesmie zhodit rezervaciu
+            logger.error(f"Publishing occupancy of slot {slot_id} failed: {e}")
+
+    transaction.on_commit(_publish)
@@ -0,0 +1,163 @@
+"""
+Heatmapa obsadenosti: deň v týždni x 15-minútový úsek (7 x 96) za zvolené obdobie.
+
+Sloty v rozsahu sa načítajú jedným dotazom (začiatok a koniec ako UNIX sekundy, kapacita, počet
+nezrušených rezervácií) priamo do NumPy polí a zrátajú sa bez Python cyklu cez sloty:
+
+- časy sa prevedú na minúty od epochy a posunú o lokálny UTC offset (tabuľka offsetov po hodinách;
+  slot cez zmenu letného času sa na nej rozdelí na dve časti, každá s vlastným offsetom),
+- každý slot pridá svoju váhu (kapacitu / rezervácie) do diferenčného poľa minút týždňa
+  (np.add.at na začiatku, mínus na konci), kumulatívny súčet dá záťaž v každej minúte,
+- minúty sa zložia do 15-minútových úsekov (reshape + sum).
+
+occupancy = rezervované miesto-minúty / ponúknuté miesto-minúty v úseku.
+"""
+
+import hashlib
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, FloatField, Func, IntegerField, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import ActivitySlot, ChangeLogEntry, Reservation
+
+BUCKET_MINUTES = 15
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+BUCKETS_PER_DAY = MINUTES_PER_DAY // BUCKET_MINUTES
+# 1.1.1970 bol stvrtok -> posun, aby tyzden zacinal pondelkom
+EPOCH_WEEKDAY = 3
+CACHE_TIMEOUT = 60 * 60
+
+
+class EpochSeconds(Func):
+    """Datetime column as UNIX seconds computed in the database (no datetime objects in Python)."""
+
+    template = "EXTRACT(EPOCH FROM %(expressions)s)"
+    output_field = FloatField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template="CAST(strftime('%%%%s', %(expressions)s) AS REAL)", **extra_context)
+
+
+def load_slots(slot_filter, start, end):
+    """One query -> (starts, ends, capacity, reserved) arrays, times in epoch minutes clipped to [start, end)."""
+    # korelovany COUNT cez index rezervacii podla slotu je rychlejsi ako JOIN + GROUP BY cez vsetky sloty
+    reserved = (
+        Reservation.objects.filter(activity_slot=OuterRef("pk"))
+        .exclude(status=Reservation.Status.CANCELLED)
+        .order_by()
+        .values("activity_slot")
+        .annotate(count=Count("id"))
+        .values("count")
+    )
+    queryset = (
+        ActivitySlot.objects.filter(slot_filter, start_date__lt=end, end_date__gt=start)
+        .annotate(
+            start_epoch=EpochSeconds("start_date"),
+            end_epoch=EpochSeconds("end_date"),
+            reserved=Coalesce(Subquery(reserved, output_field=IntegerField()), 0),
+        )
+        .values_list("start_epoch", "end_epoch", "activity__capacity", "reserved")
+        .order_by()
+    )
+    # vsetky stlpce su cisla -> riadky z kurzora rovno do NumPy, bez ORM converterov pre kazdy riadok
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        data = np.array(cursor.fetchall(), dtype=np.float64).reshape(-1, 4)
+    starts = (np.maximum(data[:, 0], start.timestamp()) // 60).astype(np.int64)
+    ends = (np.minimum(data[:, 1], end.timestamp()) // 60).astype(np.int64)
+    return starts, ends, data[:, 2], data[:, 3]
+
+
+def utc_offsets(start, end, tz):
+    """Local UTC offset in minutes for every UTC hour in [start - 1h, end + 1h]."""
+    base_hour = int(start.timestamp() // 3600) - 1
+    hours = int(end.timestamp() // 3600) + 2 - base_hour
+    offsets = np.empty(hours, dtype=np.int64)
+    for index in range(hours):
+        moment = datetime.fromtimestamp((base_hour + index) * 3600, dt_timezone.utc)
+        offsets[index] = moment.astimezone(tz).utcoffset() // timedelta(minutes=1)
+    return base_hour, offsets
+
+
+def split_at_offset_changes(starts, ends, columns, base_hour, offsets):
+    """Split intervals crossing a UTC offset change so that each part has a single local offset."""
+    # zmena casu je vzdy na celu hodinu UTC; slot cez viac zmien sa rozdeli postupne
+    changes = (np.flatnonzero(np.diff(offsets)) + 1 + base_hour) * 60
+    while True:
+        index = np.searchsorted(changes, starts, side="right")
+        boundary = changes[np.minimum(index, changes.size - 1)] if changes.size else ends
+        split = (index < changes.size) & (boundary < ends)
+        if not split.any():
+            return starts, ends, columns
+        starts = np.concatenate([starts, boundary[split]])
+        ends = np.concatenate([np.where(split, boundary, ends), ends[split]])
+        columns = [np.concatenate([column, column[split]]) for column in columns]
+
+
+def weekday_counts(start, end, tz):
+    """How many times each weekday occurs in the local date range [start, end)."""
+    first = start.astimezone(tz).date()
+    last = (end - timedelta(microseconds=1)).astimezone(tz).date()
+    days = np.arange(np.datetime64(first), np.datetime64(last) + 1)
+    # numpy datetime64[D] je od 1.1.1970 (stvrtok)
+    return np.bincount((days.astype(np.int64) + EPOCH_WEEKDAY) % 7, minlength=7)
+
+
+def bin_week(starts, ends, weights):
+    """Minute-weighted sum of ``weights`` per (weekday, bucket) for intervals in local week minutes."""
+    # druhy tyzden v poli zachyti sloty cez polnoc z nedele na pondelok, potom sa prilozi na prvy
+    diff = np.zeros(2 * MINUTES_PER_WEEK + 1, dtype=np.float64)
+    np.add.at(diff, starts, weights)
+    np.add.at(diff, ends, -weights)
+    load = np.cumsum(diff[:-1])
+    load = load[:MINUTES_PER_WEEK] + load[MINUTES_PER_WEEK:]
+    return load.reshape(7, BUCKETS_PER_DAY, BUCKET_MINUTES).sum(axis=2)
+
+
+def compute_heatmap(slot_filter, start, end, tz):
+    starts, ends, capacity, reserved = load_slots(slot_filter, start, end)
+    keep = ends > starts
+    starts, ends, capacity, reserved = starts[keep], ends[keep], capacity[keep], reserved[keep]
+
+    slots = int(starts.size)
+    base_hour, offsets = utc_offsets(start, end, tz)
+    starts, ends, (capacity, reserved) = split_at_offset_changes(starts, ends, [capacity, reserved], base_hour, offsets)
+    local_starts = starts + offsets[starts // 60 - base_hour]
+    week_starts = (local_starts + EPOCH_WEEKDAY * MINUTES_PER_DAY) % MINUTES_PER_WEEK
+    # slot dlhsi ako tyzden by sa prekryval sam so sebou, orezeme ho
+    week_ends = week_starts + np.minimum(ends - starts, MINUTES_PER_WEEK)
+
+    capacity_minutes = bin_week(week_starts, week_ends, capacity)
+    reserved_minutes = bin_week(week_starts, week_ends, reserved)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        occupancy = np.where(capacity_minutes > 0, reserved_minutes / capacity_minutes, np.nan)
+        # priemerny pocet obsadenych miest v useku pre jeden den daneho typu
+        days = weekday_counts(start, end, tz)[:, None]
+        reserved_avg = np.where(days > 0, reserved_minutes / (BUCKET_MINUTES * days), 0.0)
+
+    return {
+        "slots": slots,
+        "occupancy": [[None if np.isnan(value) else round(float(value), 3) for value in row] for row in occupancy],
+        "reserved": np.round(reserved_avg, 2).tolist(),
+    }
+
+
+def cached_heatmap(target, value, slot_filter, start, end, tz):
+    """
+    Heatmapa z cache podľa vstupného okna. Kľúč obsahuje posledné id change logu, takže
+    akákoľvek zmena slotov/rezervácií (api.signals) spôsobí nový výpočet.
+    """
+    version = ChangeLogEntry.objects.aggregate(last=Max("id"))["last"] or 0
+    window = f"{target}|{value}|{start.isoformat()}|{end.isoformat()}|{tz}|{version}"
+    key = "api:heatmap:" + hashlib.sha1(window.encode()).hexdigest()
+    result = cache.get(key)
+    if result is None:
+        result = compute_heatmap(slot_filter, start, end, tz)
+        cache.set(key, result, CACHE_TIMEOUT)
+    return result
@@ -0,0 +1,226 @@
+"""
+iCalendar (.ics) feed rezervácií používateľa a slotov učiteľa.
+
+Kalendárové aplikácie sa na feed prihlásia URL s tokenom (CalendarFeed) a pravidelne ho sťahujú.
+- ETag = id používateľa + CalendarFeed.version (mení sa len pri novom tokene) + najvyššie id a počet
+  záznamov change logu, ktoré môžu zmeniť feed používateľa (jeho rezervácie, jeho sloty a rezervácie
+  na nich, presunuté sloty a premenované aktivity v jeho udalostiach). Zápisy rezervácií teda feed
+  nijako neaktualizujú; poll stojí dva dotazy (token + jeden agregát nad change logom) a väčšina
+  skončí 304. Počet zachytí aj záznam s nižším id commitnutý neskôr (api.changefeed).
+- Pri zmene sa feed generuje prúdovo: riadky z DB (values_list + iterator) idú rovno do odpovede
+  a súčasne sa skladajú do cache pod kľúčom so stavom feedu, ďalší request s rovnakým stavom ide z cache.
+  Pod ASGI Django synchrónny iterátor odpovede najprv celý načíta do pamäte, view preto dostane
+  asynchrónny (stream_async: po ITERATOR_CHUNK_SIZE udalostí na jedno prepnutie do vlákna).
+"""
+
+from datetime import timedelta, timezone as dt_timezone
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db.models import Count, IntegerField, Max, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import ActivitySlot, ChangeLogEntry, Reservation
+
+PRODID = "-//KP LabIT//Rezervacie//SK"
+UID_DOMAIN = "kp-labit"
+# feed obsahuje aj nedavnu minulost, nech udalosti z kalendara nezmiznu hned po skonceni
+PAST_DAYS = 30
+CACHE_TIMEOUT = 24 * 60 * 60
+# vacsie feedy sa do cache neukladaju
+CACHE_MAX_BYTES = 1024 * 1024
+ITERATOR_CHUNK_SIZE = 500
+
+RESERVATION_STATUS = {
+    Reservation.Status.APPROVED: "CONFIRMED",
+    Reservation.Status.CANCELLED: "CANCELLED",
+}
+
+
+def escape_text(value):
+    return (
+        (value or "")
+        .replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def fold(line):
+    """RFC 5545: lines longer than 75 octets continue on the next line starting with a space."""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line + "\r\n"
+    parts = []
+    while encoded:
+        limit = 75 if not parts else 74
+        cut = min(limit, len(encoded))
+        # nerozdelit viacbajtovy UTF-8 znak
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode("utf-8"))
+        encoded = encoded[cut:]
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def format_datetime(value):
+    return value.astimezone(dt_timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def event(uid, start, end, summary, location, description, status, stamp):
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{uid}",
+        f"DTSTAMP:{stamp}",
+        f"DTSTART:{format_datetime(start)}",
+        f"DTEND:{format_datetime(end)}",
+        f"SUMMARY:{escape_text(summary)}",
+        f"LOCATION:{escape_text(location)}",
+        f"DESCRIPTION:{escape_text(description)}",
+        f"STATUS:{status}",
+        "END:VEVENT",
+    ]
+    return "".join(fold(line) for line in lines)
+
+
+def is_teacher(user):
+    return bool(user.role and user.role.name == "teacher")
+
+
+def feed_since():
+    return timezone.now() - timedelta(days=PAST_DAYS)
+
+
+def feed_changes(user, since=None):
+    """Q over ChangeLogEntry matching every change that can alter the user's feed."""
+    since = since or feed_since()
+    updated = ChangeLogEntry.Operation.UPDATED
+    reserved = Reservation.objects.filter(user=user, activity_slot__end_date__gte=since)
+    changes = (
+        Q(model="reservation", user_id=user.id)
+        | Q(model="activity_slot", operation=updated, object_id__in=reserved.values("activity_slot_id"))
+        | Q(model="activity", operation=updated, object_id__in=reserved.values("activity_slot__activity_id"))
+    )
+    if is_teacher(user):
+        taught = ActivitySlot.objects.filter(teacher=user, end_date__gte=since)
+        changes |= (
+            # vlastne sloty a rezervacie na nich
+            Q(teacher_id=user.id)
+            # slot presunuty inemu ucitelovi - novy zaznam uz ma jeho teacher_id
+            | Q(model="activity_slot", object_id__in=ChangeLogEntry.objects.filter(model="activity_slot", teacher_id=user.id).values("object_id"))
+            | Q(model="activity", operation=updated, object_id__in=taught.values("activity_id"))
+        )
+    return changes
+
+
+def feed_state(feed):
+    """Version of the feed content: (token version, last change log id, number of matching entries)."""
+    changes = ChangeLogEntry.objects.filter(feed_changes(feed.user)).aggregate(last_id=Max("id"), count=Count("id"))
+    return feed.version, changes["last_id"] or 0, changes["count"]
+
+
+def feed_etag(feed, state):
+    return '"{}-{}"'.format(feed.user_id, "-".join(str(part) for part in state))
+
+
+def cache_key(feed, state):
+    return "api:ical:{}:{}".format(feed.user_id, ":".join(str(part) for part in state))
+
+
+def render_feed(user, since=None):
+    """Yield the calendar as text chunks (one per event), reading rows lazily from the database."""
+    since = since or feed_since()
+    stamp = format_datetime(timezone.now())
+
+    yield "".join(fold(line) for line in [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:{PRODID}",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{escape_text('Rezervácie – ' + user.username)}",
+    ])
+
+    reservations = (
+        Reservation.objects.filter(user=user, activity_slot__end_date__gte=since)
+        .order_by("activity_slot__start_date", "id")
+        .values_list(
+            "id", "status", "note", "activity_slot__start_date", "activity_slot__end_date",
+            "activity_slot__activity__name", "activity_slot__activity__room",
+        )
+    )
+    for reservation_id, status, note, start, end, name, room in reservations.iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+        yield event(
+            f"reservation-{reservation_id}@{UID_DOMAIN}", start, end, name, room, note or "",
+            RESERVATION_STATUS.get(status, "TENTATIVE"), stamp,
+        )
+
+    if is_teacher(user):
+        # pocet rezervacii ako korelovany poddotaz, aby aj sloty isli z DB prudovo
+        reserved = (
+            Reservation.objects.filter(activity_slot=OuterRef("pk"))
+            .exclude(status=Reservation.Status.CANCELLED)
+            .order_by()
+            .values("activity_slot")
+            .annotate(count=Count("id"))
+            .values("count")
+        )
+        slots = (
+            ActivitySlot.objects.filter(teacher=user, end_date__gte=since)
+            .annotate(reserved=Coalesce(Subquery(reserved, output_field=IntegerField()), 0))
+            .order_by("start_date", "id")
+            .values_list("id", "start_date", "end_date", "activity__name", "activity__room", "activity__capacity", "reserved")
+        )
+        for slot_id, start, end, name, room, capacity, reserved_count in slots.iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+            yield event(
+                f"slot-{slot_id}@{UID_DOMAIN}", start, end, name, room,
+                f"Rezervácie: {reserved_count}/{capacity}", "CONFIRMED", stamp,
+            )
+
+    yield "END:VCALENDAR\r\n"
+
+
+def cached_feed(feed, user, state):
+    """
+    Iterator of feed chunks. Returns the cached body for this state or streams a fresh
+    render and stores it once complete.
+    """
+    key = cache_key(feed, state)
+    body = cache.get(key)
+    if body is not None:
+        return [body]
+    return _render_and_store(key, user)
+
+
+def _render_and_store(key, user):
+    parts = []
+    size = 0
+    for chunk in render_feed(user):
+        size += len(chunk)
+        if size <= CACHE_MAX_BYTES:
+            parts.append(chunk)
+        yield chunk
+    if size <= CACHE_MAX_BYTES:
+        cache.set(key, "".join(parts), CACHE_TIMEOUT)
+
+
+
+async def stream_async(chunks, batch=ITERATOR_CHUNK_SIZE):
+    """
+    Async iterator over the sync feed chunks for ASGI. Batches are pulled in the request's
+    sync thread (thread_sensitive), so the database iterator keeps its connection.
+    """
+    iterator = iter(chunks)
+    next_batch = sync_to_async(lambda: list(islice(iterator, batch)))
+    try:
+        while batch_chunks := await next_batch():
+            yield "".join(batch_chunks)
+    finally:
+        # klient odisiel skor - zavrie generator (a kurzor DB) vo vlakne, kde bezal
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            await sync_to_async(close)()
@@ -0,0 +1,160 @@
+"""
+Idempotency-Key pre POST endpointy (reservations/create/, activities/create-with-slots/).
+
+Klient pošle hlavičku ``Idempotency-Key`` (napr. UUID) a pri timeoute opakuje request s rovnakým kľúčom:
+
+- prvý request si kľúč zamkne (riadok IdempotencyKey bez odpovede, commitnutý ešte pred spustením
+  view), spustí view a uloží status a telo odpovede (zlib komprimovaný JSON),
+- opakovanie s rovnakým kľúčom vráti uloženú odpoveď s hlavičkou ``Idempotent-Replayed: true``
+  bez jediného dotazu do business tabuliek,
+- súbežný duplikát počká, kým prvý request neskončí, a vráti jeho odpoveď (nespustí view druhýkrát);
+  ak prvý neskončí do IDEMPOTENCY_WAIT_SECONDS, dostane 409,
+- rovnaký kľúč s iným telom requestu -> 422,
+- 5xx odpovede a výnimky sa neukladajú - zámok sa uvoľní a klient môže skúsiť znova,
+- záznam platí IDEMPOTENCY_TTL_SECONDS, potom sa kľúč dá použiť znova; expirované záznamy maže
+  príkaz purge_idempotency_keys. Zámok držaný dlhšie ako IDEMPOTENCY_LOCK_SECONDS (spadnutý worker)
+  prevezme ďalší request.
+
+Bez hlavičky sa endpoint správa ako predtým.
+"""
+
+import hashlib
+import json
+import time
+import zlib
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = "HTTP_IDEMPOTENCY_KEY"
+MAX_KEY_LENGTH = 100
+POLL_SECONDS = 0.05
+
+
+def request_fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, separators=(",", ":"), cls=DjangoJSONEncoder)
+    return hashlib.sha256(f"{request.method} {request.path}\n{body}".encode()).hexdigest()
+
+
+def encode_response(data):
+    return zlib.compress(json.dumps(data, separators=(",", ":"), cls=DjangoJSONEncoder).encode())
+
+
+def decode_response(blob):
+    return json.loads(zlib.decompress(bytes(blob)))
+
+
+def replay(record):
+    response = Response(decode_response(record.response), status=record.status_code)
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def acquire(user, key, fingerprint):
+    """
+    Lock the key for this request. Returns (record, owned): owned=True means the caller runs the
+    view; otherwise ``record`` is finished, belongs to another request body, or is still locked
+    after IDEMPOTENCY_WAIT_SECONDS.
+    """
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        now = timezone.now()
+        # opakovanie (najcastejsi pripad) je len jeden SELECT, zamok sa zaklada len pre novy kluc
+        record = IdempotencyKey.objects.filter(user=user, key=key).first()
+        if record is None:
+            try:
+                with transaction.atomic():
+                    record = IdempotencyKey.objects.create(
+                        user=user,
+                        key=key,
+                        fingerprint=fingerprint,
+                        locked_at=now,
+                        expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_TTL_SECONDS),
+                    )
+                return record, True
+            except IntegrityError:
+                # subezny request ho zamkol skor
+                continue
+        if record.expires_at <= now:
+            IdempotencyKey.objects.filter(pk=record.pk, expires_at__lte=now).delete()
+            continue
+        if record.status_code is not None or record.fingerprint != fingerprint:
+            return record, False
+
+        # prvy request este bezi - opusteny zamok prevezmeme, inak cakame na jeho odpoved
+        stale = now - timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS)
+        if IdempotencyKey.objects.filter(pk=record.pk, status_code__isnull=True, locked_at__lt=stale).update(locked_at=now):
+            return record, True
+        if time.monotonic() >= deadline:
+            return record, False
+        time.sleep(POLL_SECONDS)
+
+
+def idempotent(view):
+    """
+    Decorator for DRF function views (below @api_view/@permission_classes and above
+    @transaction.atomic, so the key is locked before the view's transaction starts).
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.META.get(HEADER)
+        if key is None:
+            return view(request, *args, **kwargs)
+        key = key.strip()
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {"error": f"Idempotency-Key musí mať 1 až {MAX_KEY_LENGTH} znakov."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        fingerprint = request_fingerprint(request)
+        record, owned = acquire(request.user, key, fingerprint)
+        if not owned:
+            if record.fingerprint != fingerprint:
+                return Response(
+                    {"error": "Idempotency-Key už bol použitý s iným requestom."},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                )
+            if record.status_code is None:
+                return Response(
+                    {"error": "Request s týmto Idempotency-Key sa ešte spracúva, skúste to neskôr."},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            return replay(record)
+
+        try:
+            response = view(request, *args, **kwargs)
+        except BaseException:
+            IdempotencyKey.objects.filter(pk=record.pk).delete()
+            raise
+
+        if response.status_code >= 500 or not isinstance(response, Response):
+            IdempotencyKey.objects.filter(pk=record.pk).delete()
+            return response
+        IdempotencyKey.objects.filter(pk=record.pk).update(
+            status_code=response.status_code,
+            response=encode_response(response.data),
+        )
+        return response
+
+    return wrapper
+
+
+def purge_expired(batch_size=5000):
+    """Delete expired keys in batches. Returns number of deleted rows."""
+    now = timezone.now()
+    deleted_total = 0
+    while True:
+        ids = list(IdempotencyKey.objects.filter(expires_at__lte=now).values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return deleted_total
+        deleted, _ = IdempotencyKey.objects.filter(id__in=ids).delete()
+        deleted_total += deleted
@@ -0,0 +1,132 @@
+"""
+Interval helpers for schedule checks (double booking, free rooms).
+
+IntervalIndex is a static interval tree: intervals sorted by start, with the
+maximum end stored for every implicit subtree, so an overlap query costs
+O(log n + k) instead of comparing every pair (O(n^2) for a whole batch).
+Intervals are half-open [start, end) - a slot ending at 10:00 does not
+collide with a slot starting at 10:00.
+"""
+
+from bisect import bisect_left
+
+
+def overlaps(start_a, end_a, start_b, end_b):
+    return start_a < end_b and start_b < end_a
+
+
+class IntervalIndex:
+    def __init__(self, intervals):
+        """``intervals`` is an iterable of (start, end, payload)."""
+        items = sorted(intervals, key=lambda item: (item[0], item[1]))
+        self.starts = [item[0] for item in items]
+        self.ends = [item[1] for item in items]
+        self.payloads = [item[2] for item in items]
+        # max_end[i] = max end v podstrome so stredom i (implicitny vyvazeny strom nad zoradenym polom)
+        self.max_end = list(self.ends)
+        self._build(0, len(items) - 1)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def _build(self, low, high):
+        if low > high:
+            return None
+        mid = (low + high) // 2
+        best = self.ends[mid]
+        for child in (self._build(low, mid - 1), self._build(mid + 1, high)):
+            if child is not None and child > best:
+                best = child
+        self.max_end[mid] = best
+        return best
+
+    def overlapping(self, start, end):
+        """Return payloads of all intervals overlapping [start, end)."""
+        found = []
+        # intervaly so zaciatkom >= end sa urcite neprekryvaju -> hladame len v starts[:limit]
+        limit = bisect_left(self.starts, end)
+        stack = [(0, len(self.starts) - 1)]
+        while stack:
+            low, high = stack.pop()
+            if low > high or low >= limit:
+                continue
+            mid = (low + high) // 2
+            if self.max_end[mid] <= start:
+                # v celom podstrome vsetko konci pred zaciatkom dotazu
+                continue
+            if mid < limit and self.ends[mid] > start:
+                found.append(self.payloads[mid])
+            stack.append((low, mid - 1))
+            stack.append((mid + 1, high))
+        return found
+
+
+def find_batch_conflicts(intervals):
+    """
+    Overlapping pairs inside one batch [(start, end, payload), ...] via a sweep
+    over intervals sorted by start. Returns [(payload_a, payload_b), ...].
+    """
+    conflicts = []
+    active = []
+    for start, end, payload in sorted(intervals, key=lambda item: (item[0], item[1])):
+        active = [item for item in active if item[1] > start]
+        for _, _, other in active:
+            conflicts.append((other, payload))
+        active.append((start, end, payload))
+    return conflicts
+
+
+def coalesce_windows(windows, max_ranges):
+    """
+    Merge [(start, end), ...] into at most ``max_ranges`` sorted ranges covering
+    all of them. Overlapping windows are merged first; if there are still too
+    many, only the largest gaps between neighbours are kept as splits.
+    """
+    merged = []
+    for start, end in sorted(windows):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    if len(merged) <= max_ranges:
+        return [tuple(window) for window in merged]
+
+    # indexy okien, pred ktorymi su najvacsie medzery - tam sa rozsahy rozdelia
+    splits = sorted(
+        sorted(range(1, len(merged)), key=lambda i: merged[i][0] - merged[i - 1][1], reverse=True)[:max_ranges - 1]
+    )
+    ranges = []
+    first = 0
+    for split in splits + [len(merged)]:
+        ranges.append((merged[first][0], merged[split - 1][1]))
+        first = split
+    return ranges
+
+
+def free_gaps_by_key(rows, keys, window_start, window_end, min_duration):
+    """
+    Sweep-line over busy intervals sorted by start for many keys (rooms) at once.
+
+    ``rows`` yields (key, start, end) ordered by start, ``keys`` are all keys that
+    should appear in the result (also the ones without any busy interval).
+    Returns {key: [(gap_start, gap_end), ...]} with gaps of at least ``min_duration``.
+    """
+    cursor = {key: window_start for key in keys}
+    gaps = {key: [] for key in keys}
+
+    for key, start, end in rows:
+        if key not in cursor:
+            cursor[key] = window_start
+            gaps[key] = []
+        start = max(start, window_start)
+        end = min(end, window_end)
+        if start - cursor[key] >= min_duration:
+            gaps[key].append((cursor[key], start))
+        if end > cursor[key]:
+            cursor[key] = end
+
+    for key, free_from in cursor.items():
+        if window_end - free_from >= min_duration:
+            gaps[key].append((free_from, window_end))
+
+    return gaps
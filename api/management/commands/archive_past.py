@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from api.archive import archive_past, retention_cutoff
+
+
+class Command(BaseCommand):
+    help = "Presunie staré sloty a ich rezervácie do archívnych tabuliek po dávkach."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=None, help="Retenčné okno v dňoch (default ARCHIVE_RETENTION_DAYS).")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Počet slotov v jednej transakcii.")
+        parser.add_argument("--max-batches", type=int, default=None, help="Zastaví sa po N dávkach (pre obmedzenie behu).")
+
+    def handle(self, *args, **options):
+        cutoff = retention_cutoff(options["days"])
+        total_slots = total_reservations = 0
+        for slots, reservations in archive_past(cutoff, options["batch_size"], options["max_batches"]):
+            total_slots += slots
+            total_reservations += reservations
+            self.stdout.write(f"Archivovaných slotov: {slots}, rezervácií: {reservations}")
+        self.stdout.write(f"Spolu archivované (koniec pred {cutoff:%Y-%m-%d %H:%M}): slotov {total_slots}, rezervácií {total_reservations}")
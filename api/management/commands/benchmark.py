@@ -0,0 +1,754 @@
+"""
+Výkonnostné benchmarky endpointov na vygenerovaných dátach.
+
+    python manage.py benchmark                 # vsetky scenare
+    python manage.py benchmark free_rooms      # jeden scenar
+    python manage.py benchmark --list
+
+Každý scenár si vygeneruje dáta v transakcii, ktorá sa na konci vráti (rollback),
+takže lokálna DB zostane nezmenená. Výsledok je medián a p95 latencie + počet dotazov.
+"""
+
+import statistics
+import time
+from datetime import timedelta
+from urllib.parse import urlencode
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.models import Role, User
+from api.models import Activity, ActivitySlot, Reservation
+
+SCENARIOS = {}
+
+
+def scenario(name, description):
+    def decorator(func):
+        SCENARIOS[name] = (func, description)
+        return func
+    return decorator
+
+
+class Rollback(Exception):
+    pass
+
+
+class Bench:
+    """Helpery pre scenare: pouzivatelia s tokenom, meranie requestov."""
+
+    def __init__(self, stdout, repeat):
+        self.stdout = stdout
+        self.repeat = repeat
+        self.client = Client(HTTP_HOST="localhost")  # ALLOWED_HOSTS v DEBUG povoluje localhost
+        self.roles = {role.name: role for role in Role.objects.all()}
+        self._counter = 0
+
+    def user(self, role="student"):
+        self._counter += 1
+        return User.objects.create_user(
+            username=f"bench-{role}-{self._counter}",
+            email=f"bench-{role}-{self._counter}@bench.local",
+            password="bench",
+            role=self.roles[role],
+        )
+
+    def auth(self, user):
+        return {"HTTP_AUTHORIZATION": f"Bearer {RefreshToken.for_user(user).access_token}"}
+
+    def measure(self, label, func, repeat=None, max_queries=None):
+        timings = []
+        queries = 0
+        result = None
+        for _ in range(repeat or self.repeat):
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                result = func()
+                timings.append((time.perf_counter() - started) * 1000)
+            queries = len(context.captured_queries)
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(
+            f"  {label}: median {statistics.median(timings):.2f} ms, p95 {p95:.2f} ms, {queries} queries"
+        )
+        if max_queries is not None and queries > max_queries:
+            raise CommandError(f"{label}: {queries} queries, povolené najviac {max_queries}")
+        return result
+
+    def get(self, label, url, user, params=None, max_queries=None, **extra):
+        headers = self.auth(user)
+        if params:
+            url = f"{url}?{urlencode(params)}"
+
+        def request():
+            response = self.client.get(url, **headers, **extra)
+            if response.status_code >= 400:
+                raise CommandError(f"{url} -> {response.status_code}: {response.content[:300]}")
+            return response
+
+        return self.measure(label, request, max_queries=max_queries)
+
+    def post(self, label, url, user, payloads, method="post", max_queries=None):
+        """
+        POST/PATCH/DELETE s inym payloadom v kazdom opakovani (payloads je iterator dictov).
+        ``url`` moze byt funkcia payloadu (id v ceste).
+        """
+        headers = self.auth(user)
+        payloads = iter(payloads)
+
+        def request():
+            payload = next(payloads)
+            target = url(payload) if callable(url) else url
+            response = getattr(self.client, method)(target, payload, content_type="application/json", **headers)
+            if response.status_code >= 400:
+                raise CommandError(f"{target} -> {response.status_code}: {response.content[:300]}")
+            return response
+
+        return self.measure(label, request, max_queries=max_queries)
+
+
+@scenario("free_rooms", "rooms/free/ pre 50 miestností a celý týždeň")
+def bench_free_rooms(bench):
+    teacher = bench.user("teacher")
+    role = bench.roles["student"]
+    week_start = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=7)
+
+    activities = Activity.objects.bulk_create([
+        Activity(name=f"Room activity {room}", description="", capacity=10, available_hours="7:30-16:00",
+                 room=str(room), role=role, created_by=teacher)
+        for room in range(1, 51)
+    ])
+    slots = []
+    for activity in activities:
+        for day in range(7):
+            for lesson in range(8):
+                if (day + lesson + activity.id) % 3 == 0:
+                    continue
+                start = week_start + timedelta(days=day, hours=7, minutes=45 * lesson + 10 * lesson)
+                slots.append(ActivitySlot(activity=activity, teacher=teacher, start_date=start, end_date=start + timedelta(minutes=45)))
+    ActivitySlot.objects.bulk_create(slots)
+    bench.stdout.write(f"  seeded {len(activities)} rooms, {len(slots)} slots")
+
+    params = {"start": week_start.isoformat(), "end": (week_start + timedelta(days=7)).isoformat(), "min_duration": 30}
+    bench.get("GET rooms/free/ (week, 50 rooms)", "/api/rooms/free/", teacher, params)
+
+
+class Command(BaseCommand):
+    help = "Spustí výkonnostné benchmarky endpointov na vygenerovaných dátach (DB sa nezmení)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("scenarios", nargs="*", help="Mená scenárov (default všetky).")
+        parser.add_argument("--list", action="store_true", help="Vypíše dostupné scenáre.")
+        parser.add_argument("--repeat", type=int, default=20, help="Počet opakovaní merania.")
+
+    def handle(self, *args, **options):
+        if options["list"]:
+            for name, (_, description) in SCENARIOS.items():
+                self.stdout.write(f"{name}: {description}")
+            return
+
+        names = options["scenarios"] or list(SCENARIOS)
+        unknown = [name for name in names if name not in SCENARIOS]
+        if unknown:
+            raise CommandError(f"Neznámy scenár: {', '.join(unknown)}")
+
+        for name in names:
+            func, description = SCENARIOS[name]
+            self.stdout.write(f"{name} - {description}")
+            try:
+                with transaction.atomic():
+                    func(Bench(self.stdout, options["repeat"]))
+                    raise Rollback()
+            except Rollback:
+                pass
+
+
+@scenario("reservation_overlap", "reservations/create/, zmena statusu a zmazanie pre študenta s veľkou históriou rezervácií")
+def bench_reservation_overlap(bench):
+    teacher = bench.user("teacher")
+    now = timezone.now()
+    activities = Activity.objects.bulk_create([
+        Activity(name=f"History activity {i}", description="", capacity=1000, available_hours="0:00-23:59",
+                 room=f"H{i}", role=bench.roles["student"], created_by=teacher)
+        for i in range(20)
+    ])
+    past = ActivitySlot.objects.bulk_create([
+        ActivitySlot(activity=activities[i % 20], teacher=teacher,
+                     start_date=now - timedelta(hours=i + 2), end_date=now - timedelta(hours=i + 1))
+        for i in range(5000)
+    ])
+    future = ActivitySlot.objects.bulk_create([
+        ActivitySlot(activity=activities[i % 20], teacher=teacher,
+                     start_date=now + timedelta(hours=2 * i + 1), end_date=now + timedelta(hours=2 * i + 2))
+        for i in range(bench.repeat * 2)
+    ])
+
+    # kazda zmena rezervacie zapise len seba a jeden zaznam change logu (+ savepoint transakcie view)
+    for history_size in (0, 5000):
+        student = bench.user("student")
+        Reservation.objects.bulk_create([
+            Reservation(user=student, activity_slot=slot, status=Reservation.Status.APPROVED)
+            for slot in past[:history_size]
+        ])
+        slots = future[:bench.repeat] if history_size == 0 else future[bench.repeat:]
+        bench.post(
+            f"POST reservations/create/ (history {history_size})", "/api/reservations/create/", student,
+            ({"activity_slot": slot.id} for slot in slots), max_queries=8,
+        )
+
+    created = list(Reservation.objects.filter(user=student, activity_slot__in=future).values_list("id", flat=True))
+    bench.post(
+        "PATCH reservations/change_status/ (history 5000)", lambda payload: f"/api/reservations/change_status/{payload['id']}/",
+        teacher, ({"id": reservation_id, "status": "approved"} for reservation_id in created), method="patch", max_queries=5,
+    )
+    bench.post(
+        "DELETE reservations/delete/ (history 5000)", lambda payload: f"/api/reservations/delete/{payload['id']}/",
+        student, ({"id": reservation_id} for reservation_id in created), method="delete", max_queries=5,
+    )
+
+
+@scenario("activity_search", "activities/search/ nad 100k aktivitami")
+def bench_activity_search(bench):
+    from api.search import rebuild_index
+
+    teacher = bench.user("teacher")
+    student = bench.user("student")
+    roles = [bench.roles["student"], bench.roles["teacher"]]
+    prefixes = ["Posilňovňa", "PlayStation", "Čitáreň", "Telocvičňa", "Učebňa", "Konzultácia", "Hudobňa", "Laboratórium",
+                "Krúžok", "Dielňa", "Ateliér", "Šach", "Robotika", "Debata", "Zborovňa", "Knižnica"]
+    subjects = [f"{syllable}{suffix}" for syllable in ("mat", "fyz", "chem", "bio", "dej", "geo", "inf", "ang", "nem", "slov",
+                                                      "hud", "vyt", "tel", "eko", "psy", "fil", "ruš", "špa", "lat", "etk")
+                for suffix in ("ika", "ológia", "ácia", "ný", "ový")]
+    Activity.objects.bulk_create([
+        Activity(name=f"{prefixes[i % len(prefixes)]} {subjects[(i // 16) % len(subjects)]} {i // 1600}",
+                 description=f"Rezervácia: {subjects[(i * 7) % len(subjects)]} pre {i % 4 + 1}. ročník",
+                 capacity=5, available_hours="7:30-16:00", category=prefixes[(i * 3) % len(prefixes)], room=str(i % 300),
+                 role=roles[i % 2], created_by=teacher)
+        for i in range(100_000)
+    ], batch_size=5000)
+    bench.stdout.write(f"  seeded 100000 activities, indexed {rebuild_index()}")
+
+    bench.get("GET activities/search/?q=robotika fyzika (student)", "/api/activities/search/", student, {"q": "robotika fyzika"})
+    bench.get("GET activities/search/?q=citaren slov (teacher)", "/api/activities/search/", teacher, {"q": "citaren slov"})
+    # velmi siroky dotaz (~1/16 katalogu) - cenu urcuje ranking vsetkych zhod
+    bench.get("GET activities/search/?q=posilnov (teacher, broad)", "/api/activities/search/", teacher, {"q": "posilnov"})
+
+
+@scenario("activities_list", "activities/ s filtrami, zoradením a stránkovaním nad 50k aktivitami")
+def bench_activities_list(bench):
+    teacher = bench.user("teacher")
+    student = bench.user("student")
+    roles = [bench.roles["student"], bench.roles["teacher"]]
+    categories = ["Šport", "Hudba", "Veda", "Jazyky", "Umenie", "Doučovanie", "Hry", "Iné"]
+    activities = Activity.objects.bulk_create([
+        Activity(name=f"Aktivita {i:05d}", description="", capacity=2, available_hours="7:30-16:00",
+                 category=categories[i % len(categories)], room=str(i % 200), role=roles[i % 2], created_by=teacher)
+        for i in range(50_000)
+    ], batch_size=5000)
+    week_start = timezone.now() + timedelta(days=7)
+    slots = ActivitySlot.objects.bulk_create([
+        ActivitySlot(activity=activities[i * 10], teacher=teacher,
+                     start_date=week_start + timedelta(hours=i % 100), end_date=week_start + timedelta(hours=i % 100, minutes=45))
+        for i in range(5000)
+    ], batch_size=5000)
+    # polovica slotov plna (capacity 2)
+    Reservation.objects.bulk_create([
+        Reservation(user=user, activity_slot=slot, status=Reservation.Status.APPROVED)
+        for slot in slots[::2] for user in (student, teacher)
+    ], batch_size=5000)
+    bench.stdout.write(f"  seeded {len(activities)} activities, {len(slots)} slots")
+
+    # pocet dotazov nesmie zavisiet od velkosti stranky: user + rola (2) + count (1) + stranka (1)
+    bench.get("GET activities/?page=1 (student)", "/api/activities/", student,
+              {"page": 1, "page_size": 50}, max_queries=4)
+    bench.get("GET activities/?page=200&ordering=-name (teacher)", "/api/activities/", teacher,
+              {"page": 200, "page_size": 100, "ordering": "-name"}, max_queries=4)
+    bench.get("GET activities/?category=Hudba&room=17 (teacher)", "/api/activities/", teacher,
+              {"category": "Hudba", "room": "17", "page": 1}, max_queries=4)
+    bench.get("GET activities/?free_from&free_to (teacher)", "/api/activities/", teacher,
+              {"free_from": week_start.isoformat(), "free_to": (week_start + timedelta(days=1)).isoformat(), "page": 1},
+              max_queries=4)
+    # bez stranky = povodne spravanie, cely zoznam (pre porovnanie)
+    bench.get("GET activities/ (student, unpaginated)", "/api/activities/", student, max_queries=3)
+
+
+@scenario("admin_changelist", "admin changelist rezervácií nad 1M riadkami")
+def bench_admin_changelist(bench):
+    from api.search import rebuild_index
+
+    admin_user = bench.user("admin")
+    admin_user.is_staff = admin_user.is_superuser = True
+    admin_user.save(update_fields=["is_staff", "is_superuser"])
+    bench.client.force_login(admin_user)
+
+    teacher = bench.user("teacher")
+    students = User.objects.bulk_create([
+        User(username=f"bench-admin-student-{i}", email=f"bench-admin-student-{i}@bench.local", role=bench.roles["student"])
+        for i in range(1000)
+    ])
+    activities = Activity.objects.bulk_create([
+        Activity(name=f"Admin activity {i}", description="", capacity=1000, available_hours="7:30-16:00",
+                 room=str(i), role=bench.roles["student"], created_by=teacher)
+        for i in range(200)
+    ])
+    rebuild_index()
+    now = timezone.now()
+    slots = ActivitySlot.objects.bulk_create([
+        ActivitySlot(activity=activities[i % 200], teacher=teacher,
+                     start_date=now + timedelta(hours=i), end_date=now + timedelta(hours=i, minutes=45))
+        for i in range(1000)
+    ])
+    statuses = [Reservation.Status.PENDING, Reservation.Status.APPROVED, Reservation.Status.CANCELLED]
+    Reservation.objects.bulk_create((
+        Reservation(user=students[i % 1000], activity_slot=slots[(i // 1000 + i) % 1000], status=statuses[i % 3])
+        for i in range(1_000_000)
+    ), batch_size=10_000)
+    bench.stdout.write("  seeded 1000000 reservations")
+
+    def changelist(params=None):
+        url = "/admin/api/reservation/" + (f"?{urlencode(params)}" if params else "")
+
+        def request():
+            response = bench.client.get(url)
+            if response.status_code != 200:
+                raise CommandError(f"{url} -> {response.status_code}")
+            return response
+        return request
+
+    # pocet dotazov nezavisi od poctu riadkov na stranke (list_select_related)
+    bench.measure("GET admin reservation changelist", changelist(), max_queries=8)
+    bench.measure("GET admin changelist ?p=500", changelist({"p": 500}), max_queries=8)
+    bench.measure("GET admin changelist ?status=approved", changelist({"status__exact": "approved"}), max_queries=8)
+    bench.measure(f"GET admin changelist ?activity={activities[7].id}", changelist({"activity": activities[7].id}), max_queries=9)
+    bench.measure("GET admin changelist ?q=Admin activity 42", changelist({"q": "Admin activity 42"}), max_queries=9)
+    bench.measure("GET admin changelist ?q=<username>", changelist({"q": students[5].username}), max_queries=8)
+
+
+@scenario("heatmap", "stats/heatmap/ za celý rok (kategória s 20 aktivitami)")
+def bench_heatmap(bench):
+    from django.core.cache import cache
+
+    teacher = bench.user("teacher")
+    students = [bench.user("student") for _ in range(3)]
+    activities = Activity.objects.bulk_create([
+        Activity(name=f"Heatmap activity {i}", description="", capacity=3, available_hours="7:30-16:00",
+                 category="Heatmap", room=f"HM{i}", role=bench.roles["student"], created_by=teacher)
+        for i in range(20)
+    ])
+    year_start = timezone.localtime().replace(month=1, day=1, hour=7, minute=30, second=0, microsecond=0)
+    slots = ActivitySlot.objects.bulk_create([
+        ActivitySlot(activity=activity, teacher=teacher,
+                     start_date=year_start + timedelta(days=day, minutes=50 * lesson),
+                     end_date=year_start + timedelta(days=day, minutes=50 * lesson + 45))
+        for day in range(365) for lesson in range(10) for activity in activities
+    ], batch_size=10_000)
+    Reservation.objects.bulk_create([
+        Reservation(user=students[index % 3], activity_slot=slot, status=Reservation.Status.APPROVED)
+        for index, slot in enumerate(slots) for _ in range(index % 3)
+    ], batch_size=10_000)
+    bench.stdout.write(f"  seeded {len(slots)} slots")
+
+    params = {"start": year_start.date().isoformat(), "end": (year_start.date() + timedelta(days=364)).isoformat(),
+              "category": "Heatmap"}
+    url = f"/api/stats/heatmap/?{urlencode(params)}"
+    headers = bench.auth(teacher)
+
+    def cold():
+        cache.clear()
+        return bench.client.get(url, **headers)
+
+    bench.measure("GET stats/heatmap/ (year, uncached)", cold, repeat=min(bench.repeat, 5))
+    bench.get("GET stats/heatmap/ (year, cached)", "/api/stats/heatmap/", teacher, params, max_queries=3)
+
+
+@scenario("archive", "reservations/ pred a po archivácii 3 rokov histórie + reservations/history/")
+def bench_archive(bench):
+    from api.archive import archive_past, retention_cutoff
+
+    teacher = bench.user("teacher")
+    student = bench.user("student")
+    now = timezone.now()
+    activities = Activity.objects.bulk_create([
+        Activity(name=f"Archive activity {i}", description="", capacity=30, available_hours="7:30-16:00",
+                 room=f"A{i}", role=bench.roles["student"], created_by=teacher)
+        for i in range(20)
+    ])
+    # 3 roky historie: ~100k slotov, student ma rezervaciu na kazdom 20. z nich
+    slots = ActivitySlot.objects.bulk_create([
+        ActivitySlot(activity=activities[i % 20], teacher=teacher,
+                     start_date=now - timedelta(minutes=15 * i + 60), end_date=now - timedelta(minutes=15 * i + 15))
+        for i in range(100_000)
+    ] + [
+        ActivitySlot(activity=activities[i % 20], teacher=teacher,
+                     start_date=now + timedelta(hours=i + 1), end_date=now + timedelta(hours=i + 2))
+        for i in range(50)
+    ], batch_size=10_000)
+    Reservation.objects.bulk_create([
+        Reservation(user=student, activity_slot=slot, status=Reservation.Status.APPROVED)
+        for slot in slots[::20]
+    ], batch_size=10_000)
+    bench.stdout.write(f"  seeded {len(slots)} slots, {len(slots[::20])} reservations of one student")
+
+    bench.get("GET reservations/ (student, before archive)", "/api/reservations/", student)
+    bench.get("GET reservations/ (teacher, before archive)", "/api/reservations/", teacher)
+
+    archived = sum(count for count, _ in archive_past(retention_cutoff(30), batch_size=5000))
+    bench.stdout.write(f"  archived {archived} slots")
+
+    bench.get("GET reservations/ (student, after archive)", "/api/reservations/", student)
+    bench.get("GET reservations/ (teacher, after archive)", "/api/reservations/", teacher)
+    first = bench.get("GET reservations/history/ (first page)", "/api/reservations/history/", student, max_queries=3)
+    cursor = first.json()["next_cursor"]
+    for _ in range(20):
+        cursor = bench.client.get("/api/reservations/history/", {"cursor": cursor}, **bench.auth(student)).json()["next_cursor"]
+    bench.get("GET reservations/history/ (page 21)", "/api/reservations/history/", student, {"cursor": cursor}, max_queries=3)
+
+
+@scenario("ical", "calendar/<token>.ics pre učiteľa s 2000 slotmi (render, cache, 304)")
+def bench_ical(bench):
+    from django.core.cache import cache
+
+    from api.models import CalendarFeed
+
+    teacher = bench.user("teacher")
+    student = bench.user("student")
+    activity = Activity.objects.create(name="iCal activity", description="", capacity=20, available_hours="7:30-16:00",
+                                       room="IC1", role=bench.roles["student"], created_by=teacher)
+    now = timezone.now()
+    slots = ActivitySlot.objects.bulk_create([
+        ActivitySlot(activity=activity, teacher=teacher, start_date=now + timedelta(hours=i), end_date=now + timedelta(hours=i, minutes=45))
+        for i in range(2000)
+    ])
+    Reservation.objects.bulk_create([Reservation(user=student, activity_slot=slot, status=Reservation.Status.APPROVED) for slot in slots])
+    feed = CalendarFeed.objects.create(user=teacher)
+    url = f"/api/calendar/{feed.token}.ics"
+
+    def render():
+        cache.clear()
+        return b"".join(bench.client.get(url).streaming_content)
+
+    body = bench.measure("GET .ics (teacher, 2000 slots, render)", render)
+    bench.stdout.write(f"  feed size {len(body) // 1024} kB")
+    bench.measure("GET .ics (cached)", lambda: b"".join(bench.client.get(url).streaming_content), max_queries=2)
+    etag = bench.client.get(url)["ETag"]
+    bench.measure("GET .ics If-None-Match (304)", lambda: bench.client.get(url, HTTP_IF_NONE_MATCH=etag), max_queries=2)
+
+
+@scenario("slots_stampede", "activity-slots/ pri 100 súbežných rovnakých requestoch (singleflight, stale-while-revalidate)")
+def bench_slots_stampede(bench):
+    import threading
+
+    from django.conf import settings
+    from django.core.cache import cache
+    from django.core.signals import request_finished, request_started
+    from django.db import close_old_connections, connections
+    from django.test import override_settings
+
+    from api import singleflight
+
+    teacher = bench.user("teacher")
+    students = [bench.user("student") for _ in range(20)]
+    activity = Activity.objects.create(name="Stampede activity", description="", capacity=20, available_hours="7:30-16:00",
+                                       room="ST1", role=bench.roles["student"], created_by=teacher)
+    start = timezone.now() + timedelta(days=1)
+    slots = ActivitySlot.objects.bulk_create([
+        ActivitySlot(activity=activity, teacher=teacher, start_date=start + timedelta(minutes=30 * i),
+                     end_date=start + timedelta(minutes=30 * i + 25))
+        for i in range(200)
+    ])
+    Reservation.objects.bulk_create([
+        Reservation(user=students[j], activity_slot=slot) for index, slot in enumerate(slots) for j in range(index % 20)
+    ])
+    bench.stdout.write(f"  seeded {len(slots)} slots")
+
+    window = f"{(start - timedelta(hours=1)).isoformat()}/{(start + timedelta(days=5)).isoformat()}".replace("+", "%2B")
+    url = f"/api/activity-slots/{activity.id}/{window}/"
+    headers = bench.auth(students[0])
+    concurrency = 100
+
+    # vlakna pouzivaju spojenie hlavneho vlakna, inak by nevideli data z nezacommitovanej transakcie scenara
+    shared = connections["default"]
+    shared.inc_thread_sharing()
+    # test Client odpaja close_old_connections len na cas jedneho requestu - pri 100 vlaknach by to
+    # nestihal a zdielane spojenie by sa zatvorilo uprostred scenara
+    request_started.disconnect(close_old_connections)
+    request_finished.disconnect(close_old_connections)
+
+    def use_shared_connection():
+        connections["default"] = shared
+
+    def burst(label):
+        barrier = threading.Barrier(concurrency)
+        timings, failures = [], []
+
+        def worker():
+            use_shared_connection()
+            client = Client(HTTP_HOST="localhost")
+            barrier.wait()
+            started = time.perf_counter()
+            response = client.get(url, **headers)
+            timings.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                failures.append(response.status_code)
+
+        singleflight.stats.clear()
+        with CaptureQueriesContext(shared) as context:
+            started = time.perf_counter()
+            threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            wall = (time.perf_counter() - started) * 1000
+        if failures:
+            raise CommandError(f"{label}: {len(failures)} requestov zlyhalo ({failures[0]})")
+        timings.sort()
+        slot_queries = sum('"api_activityslot"' in query["sql"] for query in context.captured_queries)
+        bench.stdout.write(
+            f"  {label}: wall {wall:.0f} ms, median {statistics.median(timings):.1f} ms, "
+            f"p95 {timings[int(len(timings) * 0.95)]:.1f} ms, {slot_queries} slot queries, {dict(singleflight.stats)}"
+        )
+        return slot_queries
+
+    previous_executor = singleflight._executor
+    # refresh na pozadi musi tiez vidiet data scenara
+    singleflight._executor = singleflight.ThreadPoolExecutor(max_workers=1, initializer=use_shared_connection)
+    try:
+        with override_settings(HOT_READ_COALESCING=False):
+            burst(f"{concurrency} concurrent, no coalescing")
+        cache.clear()
+        cold = burst(f"{concurrency} concurrent, cold cache")
+        if cold > 1:
+            raise CommandError(f"cold cache: {cold} výpočtov slotov namiesto 1")
+        burst(f"{concurrency} concurrent, fresh")
+        time.sleep(settings.HOT_READ_FRESH_SECONDS)
+        burst(f"{concurrency} concurrent, stale (1 background refresh)")
+        singleflight._executor.shutdown(wait=True)
+    finally:
+        singleflight._executor = previous_executor
+        shared.dec_thread_sharing()
+        request_started.connect(close_old_connections)
+        request_finished.connect(close_old_connections)
+
+
+@scenario("bootstrap", "bootstrap/ vs. api/ + activities/ + reservations/ + activity-slots/ pre 20 aktivít")
+def bench_bootstrap(bench):
+    from django.test import override_settings
+
+    teacher = bench.user("teacher")
+    student = bench.user("student")
+    start = timezone.now() + timedelta(hours=1)
+    activities = Activity.objects.bulk_create([
+        Activity(name=f"Bootstrap activity {i}", description="Popis " * 20, capacity=5, available_hours="7:30-16:00",
+                 room=f"B{i}", role=bench.roles["student"], created_by=teacher)
+        for i in range(20)
+    ])
+    slots = ActivitySlot.objects.bulk_create([
+        ActivitySlot(activity=activity, teacher=teacher, start_date=start + timedelta(hours=12 * day + lesson),
+                     end_date=start + timedelta(hours=12 * day + lesson, minutes=45))
+        for activity in activities for day in range(7) for lesson in range(2)
+    ])
+    Reservation.objects.bulk_create([Reservation(user=student, activity_slot=slot) for slot in slots[::28]])
+    bench.stdout.write(f"  seeded {len(activities)} activities, {len(slots)} slots")
+
+    headers = bench.auth(student)
+    window = f"{start.isoformat()}/{(start + timedelta(days=7)).isoformat()}".replace("+", "%2B")
+
+    def legacy():
+        for url in ("/api/", "/api/activities/", "/api/reservations/"):
+            bench.client.get(url, **headers)
+        for activity in activities:
+            bench.client.get(f"/api/activity-slots/{activity.id}/{window}/", **headers)
+
+    # prvy start aplikacie ide do prazdnej cache activity-slots/
+    with override_settings(HOT_READ_COALESCING=False):
+        bench.measure("app start: api/ + activities/ + reservations/ + 20x activity-slots/", legacy)
+    response = bench.get("GET bootstrap/ (20 activities, 7 days)", "/api/bootstrap/", student, max_queries=4)
+    bench.stdout.write(f"  bootstrap size {len(response.content) // 1024} kB")
+
+
+@scenario("sparse_fields", "activities/ a reservations/ celé vs. ?fields= (bajty a latencia)")
+def bench_sparse_fields(bench):
+    teacher = bench.user("teacher")
+    students = [bench.user("student") for _ in range(10)]
+    activities = Activity.objects.bulk_create([
+        Activity(name=f"Sparse activity {i}", description="Dlhý popis aktivity. " * 30, capacity=30,
+                 available_hours="7:30-16:00", category="Sparse", room=f"S{i % 40}", role=bench.roles["student"], created_by=teacher)
+        for i in range(2000)
+    ])
+    start = timezone.now() + timedelta(days=1)
+    slots = ActivitySlot.objects.bulk_create([
+        ActivitySlot(activity=activities[i], teacher=teacher, start_date=start + timedelta(hours=i), end_date=start + timedelta(hours=i, minutes=45))
+        for i in range(100)
+    ])
+    Reservation.objects.bulk_create([Reservation(user=student, activity_slot=slot) for slot in slots for student in students])
+    bench.stdout.write(f"  seeded {len(activities)} activities, {len(slots) * len(students)} reservations")
+
+    def compare(label, url, user, params):
+        full = bench.get(f"GET {label}", url, user)
+        sparse = bench.get(f"GET {label}?fields={params['fields']}", url, user, params)
+        bench.stdout.write(f"  size {len(full.content) // 1024} kB -> {len(sparse.content) // 1024} kB")
+
+    compare("activities/ (2000)", "/api/activities/", students[0], {"fields": "id,name"})
+    compare("reservations/ (teacher, 1000)", "/api/reservations/", teacher, {"fields": "id,status,status_label"})
+
+
+@scenario("catalog", "aktivita podľa id: DB + ActivitySerializer vs. mmap snapshot katalógu (api.catalog)")
+def bench_catalog(bench):
+    import os
+    import tempfile
+
+    from api.catalog import ACTIVITY_INTS, ACTIVITY_TEXTS, ROLE_INTS, ROLE_TEXTS, Snapshot, encode
+    from api.serializer import ActivitySerializer
+
+    activities = Activity.objects.bulk_create([
+        Activity(name=f"Catalog activity {i}", description="Dlhý popis aktivity. " * 10, capacity=20,
+                 available_hours="7:30-16:00", opening_hours={"mon": [["07:30", "16:00"]]}, category="Catalog",
+                 room=f"C{i % 40}", role=bench.roles["student"])
+        for i in range(2000)
+    ])
+    ids = [activity.id for activity in activities[::20]]
+
+    # snapshot z dat v transakcii sa zapise do docasneho suboru, nie do zdielaneho (CATALOG_SNAPSHOT_DIR)
+    data = encode(
+        1,
+        list(Activity.objects.order_by("id").values(*ACTIVITY_INTS, *ACTIVITY_TEXTS)),
+        list(Role.objects.order_by("id").values(*ROLE_INTS, *ROLE_TEXTS)),
+    )
+    with tempfile.NamedTemporaryFile(suffix=".bin", delete=False) as f:
+        f.write(data)
+    try:
+        snapshot = Snapshot.open(f.name)
+        bench.stdout.write(f"  seeded {len(activities)} activities, snapshot {len(data) // 1024} kB")
+        from_db = bench.measure(
+            f"{len(ids)}x Activity.objects.get + ActivitySerializer",
+            lambda: [ActivitySerializer(Activity.objects.get(id=pk)).data for pk in ids],
+        )
+        from_snapshot = bench.measure(
+            f"{len(ids)}x Snapshot.activity", lambda: [snapshot.activity(pk) for pk in ids], max_queries=0,
+        )
+        if [dict(row) for row in from_db] != from_snapshot:
+            raise CommandError("Snapshot katalógu sa nezhoduje s ActivitySerializer")
+    finally:
+        os.unlink(f.name)
+
+
+@scenario("availability", "sloty aktivity v rozsahu a najbližší voľný slot: DB vs. index v pamäti (api.availability)")
+def bench_availability(bench):
+    from django.db.models import Q
+
+    from api.availability import AvailabilityIndex, slot_rows, verify
+
+    teacher = bench.user("teacher")
+    students = [bench.user("student") for _ in range(5)]
+    activities = Activity.objects.bulk_create([
+        Activity(name=f"Availability activity {i}", description="", capacity=5, available_hours="7:30-16:00",
+                 room=f"V{i}", role=bench.roles["student"], created_by=teacher)
+        for i in range(100)
+    ])
+    start = timezone.now().replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    slots = ActivitySlot.objects.bulk_create([
+        ActivitySlot(activity=activity, teacher=teacher, start_date=start + timedelta(hours=i), end_date=start + timedelta(hours=i, minutes=45))
+        for activity in activities for i in range(300)
+    ])
+    # prvych 200 slotov kazdej aktivity je plnych
+    Reservation.objects.bulk_create([
+        Reservation(user=student, activity_slot=slot)
+        for slot in slots if (slot.start_date - start) < timedelta(hours=200) for student in students
+    ])
+    bench.stdout.write(f"  seeded {len(activities)} activities, {len(slots)} slots")
+
+    # index sa stavia priamo (v transakcii benchmarku get_index() index nepouziva)
+    index = bench.measure("AvailabilityIndex.build", AvailabilityIndex.build, repeat=3)
+    activity = activities[50]
+    week = (start, start + timedelta(days=7))
+    from_db = bench.measure("sloty na týždeň z DB", lambda: list(slot_rows(Q(activity=activity, start_date__gte=week[0], end_date__lte=week[1]))))
+    from_index = bench.measure("sloty na týždeň z indexu", lambda: index.slots(activity.id).in_range(*week), max_queries=0)
+    if [row[:1] + row[2:5] for row in from_db] != from_index:
+        raise CommandError("Index sa nezhoduje s DB")
+
+    def next_free_db():
+        for slot_id, _, slot_start, slot_end, reserved, capacity in slot_rows(Q(activity=activity, start_date__gte=start)).iterator():
+            if reserved < capacity:
+                return slot_id
+    bench.measure("najbližší voľný slot z DB", next_free_db)
+    bench.measure("najbližší voľný slot z indexu", lambda: index.slots(activity.id).next_free(start), max_queries=0)
+    differences = verify(index)
+    if differences:
+        raise CommandError(f"Index sa nezhoduje s DB: {differences[:3]}")
+
+
+@scenario("next_available", "slots/next-available/: prvých 10 voľných slotov zo 60 000 (index v pamäti vs. DB)")
+def bench_next_available(bench):
+    from django.conf import settings
+    from django.db.models import Count, F, Q
+
+    from api.availability import AvailabilityIndex, _merge_free, next_free_slots
+
+    teacher = bench.user("teacher")
+    student = bench.user("student")
+    activities = Activity.objects.bulk_create([
+        Activity(name=f"Next activity {i}", description="", capacity=1, available_hours="7:30-16:00",
+                 category="Next" if i % 2 else "Other", room=f"N{i}", role=bench.roles["student"], created_by=teacher)
+        for i in range(200)
+    ])
+    start = timezone.now().replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    slots = ActivitySlot.objects.bulk_create([
+        ActivitySlot(activity=activity, teacher=teacher, start_date=start + timedelta(hours=i), end_date=start + timedelta(hours=i, minutes=45))
+        for activity in activities for i in range(300)
+    ])
+    # prvych 250 hodin je vsetko obsadene - hladanie musi preskocit 50 000 plnych slotov
+    Reservation.objects.bulk_create([
+        Reservation(user=student, activity_slot=slot) for slot in slots if slot.start_date < start + timedelta(hours=250)
+    ])
+    bench.stdout.write(f"  seeded {len(activities)} activities, {len(slots)} slots")
+    before = start + timedelta(days=30)
+
+    def group_by():
+        # naivne: obsadenost cez GROUP BY pre vsetky sloty v rozsahu, az potom zoradit a orezat
+        return list(
+            ActivitySlot.objects.filter(start_date__gte=start, start_date__lt=before)
+            .annotate(reserved=Count("reservation", filter=~Q(reservation__status=Reservation.Status.CANCELLED)))
+            .filter(reserved__lt=F("activity__capacity"))
+            .order_by("start_date", "id")
+            .values_list("id", flat=True)[:10]
+        )
+
+    expected = bench.measure("GROUP BY + ORDER BY + LIMIT", group_by)
+    enabled = settings.AVAILABILITY_INDEX
+    settings.AVAILABILITY_INDEX = False
+    try:
+        from_db = bench.measure("sken podľa api_slot_start_idx + LIMIT", lambda: next_free_slots(None, start, before, limit=10))
+    finally:
+        settings.AVAILABILITY_INDEX = enabled
+    index = AvailabilityIndex.build()
+    from_index = bench.measure("index v pamäti (halda)", lambda: _merge_free(index.activities, start, before, None, 10), max_queries=0)
+    if expected != [row[0] for row in from_db] or expected != [row[0] for row in from_index]:
+        raise CommandError("Výsledky sa líšia")
+
+
+@scenario("opening_hours", "kontrola 5000 termínov voči otváracím hodinám: bisect po slotoch vs. np.searchsorted")
+def bench_opening_hours(bench):
+    from api.opening_hours import compile_opening_hours
+
+    compiled = compile_opening_hours({
+        day: [["07:30", "12:00"], ["12:30", "16:00"]] for day in ["mon", "tue", "wed", "thu", "fri"]
+    })
+    week_start = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=7)
+    # semester: 5000 terminov po 45 minut, cast mimo otvaracich hodin
+    intervals = [
+        (start, start + timedelta(minutes=45))
+        for start in (week_start + timedelta(minutes=25 * i) for i in range(5000))
+    ]
+
+    per_slot = bench.measure(
+        "contains() v cykle", lambda: [i for i, (start, end) in enumerate(intervals) if not compiled.contains(start, end)],
+        max_queries=0,
+    )
+    vectorized = bench.measure("outside() (np.searchsorted)", lambda: compiled.outside(intervals), max_queries=0)
+    if per_slot != vectorized:
+        raise CommandError("Výsledky sa líšia")
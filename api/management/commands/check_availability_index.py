@@ -0,0 +1,52 @@
+"""
+Kontrola indexu voľnej kapacity (api.availability) voči DB.
+
+    python manage.py check_availability_index                    # postavi index a porovna s DB
+    python manage.py check_availability_index --watch 60         # minutu drzi index ako worker
+                                                                 # (zmeny z change logu) a porovnava
+
+Pri --watch sa každých --interval sekúnd index zosynchronizuje rovnako ako vo workeri a porovná
+s čerstvým stavom DB - rozdiel znamená zmenu, ktorú index nezachytil. Chyba (exit 1), ak sa našiel rozdiel.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api.availability import AvailabilityIndex, verify
+
+
+class Command(BaseCommand):
+    help = "Porovná index voľnej kapacity slotov (api.availability) s databázou."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--past-days", type=int, help="Okno indexu (default AVAILABILITY_INDEX_PAST_DAYS).")
+        parser.add_argument("--watch", type=float, default=0, help="Ako dlho (s) sledovať zmeny a porovnávať.")
+        parser.add_argument("--interval", type=float, default=5, help="Interval porovnania pri --watch (s).")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        index = AvailabilityIndex.build(options["past_days"])
+        self.stdout.write(
+            f"Index: {len(index.activities)} aktivít, {len(index.slot_activity)} slotov "
+            f"od {timezone.localtime(index.window_start):%Y-%m-%d %H:%M}, {(time.perf_counter() - started) * 1000:.1f} ms"
+        )
+
+        differences = verify(index)
+        deadline = time.monotonic() + options["watch"]
+        while not differences and time.monotonic() < deadline:
+            time.sleep(options["interval"])
+            index.sync()
+            if index.needs_rebuild:
+                self.stdout.write("  zmazaná rezervácia alebo veľa zmien -> index sa stavia znova")
+                index = AvailabilityIndex.build(options["past_days"])
+            index.reload_dirty()
+            differences = verify(index)
+            self.stdout.write(f"  {time.strftime('%H:%M:%S')} kurzor {index.cursor}: {len(differences)} rozdielov")
+
+        for difference in differences:
+            self.stdout.write(f"  {difference}")
+        if differences:
+            raise CommandError(f"Index sa nezhoduje s DB ({len(differences)} rozdielov)")
+        self.stdout.write("Index sa zhoduje s DB.")
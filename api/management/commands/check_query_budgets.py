@@ -0,0 +1,26 @@
+"""
+Kontrola rozpočtu dotazov pre každú URL z api.urls a accounts.urls.
+
+    python manage.py check_query_budgets             # rozpocet dotazov (QUERY_BUDGETS / QUERY_BUDGET_DEFAULT)
+    python manage.py check_query_budgets --timing    # aj casovy rozpocet (ms)
+
+Spustí test app.tests.QueryBudgetTests (beží aj v `manage.py test`): každý endpoint sa zavolá raz
+na testovacej DB a počítajú sa jeho dotazy vrátane on_commit callbackov. Requesty pre jednotlivé URL
+sú v app.tests.SPECS - nová URL bez requestu (alebo dôvodu v SKIP) kontrolu zhodí.
+"""
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+
+class Command(BaseCommand):
+    help = "Zavolá každú URL z api.urls a accounts.urls a overí rozpočet dotazov (QUERY_BUDGETS)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--timing", action="store_true", help="Kontrolovať aj časový rozpočet (ms).")
+
+    def handle(self, *args, **options):
+        with override_settings(QUERY_BUDGET_CHECK_TIMING=options["timing"] or settings.QUERY_BUDGET_CHECK_TIMING):
+            call_command("test", "app.tests.QueryBudgetTests", verbosity=options["verbosity"])
@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import ChangeLogEntry
+
+
+class Command(BaseCommand):
+    help = "Zmaže staré záznamy change logu (endpoint changes/) po dávkach."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=30, help="Ponechá záznamy mladšie ako N dní.")
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        deleted_total = 0
+        while True:
+            # id je monotonne, staci najst hranicu davky a zmazat rozsah podla primarneho kluca
+            ids = list(
+                ChangeLogEntry.objects.filter(created_at__lt=cutoff)
+                .order_by("id")
+                .values_list("id", flat=True)[:options["batch_size"]]
+            )
+            if not ids:
+                break
+            deleted, _ = ChangeLogEntry.objects.filter(id__lte=ids[-1]).delete()
+            deleted_total += deleted
+        self.stdout.write(f"Zmazaných záznamov: {deleted_total}")
@@ -0,0 +1,127 @@
+"""
+Meranie štartu workera: import app.wsgi, prvý a druhý request, import-time profil.
+
+    python manage.py profile_startup                            # 5 behov, tabulka
+    python manage.py profile_startup --warmup                   # s WARMUP_ON_BOOT=1
+    python manage.py profile_startup --history startup.jsonl    # pripise vysledok (sledovanie v case)
+    python manage.py profile_startup --max-ms 800               # chyba, ak boot + prvy request > 800 ms
+
+Každý beh je nový proces `python -X importtime`, ktorý naimportuje app.wsgi (ako gunicorn) a pošle
+dva neautentifikované requesty na /api/ priamo cez WSGI aplikáciu (bez DB). Výstup: mediány časov
+a balíčky s najväčším vlastným časom importu (sčítané za všetky moduly balíčka).
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+PROBE = """
+import json, time
+from wsgiref.util import setup_testing_defaults
+
+started = time.perf_counter()
+import app.wsgi
+booted = time.perf_counter()
+
+def request():
+    environ = {"PATH_INFO": "/api/", "REQUEST_METHOD": "GET"}
+    setup_testing_defaults(environ)
+    begin = time.perf_counter()
+    b"".join(app.wsgi.application(environ, lambda status, headers, exc_info=None: None))
+    return (time.perf_counter() - begin) * 1000
+
+first = request()
+second = request()
+print(json.dumps({"boot_ms": (booted - started) * 1000, "first_request_ms": first, "second_request_ms": second}))
+"""
+
+METRICS = ("boot_ms", "first_request_ms", "second_request_ms")
+
+
+def parse_importtime(stderr):
+    """Sum of self import time (ms) per top-level package from ``-X importtime`` output."""
+    packages = defaultdict(float)
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        packages[name.split(".")[0]] += int(self_us) / 1000
+    return packages
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = "Zmeria čas štartu workera (import app.wsgi + prvý request) a import-time profil."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5, help="Počet behov (nových procesov).")
+        parser.add_argument("--top", type=int, default=15, help="Počet najdrahších balíčkov vo výpise.")
+        parser.add_argument("--warmup", action="store_true", help="Spustí s WARMUP_ON_BOOT=1.")
+        parser.add_argument("--history", help="Súbor (JSON lines), ku ktorému sa pripíše výsledok.")
+        parser.add_argument("--max-ms", type=float, help="Chyba, ak medián boot + prvý request presiahne limit.")
+
+    def run_probe(self, env):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", PROBE],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            raise CommandError(f"Štart zlyhal:\n{result.stderr[-2000:]}")
+        return json.loads(result.stdout.strip().splitlines()[-1]), parse_importtime(result.stderr)
+
+    def handle(self, *args, **options):
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", "app.settings")}
+        env["WARMUP_ON_BOOT"] = "1" if options["warmup"] else "0"
+
+        samples = defaultdict(list)
+        packages = defaultdict(list)
+        for _ in range(options["runs"]):
+            timings, imports = self.run_probe(env)
+            for metric in METRICS:
+                samples[metric].append(timings[metric])
+            for name, ms in imports.items():
+                packages[name].append(ms)
+
+        medians = {metric: round(statistics.median(values), 2) for metric, values in samples.items()}
+        total = medians["boot_ms"] + medians["first_request_ms"]
+        self.stdout.write(f"Behy: {options['runs']}, warmup: {'áno' if options['warmup'] else 'nie'}")
+        for metric in METRICS:
+            self.stdout.write(f"  {metric}: median {medians[metric]:.2f} ms")
+        self.stdout.write(f"  boot + prvý request: {total:.2f} ms")
+
+        top = sorted(((statistics.median(values), name) for name, values in packages.items()), reverse=True)
+        self.stdout.write("Najdrahšie balíčky (vlastný čas importu, medián):")
+        for ms, name in top[:options["top"]]:
+            self.stdout.write(f"  {ms:8.2f} ms  {name}")
+
+        if options["history"]:
+            record = {
+                "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "revision": git_revision(),
+                "python": sys.version.split()[0],
+                "runs": options["runs"],
+                "warmup": options["warmup"],
+                **medians,
+                "top_imports": {name: round(ms, 2) for ms, name in top[:options["top"]]},
+            }
+            with open(options["history"], "a", encoding="utf-8") as history:
+                history.write(json.dumps(record) + "\n")
+            self.stdout.write(f"Výsledok pripísaný do {options['history']}")
+
+        if options["max_ms"] is not None and total > options["max_ms"]:
+            raise CommandError(f"Štart trvá {total:.2f} ms, povolené najviac {options['max_ms']:.0f} ms")
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from api.catalog import Snapshot, publish, snapshot_path
+
+
+class Command(BaseCommand):
+    help = "Vytvorí snapshot katalógu aktivít a rolí (api.catalog) z DB a nahradí ním súbor, ktorý mapujú workery."
+
+    def handle(self, *args, **options):
+        version = publish()
+        snapshot = Snapshot.open(snapshot_path())
+        self.stdout.write(
+            f"Snapshot {version}: {snapshot.activities.count} aktivít, {snapshot.roles.count} rolí, "
+            f"{snapshot.file_id[2]} B -> {snapshot.path}"
+        )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    help = "Zmaže expirované Idempotency-Key záznamy (IDEMPOTENCY_TTL_SECONDS) po dávkach."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        deleted = purge_expired(batch_size=options["batch_size"])
+        self.stdout.write(f"Zmazaných záznamov: {deleted}")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Prestavia fulltextový index aktivít (napr. po bulk importe, ktorý nespúšťa signály)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        total = rebuild_index(options["batch_size"])
+        self.stdout.write(f"Zaindexovaných aktivít: {total}")
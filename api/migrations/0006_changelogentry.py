@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:09
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_alter_activity_image_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(help_text='activity, activity_slot alebo reservation', max_length=30)),
+                ('object_id', models.BigIntegerField()),
+                ('operation', models.CharField(choices=[('created', 'Vytvorené'), ('updated', 'Upravené'), ('deleted', 'Zmazané')], max_length=10)),
+                ('role_id', models.BigIntegerField(blank=True, null=True)),
+                ('user_id', models.BigIntegerField(blank=True, null=True)),
+                ('teacher_id', models.BigIntegerField(blank=True, null=True)),
+                ('data', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_seed_default_roles'),
+        ('api', '0006_changelogentry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['room'], name='api_activity_room_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activityslot',
+            index=models.Index(fields=['teacher', 'end_date', 'start_date'], name='api_slot_teacher_range_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activityslot',
+            index=models.Index(fields=['activity', 'start_date', 'end_date'], name='api_slot_activity_range_idx'),
+        ),
+    ]
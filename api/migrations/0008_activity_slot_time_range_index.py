@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_activity_slot_range_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activityslot',
+            index=models.Index(fields=['end_date', 'start_date'], name='api_slot_range_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_activity_slot_time_range_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['user', 'activity_slot', 'status'], name='api_reservation_user_slot_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:15
+
+import re
+
+from django.db import migrations, models
+
+WEEKDAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+RANGE_RE = re.compile(r"(\d{1,2})[:.](\d{2})\s*[-–]\s*(\d{1,2})[:.](\d{2})")
+
+
+# prevedie existujuci text available_hours (napr. "7:30-16:00") na strukturovane opening_hours,
+# text nema dni, takze rozsahy plati pre kazdy den; neparsovatelny text -> null (bez obmedzenia)
+def parse_available_hours(apps, schema_editor):
+    Activity = apps.get_model("api", "Activity")
+    for activity in Activity.objects.only("id", "available_hours").iterator():
+        ranges = []
+        for start_h, start_m, end_h, end_m in RANGE_RE.findall(activity.available_hours or ""):
+            start, end = int(start_h) * 60 + int(start_m), int(end_h) * 60 + int(end_m)
+            if 0 <= start < end <= 24 * 60:
+                ranges.append([f"{start // 60:02d}:{start % 60:02d}", f"{end // 60:02d}:{end % 60:02d}"])
+        if ranges:
+            Activity.objects.filter(id=activity.id).update(opening_hours={day: sorted(ranges) for day in WEEKDAYS})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_reservation_user_slot_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activity',
+            name='opening_hours',
+            field=models.JSONField(blank=True, help_text='Otváracie hodiny podľa dní, napr. {"mon": [["07:30", "16:00"]]}. Null = bez obmedzenia.', null=True),
+        ),
+        migrations.AlterField(
+            model_name='activity',
+            name='available_hours',
+            field=models.CharField(help_text='Dostupné hodiny aktivity, napr. 7:30-16:00 (textová forma opening_hours, kvôli kompatibilite).', max_length=200),
+        ),
+        migrations.RunPython(parse_available_hours, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+import unicodedata
+
+from django.db import migrations
+
+# kopia z api.search v case vytvorenia migracie - migracia nesmie zavisiet od ziveho kodu
+SQLITE_CREATE = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS api_activity_fts USING fts5("
+    "name, description, category, room, role_token, tokenize = 'unicode61 remove_diacritics 2')"
+)
+POSTGRES_CREATE = [
+    "CREATE TABLE IF NOT EXISTS api_activity_search ("
+    "activity_id bigint PRIMARY KEY REFERENCES api_activity(id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+    "role_id bigint NOT NULL, document tsvector NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS api_activity_search_document_gin ON api_activity_search USING GIN (document)",
+    "CREATE INDEX IF NOT EXISTS api_activity_search_role_id ON api_activity_search (role_id)",
+]
+
+
+def normalize(text):
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).lower()
+
+
+def create(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute(SQLITE_CREATE)
+    elif vendor == "postgresql":
+        for sql in POSTGRES_CREATE:
+            schema_editor.execute(sql)
+    else:
+        return
+
+    # naplnenie indexu existujucimi aktivitami
+    Activity = apps.get_model("api", "Activity")
+    with schema_editor.connection.cursor() as cursor:
+        for activity in Activity.objects.only("id", "name", "description", "category", "room", "role_id").iterator():
+            document = [normalize(value) for value in (activity.name, activity.description, activity.category, activity.room)]
+            if vendor == "sqlite":
+                cursor.execute(
+                    "INSERT INTO api_activity_fts (rowid, name, description, category, room, role_token) VALUES (%s, %s, %s, %s, %s, %s)",
+                    [activity.id, *document, f"role{activity.role_id}"]
+                )
+            else:
+                cursor.execute(
+                    "INSERT INTO api_activity_search (activity_id, role_id, document) VALUES (%s, %s, "
+                    "setweight(to_tsvector('simple', %s), 'A') || setweight(to_tsvector('simple', %s), 'D') || "
+                    "setweight(to_tsvector('simple', %s), 'B') || setweight(to_tsvector('simple', %s), 'B'))",
+                    [activity.id, activity.role_id, *document]
+                )
+
+
+def drop(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute("DROP TABLE IF EXISTS api_activity_fts")
+    elif vendor == "postgresql":
+        schema_editor.execute("DROP TABLE IF EXISTS api_activity_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_activity_opening_hours'),
+    ]
+
+    operations = [
+        migrations.RunPython(create, drop),
+    ]
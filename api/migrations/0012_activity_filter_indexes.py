@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_seed_default_roles'),
+        ('api', '0011_activity_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['role', 'name'], name='api_activity_role_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['category', 'name'], name='api_activity_category_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['name'], name='api_activity_name_idx'),
+        ),
+    ]
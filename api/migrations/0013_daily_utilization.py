@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_activity_filter_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyUtilization',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(help_text='Lokálny dátum začiatku slotov.')),
+                ('room', models.CharField(max_length=20)),
+                ('slots', models.PositiveIntegerField(default=0)),
+                ('capacity', models.PositiveIntegerField(default=0, help_text='Súčet kapacity všetkých slotov dňa.')),
+                ('reservations', models.PositiveIntegerField(default=0, help_text='Všetky rezervácie vrátane zrušených.')),
+                ('active', models.PositiveIntegerField(default=0, help_text='Nezrušené rezervácie (obsadzujú kapacitu).')),
+                ('approved', models.PositiveIntegerField(default=0)),
+                ('cancelled', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('activity', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.activity')),
+                ('teacher', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date', 'room'], name='api_dailyutil_date_room_idx'), models.Index(fields=['teacher', 'date'], name='api_dailyutil_teacher_date_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('teacher__isnull', False)), fields=('date', 'activity', 'teacher'), name='api_dailyutilization_bucket_uniq'), models.UniqueConstraint(condition=models.Q(('teacher__isnull', True)), fields=('date', 'activity'), name='api_dailyutilization_bucket_no_teacher_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_calendar_feed'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100)),
+                ('fingerprint', models.CharField(help_text='sha256 metódy, cesty a tela requestu.', max_length=64)),
+                ('status_code', models.PositiveSmallIntegerField(blank=True, help_text='Prázdne, kým sa request spracúva.', null=True)),
+                ('response', models.BinaryField(blank=True, help_text='Telo odpovede ako zlib komprimovaný JSON.', null=True)),
+                ('locked_at', models.DateTimeField()),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'key'), name='api_idempotency_user_key_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_idempotency_keys'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activityslot',
+            index=models.Index(fields=['start_date'], name='api_slot_start_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_slot_start_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='calendarfeed',
+            name='version',
+            field=models.PositiveBigIntegerField(default=1, help_text='Zvyšuje sa pri novom tokene (časť ETagu feedu).'),
+        ),
+        migrations.AddIndex(
+            model_name='changelogentry',
+            index=models.Index(fields=['user_id', 'id'], name='api_changelog_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='changelogentry',
+            index=models.Index(fields=['teacher_id', 'id'], name='api_changelog_teacher_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='changelogentry',
+            index=models.Index(fields=['model', 'object_id'], name='api_changelog_object_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_catalog_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserLastWrite',
+            fields=[
+                ('user_id', models.PositiveBigIntegerField(primary_key=True, serialize=False)),
+                ('written_at', models.DateTimeField()),
+            ],
+        ),
+    ]
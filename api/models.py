@@ -1,7 +1,10 @@
+import secrets
+
 from django.db import models
 from accounts.models import Role
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
 
 
 # funcia na ziskanie admina z tabulky users pre default 'created_by' v Activity modelu ľš
@@ -15,7 +18,9 @@ class Activity(models.Model):
     name = models.CharField(max_length=150, blank=False)
     description = models.TextField()
     capacity = models.IntegerField(blank=False)
-    available_hours = models.CharField(max_length=200, help_text="Dostupné hodiny aktivity, napr. 7:30-16:00.")
+    available_hours = models.CharField(max_length=200, help_text="Dostupné hodiny aktivity, napr. 7:30-16:00 (textová forma opening_hours, kvôli kompatibilite).")
+    opening_hours = models.JSONField(null=True, blank=True, help_text="Otváracie hodiny podľa dní, napr. {\"mon\": [[\"07:30\", \"16:00\"]]}." \
+    " Null = bez obmedzenia.")
     color = models.CharField(max_length=150, default="#778899", help_text="Farba aktivity pre zobrazenie v kalendári(hex kód).")
     category = models.CharField(max_length=100, null=True)
     room = models.CharField(max_length=20, help_text="Miestnosť alebo miesto konania aktivity.")
@@ -26,8 +31,23 @@ class Activity(models.Model):
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, default=get_default_admin_user,
     help_text="Ucitel ktorý vytvoril aktivitu, (kôli filtrovanie pre 'moje aktivity') default je prvý pouzivatel v tabulke s role admin")
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["room"], name="api_activity_room_idx"),
+            # filtre a zoradenie v get_activities (rola + nazov je default pre studentov)
+            models.Index(fields=["role", "name"], name="api_activity_role_name_idx"),
+            models.Index(fields=["category", "name"], name="api_activity_category_name_idx"),
+            models.Index(fields=["name"], name="api_activity_name_idx"),
+        ]
+
     def __str__(self):
         return self.name
+
+    def is_open_at(self, value):
+        from .opening_hours import compile_opening_hours
+
+        compiled = compile_opening_hours(self.opening_hours)
+        return compiled is None or compiled.is_open_at(value)
     
 
 class ActivitySlot(models.Model):
@@ -37,6 +57,16 @@ class ActivitySlot(models.Model):
     start_date = models.DateTimeField()
     end_date = models.DateTimeField()
 
+    class Meta:
+        indexes = [
+            # range dotazy na kolizie terminov ucitela / miestnosti a sloty aktivity v rozsahu
+            models.Index(fields=["teacher", "end_date", "start_date"], name="api_slot_teacher_range_idx"),
+            models.Index(fields=["activity", "start_date", "end_date"], name="api_slot_activity_range_idx"),
+            models.Index(fields=["end_date", "start_date"], name="api_slot_range_idx"),
+            # najblizsie volne sloty napriec aktivitami (slots/next-available/) - sken v poradi zaciatku
+            models.Index(fields=["start_date"], name="api_slot_start_idx"),
+        ]
+
     def __str__(self):
         return self.activity.name
     
@@ -53,5 +83,168 @@ class Reservation(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=30, choices=Status.choices, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # kontrola prekryvania rezervacii pouzivatela (user -> sloty) bez citania celych riadkov
+            models.Index(fields=["user", "activity_slot", "status"], name="api_reservation_user_slot_idx"),
+        ]
+
     def __str__(self):
         return self.user.username
+
+
+# append-only log zmien pre inkrementalnu synchronizaciu klientov (endpoint changes/?since=<cursor>)
+class ChangeLogEntry(models.Model):
+    class Operation(models.TextChoices):
+        CREATED = "created", "Vytvorené"
+        UPDATED = "updated", "Upravené"
+        DELETED = "deleted", "Zmazané"
+
+    # id (BigAutoField) je kurzor; poradie commitov nemusi sediet s poradim id (vid api.changefeed.safe_cursor)
+    model = models.CharField(max_length=30, help_text="activity, activity_slot alebo reservation")
+    object_id = models.BigIntegerField()
+    operation = models.CharField(max_length=10, choices=Operation.choices)
+    # denormalizovane kvoli filtrovaniu viditelnosti podla role bez joinov (zaznam musi prezit aj zmazanie objektu)
+    role_id = models.BigIntegerField(null=True, blank=True)
+    user_id = models.BigIntegerField(null=True, blank=True)
+    teacher_id = models.BigIntegerField(null=True, blank=True)
+    data = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # verzia .ics feedu (api.ical.feed_state) - zaznamy pouzivatela/ucitela a zmeny konkretnych objektov
+            models.Index(fields=["user_id", "id"], name="api_changelog_user_idx"),
+            models.Index(fields=["teacher_id", "id"], name="api_changelog_teacher_idx"),
+            models.Index(fields=["model", "object_id"], name="api_changelog_object_idx"),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.operation} {self.model} {self.object_id}"
+
+
+# denne suhrny obsadenosti pre reporty (api.rollups), jeden riadok = den x aktivita x ucitel
+class DailyUtilization(models.Model):
+    date = models.DateField(help_text="Lokálny dátum začiatku slotov.")
+    activity = models.ForeignKey(Activity, on_delete=models.CASCADE)
+    teacher = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True)
+    # denormalizovane z aktivity, aby sa dalo agregovat podla miestnosti bez joinu
+    room = models.CharField(max_length=20)
+    slots = models.PositiveIntegerField(default=0)
+    capacity = models.PositiveIntegerField(default=0, help_text="Súčet kapacity všetkých slotov dňa.")
+    reservations = models.PositiveIntegerField(default=0, help_text="Všetky rezervácie vrátane zrušených.")
+    active = models.PositiveIntegerField(default=0, help_text="Nezrušené rezervácie (obsadzujú kapacitu).")
+    approved = models.PositiveIntegerField(default=0)
+    cancelled = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["date", "activity", "teacher"], condition=models.Q(teacher__isnull=False),
+                                    name="api_dailyutilization_bucket_uniq"),
+            models.UniqueConstraint(fields=["date", "activity"], condition=models.Q(teacher__isnull=True),
+                                    name="api_dailyutilization_bucket_no_teacher_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["date", "room"], name="api_dailyutil_date_room_idx"),
+            models.Index(fields=["teacher", "date"], name="api_dailyutil_teacher_date_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.activity_id} {self.teacher_id}"
+
+
+# archiv (studene data): sloty a rezervacie, ktore skoncili pred ARCHIVE_RETENTION_DAYS (api.archive)
+# id zostavaju povodne, aby sa dali sparovat so starymi odkazmi (change log, notifikacie)
+class ArchivedActivitySlot(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    activity = models.ForeignKey(Activity, on_delete=models.CASCADE)
+    teacher = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    start_date = models.DateTimeField()
+    end_date = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["activity", "start_date"], name="api_archslot_activity_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.activity_id} {self.start_date}"
+
+
+class ArchivedReservation(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    activity_slot = models.ForeignKey(ArchivedActivitySlot, on_delete=models.CASCADE)
+    # denormalizovane zo slotu, aby historia (keyset podla start_date, id) bola dotaz nad jednou tabulkou
+    activity = models.ForeignKey(Activity, on_delete=models.CASCADE)
+    teacher = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    start_date = models.DateTimeField()
+    end_date = models.DateTimeField()
+    note = models.TextField(null=True, blank=True)
+    status = models.CharField(max_length=30, choices=Reservation.Status.choices, null=True, blank=True)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "-start_date", "-id"], name="api_archres_user_history_idx"),
+            models.Index(fields=["teacher", "-start_date", "-id"], name="api_archres_teacher_hist_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.start_date}"
+
+
+# verzia katalogu (api.catalog) spolocna pre vsetky stroje - jediny riadok, zmena aktivity/role ju zvysi, publish() ju zapise do suboru
+class CatalogVersion(models.Model):
+    version = models.PositiveBigIntegerField()
+    published_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"v{self.version}"
+
+
+def generate_calendar_token():
+    return secrets.token_urlsafe(32)
+
+
+# odber .ics kalendara (api.ical) - token v URL nahradza prihlasenie, version sa zvysi pri novom tokene
+class CalendarFeed(models.Model):
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="calendar_feed")
+    token = models.CharField(max_length=64, unique=True, default=generate_calendar_token)
+    version = models.PositiveBigIntegerField(default=1, help_text="Zvyšuje sa pri novom tokene (časť ETagu feedu).")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.user_id} v{self.version}"
+
+
+# Idempotency-Key pre POST endpointy (api.idempotency) - ulozena odpoved sa pri opakovani vrati bez spustenia view
+class IdempotencyKey(models.Model):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+    key = models.CharField(max_length=100)
+    fingerprint = models.CharField(max_length=64, help_text="sha256 metódy, cesty a tela requestu.")
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True, help_text="Prázdne, kým sa request spracúva.")
+    response = models.BinaryField(null=True, blank=True, help_text="Telo odpovede ako zlib komprimovaný JSON.")
+    locked_at = models.DateTimeField()
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "key"], name="api_idempotency_user_key_unique"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.key}"
+
+
+# posledny zapis pouzivatela (app.db_router) - jeho citanie ide REPLICA_STICKY_SECONDS na primarnu DB,
+# spolocne pre vsetky procesy a stroje; user_id bez FK, zapis nesmie zlyhat ani pre zmazaneho pouzivatela
+class UserLastWrite(models.Model):
+    user_id = models.PositiveBigIntegerField(primary_key=True)
+    written_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.user_id} {self.written_at:%H:%M:%S}"
@@ -0,0 +1,212 @@
+"""
+Štruktúrované otváracie hodiny aktivity.
+
+Formát (Activity.opening_hours), časy v lokálnom čase (TIME_ZONE), dni bez kľúča sú zatvorené:
+
+    {"mon": [["07:30", "16:00"]], "tue": [["07:30", "12:00"], ["13:00", "16:00"]], ...}
+
+Pre rýchle dotazy sa hodiny skompilujú do dvoch zoradených polí minút od začiatku týždňa
+(pondelok 00:00 = 0, max 7 * 1440). Overenie, či je otvorené / či sa slot zmestí do otváracích
+hodín, je potom binárne vyhľadávanie (pre celú dávku slotov naraz cez np.searchsorted)
+a skompilovaná forma sa cachuje podľa obsahu.
+Pôvodný textový formát (available_hours, napr. "7:30-16:00") ostáva kvôli kompatibilite.
+"""
+
+import json
+import re
+from array import array
+from bisect import bisect_right
+from datetime import datetime
+from functools import lru_cache
+
+from django.utils import timezone
+
+WEEKDAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+WEEKDAY_LABELS = ["Po", "Ut", "St", "Št", "Pi", "So", "Ne"]
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+# 1.1.1970 bol stvrtok (pondelok = 0)
+EPOCH_WEEKDAY = 3
+
+_RANGE_RE = re.compile(r"(\d{1,2})[:.](\d{2})\s*[-–]\s*(\d{1,2})[:.](\d{2})")
+
+
+def _minutes(value):
+    hours, minutes = value.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def _format_minutes(value):
+    return f"{value // 60}:{value % 60:02d}"
+
+
+def normalize_opening_hours(data):
+    """Validate the structure and return it with sorted "HH:MM" ranges. Raises ValueError."""
+    if not isinstance(data, dict):
+        raise ValueError("Otváracie hodiny musia byť objekt s dňami mon-sun.")
+
+    normalized = {}
+    for day, ranges in data.items():
+        if day not in WEEKDAYS:
+            raise ValueError(f"Neznámy deň '{day}', povolené sú {', '.join(WEEKDAYS)}.")
+        if not isinstance(ranges, list):
+            raise ValueError(f"Hodiny pre deň '{day}' musia byť zoznam rozsahov.")
+        day_ranges = []
+        for item in ranges:
+            if not isinstance(item, (list, tuple)) or len(item) != 2:
+                raise ValueError(f"Rozsah pre deň '{day}' musí byť dvojica [\"HH:MM\", \"HH:MM\"].")
+            try:
+                start, end = _minutes(item[0]), _minutes(item[1])
+            except (AttributeError, ValueError):
+                raise ValueError(f"Neplatný čas v rozsahu {item} pre deň '{day}'.")
+            if not 0 <= start < end <= MINUTES_PER_DAY:
+                raise ValueError(f"Neplatný rozsah {item} pre deň '{day}'.")
+            day_ranges.append((start, end))
+        if day_ranges:
+            normalized[day] = [[f"{s // 60:02d}:{s % 60:02d}", f"{e // 60:02d}:{e % 60:02d}"] for s, e in sorted(day_ranges)]
+    return normalized
+
+
+def parse_available_hours(text):
+    """
+    Parse the legacy free-text value (e.g. "7:30-16:00" or "7:30-12:00, 13:00-16:00").
+
+    The old text has no weekdays, so the ranges apply to every day (same behaviour as
+    before, when nothing was restricted by day). Returns None if no range is found.
+    """
+    ranges = []
+    for start_h, start_m, end_h, end_m in _RANGE_RE.findall(text or ""):
+        start, end = int(start_h) * 60 + int(start_m), int(end_h) * 60 + int(end_m)
+        if 0 <= start < end <= MINUTES_PER_DAY:
+            ranges.append([_format_minutes(start), _format_minutes(end)])
+    if not ranges:
+        return None
+    return normalize_opening_hours({day: ranges for day in WEEKDAYS})
+
+
+def format_opening_hours(hours):
+    """Human readable string for the legacy available_hours field."""
+    def day_text(day):
+        return ", ".join(f"{_format_minutes(_minutes(s))}-{_format_minutes(_minutes(e))}" for s, e in hours.get(day, []))
+
+    texts = [day_text(day) for day in WEEKDAYS]
+    if all(text == texts[0] for text in texts):
+        return texts[0] or "zatvorené"
+    return "; ".join(f"{label} {text}" for label, text in zip(WEEKDAY_LABELS, texts) if text)
+
+
+class CompiledOpeningHours:
+    """Merged, sorted minute-of-week intervals [start, end)."""
+
+    def __init__(self, hours):
+        intervals = sorted(
+            (index * MINUTES_PER_DAY + _minutes(start), index * MINUTES_PER_DAY + _minutes(end))
+            for index, day in enumerate(WEEKDAYS)
+            for start, end in hours.get(day, [])
+        )
+        merged = []
+        for start, end in intervals:
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        # otvorene cez polnoc z nedele na pondelok -> posledny interval pokracuje do dalsieho tyzdna
+        if len(merged) > 1 and merged[-1][1] == MINUTES_PER_WEEK and merged[0][0] == 0:
+            merged[-1][1] += merged[0][1]
+        self.starts = array("l", (start for start, _ in merged))
+        self.ends = array("l", (end for _, end in merged))
+        self._arrays = None
+
+    @staticmethod
+    def minute_of_week(value):
+        local = timezone.localtime(value) if timezone.is_aware(value) else value
+        return local.weekday() * MINUTES_PER_DAY + local.hour * 60 + local.minute + local.second / 60
+
+    def _covers(self, start, end):
+        index = bisect_right(self.starts, start) - 1
+        return index >= 0 and self.ends[index] >= end
+
+    def is_open_at(self, value):
+        minute = self.minute_of_week(value)
+        index = bisect_right(self.starts, minute) - 1
+        return index >= 0 and minute < self.ends[index]
+
+    def contains(self, start, end):
+        """True if the whole interval [start, end) lies inside one opening range."""
+        duration = (end - start).total_seconds() / 60
+        if duration <= 0 or duration > MINUTES_PER_WEEK:
+            return False
+        begin = self.minute_of_week(start)
+        return self._covers(begin, begin + duration)
+
+    def outside(self, intervals):
+        """
+        Indexes of (start, end) pairs that do not fit into the opening hours.
+
+        The whole batch is checked with NumPy: timestamps are shifted by the UTC
+        offset of TIME_ZONE (see _utc_offsets) and looked up with one np.searchsorted.
+        """
+        # NumPy sa importuje az pri validacii davky (start workera ho nepotrebuje)
+        import numpy as np
+
+        if not intervals:
+            return []
+        if not all(timezone.is_aware(start) for start, _ in intervals):
+            return [index for index, (start, end) in enumerate(intervals) if not self.contains(start, end)]
+
+        begins = np.floor(np.array([start.timestamp() for start, _ in intervals], dtype=np.float64))
+        durations = (np.array([end.timestamp() for _, end in intervals], dtype=np.float64) - begins) / 60
+        local = (begins + _utc_offsets(begins)) / 60
+        minutes = (local + EPOCH_WEEKDAY * MINUTES_PER_DAY) % MINUTES_PER_WEEK
+
+        if self._arrays is None:
+            # skompilovana forma je v lru_cache, polia sa vytvoria raz
+            self._arrays = (np.array(self.starts, dtype=np.int64), np.array(self.ends, dtype=np.int64))
+        starts, ends = self._arrays
+        index = np.searchsorted(starts, minutes, side="right") - 1
+        covered = (index >= 0) & (ends[np.maximum(index, 0)] >= minutes + durations)
+        valid = (durations > 0) & (durations <= MINUTES_PER_WEEK)
+        return np.flatnonzero(~(covered & valid)).tolist()
+
+
+def _utc_offsets(timestamps):
+    """
+    UTC offset (seconds) of the current time zone for every timestamp.
+
+    The zone is asked once per day of the range; a day whose offset differs from
+    the previous one is bisected to the exact DST transition.
+    """
+    import numpy as np
+
+    zone = timezone.get_current_timezone()
+
+    def offset(timestamp):
+        return datetime.fromtimestamp(timestamp, zone).utcoffset().total_seconds()
+
+    first, last = int(timestamps.min()), int(timestamps.max())
+    points = list(range(first, last, 86400)) + [last]
+    transitions, values = [], [offset(first)]
+    for low, high in zip(points, points[1:]):
+        if offset(high) == values[-1]:
+            continue
+        while high - low > 1:
+            middle = (low + high) // 2
+            if offset(middle) == values[-1]:
+                low = middle
+            else:
+                high = middle
+        transitions.append(high)
+        values.append(offset(high))
+    return np.array(values, dtype=np.float64)[np.searchsorted(np.array(transitions, dtype=np.float64), timestamps, side="right")]
+
+
+@lru_cache(maxsize=1024)
+def _compile_cached(key):
+    return CompiledOpeningHours(json.loads(key))
+
+
+def compile_opening_hours(hours):
+    """Compiled form cached by content - shared by all activities with the same hours."""
+    if hours is None:
+        return None
+    return _compile_cached(json.dumps(hours, sort_keys=True))
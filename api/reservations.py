@@ -0,0 +1,87 @@
+"""
+Hromadná zmena statusu rezervácií (bulk endpoint pre učiteľa + admin action).
+"""
+
+from django.db import transaction
+
+from .events import publish_slot_occupancy
+from .models import Reservation
+from .signals import reservations_bulk_updated
+
+# povolene prechody statusu, None = stare rezervacie bez statusu
+ALLOWED_STATUS_TRANSITIONS = {
+    None: {Reservation.Status.PENDING, Reservation.Status.APPROVED, Reservation.Status.CANCELLED},
+    Reservation.Status.PENDING: {Reservation.Status.APPROVED, Reservation.Status.CANCELLED},
+    Reservation.Status.APPROVED: {Reservation.Status.PENDING, Reservation.Status.CANCELLED},
+    Reservation.Status.CANCELLED: set(),
+}
+
+RESULT_UPDATED = "updated"
+RESULT_UNCHANGED = "unchanged"
+RESULT_NOT_FOUND = "not_found"
+RESULT_INVALID_TRANSITION = "invalid_transition"
+
+
+def is_transition_allowed(old_status, new_status):
+    return new_status in ALLOWED_STATUS_TRANSITIONS.get(old_status, set())
+
+
+def bulk_change_status(new_status, ids=None, slot_id=None, teacher=None):
+    """
+    Zmení status viacerých rezervácií jedným UPDATE príkazom.
+
+    Rezervácie sa vyberú podľa `ids` alebo `slot_id`. Ak je zadaný `teacher`, zmenia sa len
+    rezervácie jeho slotov (ownership check je priamo vo WHERE). Vráti dict {id: výsledok}.
+    Vybrané rezervácie sú do konca transakcie zamknuté (SELECT ... FOR UPDATE), takže výsledok
+    "updated" zodpovedá tomu, čo UPDATE naozaj zmenil, aj pri súbežnej zmene statusu.
+    Počet dotazov nezávisí od počtu rezervácií: 1x SELECT, 1x UPDATE, 1x INSERT do change logu.
+    """
+    queryset = Reservation.objects.all()
+    if teacher is not None:
+        queryset = queryset.filter(activity_slot__teacher=teacher)
+    if ids is not None:
+        queryset = queryset.filter(id__in=ids)
+    if slot_id is not None:
+        queryset = queryset.filter(activity_slot_id=slot_id)
+
+    with transaction.atomic():
+        # zamky v poradi id, aby sa dva subezne bulk requesty nezablokovali navzajom
+        candidates = queryset.select_related("activity_slot").select_for_update(of=("self",)).order_by("id")
+        reservations = {reservation.id: reservation for reservation in candidates}
+
+        results = {}
+        if ids is not None:
+            for reservation_id in ids:
+                if reservation_id not in reservations:
+                    results[reservation_id] = RESULT_NOT_FOUND
+
+        to_update = []
+        previous_statuses = {}
+        for reservation in reservations.values():
+            if reservation.status == new_status:
+                results[reservation.id] = RESULT_UNCHANGED
+            elif not is_transition_allowed(reservation.status, new_status):
+                results[reservation.id] = RESULT_INVALID_TRANSITION
+            else:
+                results[reservation.id] = RESULT_UPDATED
+                previous_statuses[reservation.id] = reservation.status
+                to_update.append(reservation)
+
+        if to_update:
+            # riadky su zamknute od SELECT-u, status sa medzitym zmenit nemohol
+            Reservation.objects.filter(id__in=[reservation.id for reservation in to_update]).update(status=new_status)
+
+            for reservation in to_update:
+                reservation.status = new_status
+            reservations_bulk_updated.send(
+                sender=Reservation,
+                reservations=to_update,
+                previous_statuses=previous_statuses,
+            )
+            for activity_id, slot_id_to_publish in {(reservation.activity_slot.activity_id, reservation.activity_slot_id) for reservation in to_update}:
+                publish_slot_occupancy(activity_id, slot_id_to_publish)
+
+    if ids is not None:
+        # vysledky v poradi, v akom prisli ids
+        return {reservation_id: results[reservation_id] for reservation_id in ids}
+    return results
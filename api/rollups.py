@@ -0,0 +1,222 @@
+"""
+Denné súhrny obsadenosti (DailyUtilization) pre reporty a štatistiky.
+
+Riadok je "bucket" = lokálny deň začiatku slotu x aktivita x učiteľ. Request súhrny nemení - job
+worker (periodický task api.refresh_rollups, api.tasks) každých ROLLUPS_REFRESH_SECONDS prečíta
+nové záznamy change logu od svojho kurzora a prepočíta len dotknuté buckety - dva agregačné dotazy
+nad slotmi dotknutých dní (index api_slot_activity_range_idx) a prepis riadkov. Prepočet je idempotentný,
+takže čerstvé záznamy (api.changefeed.safe_cursor) sa pri ďalšom behu kľudne spracujú znova.
+Štatistiky (stats/utilization/) čítajú len tieto súhrny, nikdy surové rezervácie.
+
+Celá história sa dá prepočítať príkazom python manage.py backfill_rollups (aj keď worker
+nebežal dlhšie, ako sa drží change log).
+"""
+
+import logging
+
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .changefeed import safe_cursor
+from .models import ActivitySlot, ChangeLogEntry, DailyUtilization, Reservation
+
+logger = logging.getLogger(__name__)
+
+# pocet bucketov v jednom OR dotaze
+CHUNK_SIZE = 100
+# pocet zaznamov change logu spracovanych naraz
+CHANGELOG_BATCH_SIZE = 1000
+
+
+def local_date(value):
+    return timezone.localtime(value).date()
+
+
+def day_range(day):
+    """Aware [start, end) of a local calendar day (handles DST days of 23/25 hours)."""
+    local_tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(day, time.min), local_tz)
+    end = timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min), local_tz)
+    return start, end
+
+
+def slot_bucket(start_date, activity_id, teacher_id):
+    return local_date(start_date), activity_id, teacher_id
+
+
+def _teacher_q(prefix, teacher_id):
+    if teacher_id is None:
+        return Q(**{f"{prefix}teacher__isnull": True})
+    return Q(**{f"{prefix}teacher_id": teacher_id})
+
+
+def _slot_q(bucket, prefix=""):
+    day, activity_id, teacher_id = bucket
+    start, end = day_range(day)
+    return Q(**{
+        f"{prefix}activity_id": activity_id,
+        f"{prefix}start_date__gte": start,
+        f"{prefix}start_date__lt": end,
+    }) & _teacher_q(prefix, teacher_id)
+
+
+def _rollup_q(bucket):
+    day, activity_id, teacher_id = bucket
+    return Q(date=day, activity_id=activity_id) & _teacher_q("", teacher_id)
+
+
+def _any(conditions):
+    combined = Q()
+    for condition in conditions:
+        combined |= condition
+    return combined
+
+
+def aggregate(slot_filter, reservation_filter):
+    """Fresh DailyUtilization rows (unsaved) for all slots matching the filters."""
+    local_tz = timezone.get_current_timezone()
+    rows = {}
+    slot_stats = (
+        ActivitySlot.objects.filter(slot_filter)
+        .annotate(day=TruncDate("start_date", tzinfo=local_tz))
+        .values("day", "activity_id", "teacher_id")
+        .annotate(slots=Count("id"), capacity=Sum("activity__capacity"), room=Max("activity__room"))
+        .order_by()
+    )
+    for item in slot_stats:
+        rows[(item["day"], item["activity_id"], item["teacher_id"])] = DailyUtilization(
+            date=item["day"],
+            activity_id=item["activity_id"],
+            teacher_id=item["teacher_id"],
+            room=item["room"] or "",
+            slots=item["slots"],
+            capacity=item["capacity"] or 0,
+        )
+
+    reservation_stats = (
+        Reservation.objects.filter(reservation_filter)
+        .annotate(day=TruncDate("activity_slot__start_date", tzinfo=local_tz))
+        .values("day", "activity_slot__activity_id", "activity_slot__teacher_id")
+        .annotate(
+            reservations=Count("id"),
+            active=Count("id", filter=~Q(status=Reservation.Status.CANCELLED)),
+            approved=Count("id", filter=Q(status=Reservation.Status.APPROVED)),
+            cancelled=Count("id", filter=Q(status=Reservation.Status.CANCELLED)),
+        )
+        .order_by()
+    )
+    for item in reservation_stats:
+        row = rows.get((item["day"], item["activity_slot__activity_id"], item["activity_slot__teacher_id"]))
+        if row is None:
+            continue
+        row.reservations = item["reservations"]
+        row.active = item["active"]
+        row.approved = item["approved"]
+        row.cancelled = item["cancelled"]
+    return list(rows.values())
+
+
+def refresh_buckets(buckets):
+    """Recompute the given (date, activity_id, teacher_id) buckets from the raw tables."""
+    buckets = list(set(buckets))
+    for offset in range(0, len(buckets), CHUNK_SIZE):
+        chunk = buckets[offset:offset + CHUNK_SIZE]
+        rows = aggregate(_any(_slot_q(bucket) for bucket in chunk), _any(_slot_q(bucket, "activity_slot__") for bucket in chunk))
+        with transaction.atomic():
+            DailyUtilization.objects.filter(_any(_rollup_q(bucket) for bucket in chunk)).delete()
+            DailyUtilization.objects.bulk_create(rows)
+
+
+def refresh_slots(slot_ids, extra_buckets=()):
+    """Refresh buckets of the given slots (plus already known buckets, e.g. of deleted slots)."""
+    buckets = set(extra_buckets)
+    if slot_ids:
+        for start_date, activity_id, teacher_id in ActivitySlot.objects.filter(id__in=set(slot_ids)).values_list(
+            "start_date", "activity_id", "teacher_id"
+        ):
+            buckets.add(slot_bucket(start_date, activity_id, teacher_id))
+    refresh_buckets(buckets)
+
+
+def refresh_activity(activity_id):
+    """Recompute all buckets of one activity (capacity or room changed)."""
+    rows = aggregate(Q(activity_id=activity_id), Q(activity_slot__activity_id=activity_id))
+    with transaction.atomic():
+        DailyUtilization.objects.filter(activity_id=activity_id).delete()
+        DailyUtilization.objects.bulk_create(rows)
+
+
+def _entry_bucket(data):
+    return slot_bucket(parse_datetime(data["start_date"]), data["activity_id"], data["teacher_id"])
+
+
+def refresh_from_changelog(cursor, batch_size=CHANGELOG_BATCH_SIZE):
+    """
+    Refresh buckets touched by up to ``batch_size`` change log entries after ``cursor``.
+    Returns (new cursor, has_more).
+    """
+    bounds = ChangeLogEntry.objects.aggregate(min_id=Min("id"), max_id=Max("id"))
+    if bounds["min_id"] is not None and cursor < bounds["min_id"] - 1:
+        logger.warning(
+            f"Rollup cursor {cursor} is older than the change log (oldest entry {bounds['min_id']}), "
+            "run backfill_rollups for the missed days."
+        )
+    entries = list(
+        ChangeLogEntry.objects.filter(id__gt=cursor, id__lte=bounds["max_id"] or 0)
+        .order_by("id")
+        .values_list("id", "model", "object_id", "operation", "data")[:batch_size]
+    )
+    if not entries:
+        return cursor, False
+
+    slot_ids, buckets, moved_slots, activity_ids = set(), set(), set(), set()
+    for _, model, object_id, operation, data in entries:
+        if data is None:
+            # zaznam zmazania zo starsej verzie logu bez snapshotu
+            continue
+        if model == "reservation":
+            slot_ids.add(data["activity_slot_id"])
+        elif model == "activity_slot":
+            buckets.add(_entry_bucket(data))
+            if operation == ChangeLogEntry.Operation.UPDATED:
+                moved_slots.add(object_id)
+        elif model == "activity" and operation == ChangeLogEntry.Operation.UPDATED:
+            # mohla sa zmenit kapacita alebo miestnost
+            activity_ids.add(object_id)
+
+    if moved_slots:
+        # pri zmene casu/aktivity/ucitela je povodny bucket v predchadzajucich zaznamoch slotu
+        previous = ChangeLogEntry.objects.filter(model="activity_slot", object_id__in=moved_slots, id__lte=entries[-1][0])
+        buckets.update(_entry_bucket(data) for data in previous.values_list("data", flat=True) if data is not None)
+
+    refresh_slots(slot_ids, buckets)
+    for activity_id in activity_ids:
+        refresh_activity(activity_id)
+
+    last_id = entries[-1][0]
+    next_cursor = safe_cursor(cursor, last_id)
+    # za cerstvymi zaznamami sa kurzor zastavi - zvysok spracuje az dalsi beh
+    return next_cursor, len(entries) == batch_size and next_cursor == last_id
+
+
+def backfill(date_from, date_to, batch_days=7):
+    """Rebuild rollups for local days date_from..date_to (inclusive) in batches. Yields (day, rows)."""
+    day = date_from
+    while day <= date_to:
+        batch_end = min(day + timedelta(days=batch_days - 1), date_to)
+        start, _ = day_range(day)
+        _, end = day_range(batch_end)
+        rows = aggregate(
+            Q(start_date__gte=start, start_date__lt=end),
+            Q(activity_slot__start_date__gte=start, activity_slot__start_date__lt=end),
+        )
+        with transaction.atomic():
+            DailyUtilization.objects.filter(date__gte=day, date__lte=batch_end).delete()
+            DailyUtilization.objects.bulk_create(rows, batch_size=1000)
+        yield day, len(rows)
+        day = batch_end + timedelta(days=1)
@@ -0,0 +1,194 @@
+"""
+Full-text vyhľadávanie aktivít (name, description, category, room).
+
+Index je samostatná tabuľka podľa databázy:
+- SQLite:     FTS5 virtual table api_activity_fts (rowid = activity id), tokenizer unicode61
+              s remove_diacritics, ranking bm25; rola je token v stlpci role_token, takze filter
+              podla role je prienik v samotnom FTS indexe (bez joinu na api_activity)
+- PostgreSQL: api_activity_search (activity_id, role_id, document tsvector) s GIN indexom, ranking ts_rank
+
+Text sa pred indexovaním aj pri hľadaní normalizuje (malé písmená, bez diakritiky), takže
+"posilnovna" nájde "Posilňovňa". Každý token dotazu sa hľadá ako prefix.
+Index sa aktualizuje pri uložení/zmazaní aktivity (api.signals), celý sa dá prestavať
+príkazom python manage.py rebuild_search_index.
+
+Iné databázy index nemajú: hľadá sa cez ORM (každý token ako podreťazec niektorého stĺpca bez
+ohľadu na veľkosť písmen, zhoda v názve prvá) - diakritika sa tam musí zhodovať.
+"""
+
+import re
+import unicodedata
+
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+
+SQLITE_TABLE = "api_activity_fts"
+POSTGRES_TABLE = "api_activity_search"
+
+# vahy stlpcov: nazov je najdolezitejsi, potom kategoria a miestnost, popis najmenej
+WEIGHTS = {"name": 10.0, "category": 4.0, "room": 4.0, "description": 1.0}
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize(text):
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).lower()
+
+
+def tokenize_query(query):
+    return _TOKEN_RE.findall(normalize(query))[:10]
+
+
+def role_token(role_id):
+    return f"role{role_id}"
+
+
+def _document(activity):
+    return (
+        normalize(activity.name),
+        normalize(activity.description),
+        normalize(activity.category),
+        normalize(activity.room),
+    )
+
+
+def create_index(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_TABLE} USING fts5("
+            "name, description, category, room, role_token, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+    elif vendor == "postgresql":
+        schema_editor.execute(
+            f"CREATE TABLE IF NOT EXISTS {POSTGRES_TABLE} ("
+            "activity_id bigint PRIMARY KEY REFERENCES api_activity(id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+            "role_id bigint NOT NULL, document tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {POSTGRES_TABLE}_document_gin ON {POSTGRES_TABLE} USING GIN (document)"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {POSTGRES_TABLE}_role_id ON {POSTGRES_TABLE} (role_id)"
+        )
+
+
+def drop_index(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {SQLITE_TABLE}")
+    elif vendor == "postgresql":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {POSTGRES_TABLE}")
+
+
+def is_supported():
+    return connection.vendor in ("sqlite", "postgresql")
+
+
+def _postgres_document_sql():
+    return (
+        "setweight(to_tsvector('simple', %s), 'A') || setweight(to_tsvector('simple', %s), 'D') || "
+        "setweight(to_tsvector('simple', %s), 'B') || setweight(to_tsvector('simple', %s), 'B')"
+    )
+
+
+def index_activities(activities):
+    """Insert or replace index rows of the given activities."""
+    if not activities or not is_supported():
+        return
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.executemany(f"DELETE FROM {SQLITE_TABLE} WHERE rowid = %s", [(activity.pk,) for activity in activities])
+            cursor.executemany(
+                f"INSERT INTO {SQLITE_TABLE} (rowid, name, description, category, room, role_token) VALUES (%s, %s, %s, %s, %s, %s)",
+                [(activity.pk, *_document(activity), role_token(activity.role_id)) for activity in activities],
+            )
+        else:
+            cursor.executemany(
+                f"INSERT INTO {POSTGRES_TABLE} (activity_id, role_id, document) VALUES (%s, %s, {_postgres_document_sql()}) "
+                "ON CONFLICT (activity_id) DO UPDATE SET role_id = EXCLUDED.role_id, document = EXCLUDED.document",
+                [(activity.pk, activity.role_id, *_document(activity)) for activity in activities],
+            )
+
+
+def remove_activity(activity_id):
+    if not is_supported():
+        return
+    with connection.cursor() as cursor:
+        table, column = (SQLITE_TABLE, "rowid") if connection.vendor == "sqlite" else (POSTGRES_TABLE, "activity_id")
+        cursor.execute(f"DELETE FROM {table} WHERE {column} = %s", [activity_id])
+
+
+def rebuild_index(batch_size=5000):
+    """Rebuild the whole index from api_activity in batches. Returns number of indexed activities."""
+    from .models import Activity
+
+    if not is_supported():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SQLITE_TABLE if connection.vendor == 'sqlite' else POSTGRES_TABLE}")
+
+    total = 0
+    last_id = 0
+    queryset = Activity.objects.only("id", "name", "description", "category", "room", "role_id").order_by("id")
+    while True:
+        batch = list(queryset.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            return total
+        index_activities(batch)
+        total += len(batch)
+        last_id = batch[-1].id
+
+
+def search_activity_ids(query, role_id=None, limit=20, offset=0):
+    """
+    Return activity ids ordered by relevance. ``role_id`` limits results to one role
+    (students), None means all activities (teachers/admins).
+    """
+    tokens = tokenize_query(query)
+    if not tokens:
+        return []
+    if not is_supported():
+        # bez indexu sa data nenormalizuju - tokeny s diakritikou, ako ich zadal pouzivatel
+        return _search_without_index(_TOKEN_RE.findall(query)[:10], role_id, limit, offset)
+
+    if connection.vendor == "sqlite":
+        match = "{name description category room} : (" + " ".join(f'"{token}"*' for token in tokens) + ")"
+        if role_id is not None:
+            match = f'({match}) AND role_token : "{role_token(role_id)}"'
+        # role_token ma vahu 0, do relevancie nezasahuje
+        weights = ", ".join(str(WEIGHTS[column]) for column in ("name", "description", "category", "room"))
+        sql = (
+            f"SELECT rowid FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s "
+            f"ORDER BY bm25({SQLITE_TABLE}, {weights}, 0.0), rowid LIMIT %s OFFSET %s"
+        )
+        params = [match]
+    else:
+        role_sql = ""
+        params = [" & ".join(f"{token}:*" for token in tokens)]
+        if role_id is not None:
+            role_sql = "AND s.role_id = %s"
+            params.append(role_id)
+        sql = (
+            f"SELECT s.activity_id FROM {POSTGRES_TABLE} s, to_tsquery('simple', %s) q "
+            f"WHERE s.document @@ q {role_sql} "
+            "ORDER BY ts_rank(s.document, q) DESC, s.activity_id LIMIT %s OFFSET %s"
+        )
+    params += [limit, offset]
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _search_without_index(tokens, role_id, limit, offset):
+    from .models import Activity
+
+    activities = Activity.objects.all() if role_id is None else Activity.objects.filter(role_id=role_id)
+    for token in tokens:
+        activities = activities.filter(
+            Q(name__icontains=token) | Q(description__icontains=token) | Q(category__icontains=token) | Q(room__icontains=token)
+        )
+    rank = Case(When(name__icontains=tokens[0], then=Value(0)), default=Value(1), output_field=IntegerField())
+    return list(activities.order_by(rank, "id").values_list("id", flat=True)[offset:offset + limit])
@@ -1,23 +1,57 @@
+from django.db.models import Q
 from rest_framework import serializers
 from unicodedata import category
 
-from .models import Activity, ActivitySlot, Reservation
+from accounts.sparse_fields import SparseFieldsMixin
+
+from .intervals import IntervalIndex, coalesce_windows, find_batch_conflicts
+from .opening_hours import compile_opening_hours, format_opening_hours, normalize_opening_hours, parse_available_hours
+from .models import Activity, ActivitySlot, ArchivedReservation, Reservation
 
 
 # na konvertnutie json dat do django modelu a naopak cca
 
-class ActivitySerializer(serializers.ModelSerializer):
+# opening_hours (strukturovane) a available_hours (stary text) sa drzia v sulade:
+# klient moze poslat jedno alebo druhe, druhe pole sa dopocita
+class OpeningHoursMixin:
+    def validate_opening_hours(self, value):
+        if value is None:
+            return None
+        try:
+            return normalize_opening_hours(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+
+    def sync_opening_hours(self, attrs):
+        if attrs.get("opening_hours") is not None:
+            attrs["available_hours"] = format_opening_hours(attrs["opening_hours"])
+        elif "available_hours" in attrs:
+            attrs["opening_hours"] = parse_available_hours(attrs["available_hours"])
+        elif self.instance is None:
+            raise serializers.ValidationError({"available_hours": "Zadajte available_hours alebo opening_hours."})
+        return attrs
+
+
+class ActivitySerializer(SparseFieldsMixin, OpeningHoursMixin, serializers.ModelSerializer):
     class Meta:
         model = Activity
         fields = "__all__"
+        extra_kwargs = {
+            "available_hours": {"required": False}
+        }
+
+    def validate(self, attrs):
+        return self.sync_opening_hours(super().validate(attrs))
 
-class ActivitySlotSerializer(serializers.ModelSerializer):
+class ActivitySlotSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     activity = ActivitySerializer()
     teacher = serializers.SerializerMethodField()
     class Meta:
         model = ActivitySlot
         fields = ["id", "start_date", "end_date", "activity", "teacher"]
 
+    sparse_sources = {"teacher": ("teacher",)}
+
     def get_teacher(self, obj):
         teacher = obj.teacher
         if not teacher:
@@ -29,11 +63,14 @@ class ActivitySlotSerializer(serializers.ModelSerializer):
         }
 
 
-class ReservationSerializer(serializers.ModelSerializer):
+class ReservationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     status_label = serializers.SerializerMethodField()
     activity_slot = ActivitySlotSerializer()
     user = serializers.SerializerMethodField()
 
+    # ?fields= / ?exclude= (accounts.sparse_fields): stlpce, ktore citaju method fields
+    sparse_sources = {"status_label": ("status",), "user": ("user",)}
+
     class Meta:
         model = Reservation
         fields = [
@@ -71,6 +108,31 @@ class ReservationSerializer(serializers.ModelSerializer):
             "role": target_user.role.name if target_user.role else None,
         }
 
+# rezervacia z archivu (reservations/history/) v rovnakom tvare ako ReservationSerializer
+class ArchivedReservationSerializer(ReservationSerializer):
+    activity_slot = serializers.SerializerMethodField()
+
+    class Meta(ReservationSerializer.Meta):
+        model = ArchivedReservation
+
+    def get_activity_slot(self, obj):
+        # historia casto obsahuje tu istu aktivitu mnohokrat - serializuje sa raz na odpoved
+        activities = self.__dict__.setdefault("_activity_data", {})
+        if obj.activity_id not in activities:
+            activities[obj.activity_id] = ActivitySerializer(obj.activity).data
+        teacher = obj.teacher
+        return {
+            "id": obj.activity_slot_id,
+            "start_date": serializers.DateTimeField().to_representation(obj.start_date),
+            "end_date": serializers.DateTimeField().to_representation(obj.end_date),
+            "activity": activities[obj.activity_id],
+            "teacher": {
+                "id": teacher.id,
+                "first_name": teacher.first_name,
+                "last_name": teacher.last_name,
+            } if teacher else None,
+        }
+
 # Serializer pre checknutie validacie dát pre časť z aktivity_slot
 class ActivitySlotCheckSerializer(serializers.ModelSerializer):
     class Meta:
@@ -78,13 +140,45 @@ class ActivitySlotCheckSerializer(serializers.ModelSerializer):
         fields = ["id", "start_date", "end_date"]  # leave out activity and teacher
 
 # Serializer pre validáciu a ukladanie aktivít spolu s akitivty slotmi
-class ActivityWithSlotsSerializer(serializers.ModelSerializer):
+class ActivityWithSlotsSerializer(OpeningHoursMixin, serializers.ModelSerializer):
     activity_slots = ActivitySlotCheckSerializer(many=True)
 
     class Meta:
         model = Activity
-        fields = ["name", "description", "capacity", "available_hours", "color", "category", "room", "role", "image_key", "created_by", "activity_slots" ]
+        fields = ["name", "description", "capacity", "available_hours", "opening_hours", "color", "category", "room", "role", "image_key", "created_by", "activity_slots" ]
         read_only_fields = ["created_by"]
+        extra_kwargs = {
+            "available_hours": {"required": False}
+        }
+
+    def validate_activity_slots(self, slots):
+        for slot in slots:
+            if slot["start_date"] >= slot["end_date"]:
+                raise serializers.ValidationError("Začiatok termínu musí byť pred jeho koncom.")
+        return slots
+
+    def validate(self, attrs):
+        attrs = self.sync_opening_hours(super().validate(attrs))
+        slots = attrs.get("activity_slots", [])
+
+        # vsetky terminy sa overia naraz voci skompilovanym otvaracim hodinam (binarne vyhladavanie)
+        compiled = compile_opening_hours(attrs.get("opening_hours"))
+        if compiled is not None:
+            outside = compiled.outside([(slot["start_date"], slot["end_date"]) for slot in slots])
+            if outside:
+                raise serializers.ValidationError({"activity_slots": [
+                    {
+                        **_describe(slots[index]["start_date"], slots[index]["end_date"]),
+                        "error": f"Termín je mimo otváracích hodín ({attrs['available_hours']}).",
+                    }
+                    for index in outside
+                ]})
+
+        request = self.context.get("request")
+        conflicts = find_slot_conflicts(slots, request.user if request else None, attrs.get("room"))
+        if conflicts:
+            raise serializers.ValidationError({"activity_slots": conflicts})
+        return attrs
 
     def create(self, validated_data):
         slots_data = validated_data.pop("activity_slots")  # remove slots from main data
@@ -108,8 +202,77 @@ class ActivityWithSlotsSerializer(serializers.ModelSerializer):
         return activity
 
 
+# max pocet rozsahov (OR podmienok) v dotaze na existujuce sloty pri kontrole kolizii
+CONFLICT_QUERY_RANGES = 20
+
+
+def _describe(start, end):
+    return {"start_date": start.isoformat(), "end_date": end.isoformat()}
+
+
+def _existing_slots(reason, queryset, ranges):
+    in_ranges = Q()
+    for range_start, range_end in ranges:
+        in_ranges |= Q(end_date__gt=range_start, start_date__lt=range_end)
+    rows = queryset.filter(in_ranges).values_list(
+        "id", "start_date", "end_date", "activity__name", "activity__room"
+    )
+    return [
+        (start, end, {"reason": reason, "slotId": slot_id, "activity": name, "room": room, "start_date": start, "end_date": end})
+        for slot_id, start, end, name, room in rows
+    ]
+
+
+def find_slot_conflicts(slots, teacher, room):
+    """
+    Nájde kolízie nových termínov s existujúcimi slotmi toho istého učiteľa alebo tej istej miestnosti
+    a kolízie termínov navzájom v rámci požiadavky.
+
+    Z DB sa načítajú len sloty, ktoré zasahujú do okien nových termínov (jeden indexovaný dotaz
+    podľa učiteľa a jeden podľa miestnosti). Okná sa zlúčia najviac do CONFLICT_QUERY_RANGES rozsahov,
+    takže semestrálny rozvrh nenačíta všetky sloty medzi prvým a posledným termínom.
+    Kolízie sa potom hľadajú v intervalovom strome v pamäti.
+    """
+    if not slots:
+        return []
+
+    ranges = coalesce_windows([(slot["start_date"], slot["end_date"]) for slot in slots], CONFLICT_QUERY_RANGES)
+
+    existing = []
+    if teacher is not None and teacher.pk is not None:
+        existing += _existing_slots("teacher", ActivitySlot.objects.filter(teacher=teacher), ranges)
+    if room:
+        existing += _existing_slots("room", ActivitySlot.objects.filter(activity__room=room), ranges)
+
+    conflicts = []
+    index = IntervalIndex(existing)
+    for slot in slots:
+        for other in index.overlapping(slot["start_date"], slot["end_date"]):
+            conflicts.append({
+                **_describe(slot["start_date"], slot["end_date"]),
+                "reason": other["reason"],
+                "error": "Učiteľ už má v tomto čase iný termín." if other["reason"] == "teacher" else f"Miestnosť {other['room']} je v tomto čase obsadená.",
+                "conflict_with": {"slotId": other["slotId"], "activity": other["activity"], **_describe(other["start_date"], other["end_date"])},
+            })
+
+    for first, second in find_batch_conflicts([(slot["start_date"], slot["end_date"], slot) for slot in slots]):
+        conflicts.append({
+            **_describe(second["start_date"], second["end_date"]),
+            "reason": "batch",
+            "error": "Termíny v požiadavke sa navzájom prekrývajú.",
+            "conflict_with": _describe(first["start_date"], first["end_date"]),
+        })
+
+    return conflicts
+
+
 # Serializer pre vytvorenie rezervácie
 class CreateReservationSerializer(serializers.ModelSerializer):
+    # slot sa zamkne uz pri validacii (view bezi v transakcii) spolu so vsetkym, co view a odpoved potrebuju
+    activity_slot = serializers.PrimaryKeyRelatedField(
+        queryset=ActivitySlot.objects.select_for_update(of=("self",)).select_related("activity", "activity__role", "teacher")
+    )
+
     class Meta:
         model = Reservation
         fields = ["activity_slot", "note"]
@@ -0,0 +1,125 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from accounts.models import Role
+
+from .availability import invalidate as invalidate_availability
+from .catalog import schedule_publish
+from .changefeed import record_change, record_changes
+from .search import index_activities, remove_activity
+from .models import Activity, ActivitySlot, ChangeLogEntry, Reservation
+
+# posiela sa pri hromadnej zmene statusu (queryset.update() nespusta post_save)
+# kwargs: reservations (instancie uz s novym statusom), previous_statuses ({id: povodny status})
+reservations_bulk_updated = Signal()
+
+_hooks_suppressed = ContextVar("api_hooks_suppressed", default=False)
+
+
+@contextmanager
+def suppress_hooks():
+    """
+    Receivery v tomto module (change log a z neho súhrny obsadenosti, search index) počas bloku nič nerobia.
+    Pre údržbu, ktorá dáta len presúva (archivácia) - nesmie to vyzerať ako zmazanie.
+    """
+    token = _hooks_suppressed.set(True)
+    try:
+        yield
+    finally:
+        _hooks_suppressed.reset(token)
+
+
+def unless_suppressed(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if _hooks_suppressed.get():
+            return None
+        return func(*args, **kwargs)
+    return wrapper
+
+
+# kazda zmena aktivity, slotu alebo rezervacie sa zapise do change logu (endpoint changes/)
+@receiver(post_save, sender=Activity)
+@receiver(post_save, sender=ActivitySlot)
+@receiver(post_save, sender=Reservation)
+@unless_suppressed
+def log_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    record_change(instance, ChangeLogEntry.Operation.CREATED if created else ChangeLogEntry.Operation.UPDATED)
+
+
+@receiver(post_delete, sender=Activity)
+@receiver(post_delete, sender=ActivitySlot)
+@receiver(post_delete, sender=Reservation)
+@unless_suppressed
+def log_deleted(sender, instance, **kwargs):
+    record_change(instance, ChangeLogEntry.Operation.DELETED)
+
+
+@receiver(reservations_bulk_updated, sender=Reservation)
+@unless_suppressed
+def log_bulk_updated(sender, reservations, **kwargs):
+    record_changes(reservations, ChangeLogEntry.Operation.UPDATED)
+
+
+# fulltextovy index aktivit sa drzi v sulade s tabulkou api_activity
+@receiver(post_save, sender=Activity)
+@unless_suppressed
+def index_activity(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    index_activities([instance])
+
+
+@receiver(post_delete, sender=Activity)
+@unless_suppressed
+def unindex_activity(sender, instance, **kwargs):
+    remove_activity(instance.pk)
+
+
+# zdielany snapshot katalogu (api.catalog) - zmena aktivity alebo role zaradi (jeden) publish do job fronty
+@receiver(post_save, sender=Activity)
+@receiver(post_delete, sender=Activity)
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+def publish_catalog(sender, raw=False, **kwargs):
+    if raw:
+        return
+    schedule_publish()
+
+
+# index volnej kapacity (api.availability) - po commite sa dotknute aktivity nacitaju znova
+# (aj pri archivacii, zmazane sloty z indexu musia zmiznut)
+@receiver(post_save, sender=Reservation)
+@receiver(post_delete, sender=Reservation)
+def availability_reservation_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    invalidate_availability(slot_ids=[instance.activity_slot_id])
+
+
+@receiver(reservations_bulk_updated, sender=Reservation)
+def availability_bulk_updated(sender, reservations, **kwargs):
+    invalidate_availability(slot_ids={reservation.activity_slot_id for reservation in reservations})
+
+
+@receiver(post_save, sender=ActivitySlot)
+@receiver(post_delete, sender=ActivitySlot)
+def availability_slot_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # slot mohol prejst k inej aktivite - po commite ho uz podla id nenajdeme
+    invalidate_availability(slot_ids=[instance.pk], activity_ids=[instance.activity_id])
+
+
+@receiver(post_save, sender=Activity)
+@receiver(post_delete, sender=Activity)
+def availability_activity_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    invalidate_availability(activity_ids=[instance.pk])
@@ -0,0 +1,135 @@
+"""
+Zlučovanie súbežných rovnakých výpočtov (singleflight) a stale-while-revalidate pre horúce GET endpointy.
+
+- do(key, func): súbežné volania s rovnakým kľúčom v jednom procese spustia func len raz,
+  ostatné vlákna počkajú na jeho výsledok (alebo výnimku).
+- cached(key, compute): výsledok sa drží v cache (CACHES) ako (čas výpočtu, hodnota):
+    * mladší ako HOT_READ_FRESH_SECONDS -> vráti sa rovno,
+    * do ďalších HOT_READ_STALE_SECONDS -> vráti sa starý výsledok a jediný refresh beží na pozadí
+      (v rámci procesu cez do(), medzi procesmi cez zámok v cache),
+    * inak (alebo prázdna cache) -> výpočet cez do(), súbežné requesty čakajú na jeden výpočet.
+
+Počítadlá v ``stats`` (computed, shared, fresh, stale, refreshed) používa benchmark scenár slots_stampede.
+"""
+
+import contextvars
+import logging
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+stats = Counter()
+
+_lock = threading.Lock()
+_calls = {}
+_refreshing = set()
+_executor = None
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+def do(key, func):
+    """Run ``func`` once for all concurrent callers with the same ``key`` and return its result."""
+    with _lock:
+        call = _calls.get(key)
+        leader = call is None
+        if leader:
+            call = _calls[key] = _Call()
+
+    if not leader:
+        stats["shared"] += 1
+        # ak sa vypocet zasekne, po case ho spravime sami namiesto nekonecneho cakania
+        if call.done.wait(settings.HOT_READ_WAIT_SECONDS):
+            if call.error is not None:
+                raise call.error
+            return call.value
+        return func()
+
+    stats["computed"] += 1
+    try:
+        call.value = func()
+        return call.value
+    except Exception as e:
+        call.error = e
+        raise
+    finally:
+        with _lock:
+            del _calls[key]
+        call.done.set()
+
+
+def _executor_instance():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="hot-read-refresh")
+        return _executor
+
+
+def _store(key, compute):
+    value = compute()
+    cache.set(key, (time.time(), value), settings.HOT_READ_FRESH_SECONDS + settings.HOT_READ_STALE_SECONDS)
+    return value
+
+
+def _refresh(key, compute, lock_key):
+    try:
+        do(key, lambda: _store(key, compute))
+        stats["refreshed"] += 1
+    except Exception as e:
+        logger.error(f"Background refresh of {key} failed: {e}")
+    finally:
+        with _lock:
+            _refreshing.discard(key)
+        cache.delete(lock_key)
+        # vlakno z poolu si nenechava otvorene spojenia do DB (pozicane spojenie ineho vlakna nezatvara)
+        for connection in connections.all(initialized_only=True):
+            if not connection.allow_thread_sharing:
+                connection.close()
+
+
+def _refresh_in_background(key, compute):
+    with _lock:
+        if key in _refreshing or key in _calls:
+            return
+        _refreshing.add(key)
+    lock_key = f"{key}:refreshing"
+    # iny proces uz obnovuje ten isty kluc
+    if not cache.add(lock_key, 1, timeout=max(1, int(settings.HOT_READ_WAIT_SECONDS))):
+        with _lock:
+            _refreshing.discard(key)
+        return
+    # kopia kontextu -> refresh cita z rovnakej DB ako request (app.db_router)
+    context = contextvars.copy_context()
+    _executor_instance().submit(context.run, _refresh, key, compute, lock_key)
+
+
+def cached(key, compute):
+    """Return ``compute()`` through the cache with singleflight and stale-while-revalidate."""
+    if not settings.HOT_READ_COALESCING:
+        return compute()
+
+    entry = cache.get(key)
+    if entry is not None:
+        computed_at, value = entry
+        age = time.time() - computed_at
+        if age < settings.HOT_READ_FRESH_SECONDS:
+            stats["fresh"] += 1
+            return value
+        if age < settings.HOT_READ_FRESH_SECONDS + settings.HOT_READ_STALE_SECONDS:
+            stats["stale"] += 1
+            _refresh_in_background(key, compute)
+            return value
+    return do(key, lambda: _store(key, compute))
@@ -0,0 +1,23 @@
+from django.conf import settings
+
+from jobs.queue import task
+
+from .catalog import PUBLISH_TASK, publish
+from .rollups import refresh_from_changelog
+
+
+@task("api.refresh_rollups", every=settings.ROLLUPS_REFRESH_SECONDS)
+def refresh_rollups(payload):
+    """Bring daily utilization rollups up to date with the change log; the cursor travels in the payload."""
+    cursor = payload.get("cursor", 0)
+    has_more = True
+    while has_more:
+        cursor, has_more = refresh_from_changelog(cursor)
+    return {"cursor": cursor}
+
+
+@task(PUBLISH_TASK)
+def publish_catalog(payload):
+    """Republish the catalog snapshot after activity/role changes (api.catalog.schedule_publish)."""
+    # zmeny verziu zvysili samy
+    publish(bump=False)
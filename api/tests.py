@@ -1,3 +1,1324 @@
-from django.test import TestCase
+import asyncio
+import re
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest.mock import Mock, patch
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Q
+from django.test import AsyncClient, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.models import Role, User
+from jobs.models import Job
+from jobs.queue import run_jobs, schedule_periodic
+
+from . import availability, catalog, heatmap, singleflight, views
+from .admin import EstimatedCountPaginator
+from .archive import archive_batch, archive_past, history_page, retention_cutoff
+from .changefeed import current_cursor
+from .events import activity_channel, get_broadcast, publish_slot_occupancy
+from .intervals import coalesce_windows
+from .idempotency import encode_response
+from .models import (
+    Activity, ActivitySlot, ArchivedActivitySlot, ArchivedReservation, CalendarFeed, CatalogVersion, ChangeLogEntry, DailyUtilization, IdempotencyKey, Reservation,
+)
+from .opening_hours import compile_opening_hours
+from .rollups import aggregate, local_date
+from .tasks import refresh_rollups
+
+
+def written_tables(queries):
+    """Tabulky, do ktorych request zapisoval (INSERT/UPDATE/DELETE), v poradi zapisov."""
+    tables = []
+    for query in queries:
+        match = re.match(r'(?:INSERT INTO|UPDATE|DELETE FROM) "(\w+)"', query["sql"])
+        if match:
+            tables.append(match.group(1))
+    return tables
+
+
+def bearer(user):
+    return f"Bearer {RefreshToken.for_user(user).access_token}"
+
+
+class ApiTestCase(TestCase):
+    """Ucitel, student a aktivita (kapacita 2) s jednym slotom zajtra."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.roles = {role.name: role for role in Role.objects.all()}
+        cls.teacher = cls.make_user("teacher", "teacher")
+        cls.student = cls.make_user("student", "student")
+        cls.activity = Activity.objects.create(
+            name="PS5", description="Konzola", capacity=2, available_hours="7:30-16:00", category="gaming",
+            room="28", role=cls.roles["student"], created_by=cls.teacher,
+        )
+        cls.start = timezone.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=1)
+        cls.slot = cls.make_slot(cls.start)
+
+    @classmethod
+    def make_user(cls, name, role):
+        return User.objects.create_user(username=name, email=f"{name}@kp.sk", password="heslo", role=cls.roles[role])
+
+    @classmethod
+    def make_slot(cls, start, minutes=45, activity=None, teacher=None):
+        return ActivitySlot.objects.create(
+            activity=activity or cls.activity, teacher=teacher or cls.teacher,
+            start_date=start, end_date=start + timedelta(minutes=minutes),
+        )
+
+    def get(self, user, url, params=None):
+        return self.client.get(url, params, HTTP_AUTHORIZATION=bearer(user))
+
+    def send(self, method, user, url, data=None, **extra):
+        return getattr(self.client, method)(url, data or {}, content_type="application/json", HTTP_AUTHORIZATION=bearer(user), **extra)
+
+
+class OccupancyStreamTests(ApiTestCase):
+    def stream_url(self):
+        end = self.start + timedelta(days=1)
+        return f"/api/activity-slots/{self.activity.id}/{self.start.isoformat()}/{end.isoformat()}/stream/"
+
+    def test_stream_is_not_served_under_wsgi(self):
+        response = self.get(self.student, self.stream_url())
+
+        self.assertEqual(response.status_code, 501)
+        self.assertEqual(response.json()["code"], "stream_not_supported")
+
+    def test_booking_without_subscribers_does_not_load_occupancy(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks, self.assertNumQueries(0):
+            publish_slot_occupancy(self.activity.id, self.slot.id)
+        self.assertEqual(len(callbacks), 1)
+
+    async def test_stream_sends_snapshot_and_occupancy_changes(self):
+        response = await AsyncClient().get(self.stream_url(), headers={"authorization": await sync_to_async(bearer)(self.student)})
+        self.assertEqual(response.status_code, 200)
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b"retry: 5000\n\n")
+        snapshot = await anext(stream)
+        self.assertIn(b"event: snapshot", snapshot)
+        self.assertIn(f'"slotId": {self.slot.id}'.encode(), snapshot)
+        self.assertTrue(get_broadcast().has_subscribers(activity_channel(self.activity.id)))
+
+        await Reservation.objects.acreate(user=self.student, activity_slot=self.slot, status=Reservation.Status.PENDING)
+        await sync_to_async(get_broadcast().publish)(activity_channel(self.activity.id), {"slotId": self.slot.id})
+
+        message = await asyncio.wait_for(anext(stream), 5)
+        self.assertIn(b"event: occupancy", message)
+        self.assertIn(b'"reservedCount": 1', message)
+
+        # odpojenie klienta - ASGI handler zrusi task, ktory cita stream
+        waiting = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiting
+        self.assertFalse(get_broadcast().has_subscribers(activity_channel(self.activity.id)))
+
+
+class ChangeFeedTests(ApiTestCase):
+    url = "/api/changes/"
+
+    def age_entries(self, seconds=120):
+        ChangeLogEntry.objects.update(created_at=timezone.now() - timedelta(seconds=seconds))
+
+    def feed(self, since):
+        response = self.get(self.student, self.url, {"since": since})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_cursor_waits_for_lower_ids_committed_late(self):
+        old = ChangeLogEntry.objects.order_by("id").last()
+        self.age_entries()
+        # zaznam s id medzi old a young zapisuje dlha transakcia, ktora este necommitla
+        late = Reservation.objects.create(user=self.student, activity_slot=self.slot)
+        late_entry = ChangeLogEntry.objects.get(model="reservation", object_id=late.id)
+        ChangeLogEntry.objects.filter(id=late_entry.id).delete()
+        young = Reservation.objects.create(user=self.student, activity_slot=self.make_slot(self.start + timedelta(hours=1)))
+
+        first = self.feed(old.id)
+        self.assertEqual(first["cursor"], old.id)
+        self.assertIn(young.id, [change["id"] for change in first["changes"] if change["model"] == "reservation"])
+
+        late_entry.save(force_insert=True)
+        second = self.feed(first["cursor"])
+        self.assertEqual(
+            [change["id"] for change in second["changes"] if change["model"] == "reservation"],
+            [late.id, young.id],
+        )
+
+        self.age_entries()
+        third = self.feed(second["cursor"])
+        self.assertEqual(third["cursor"], ChangeLogEntry.objects.order_by("id").last().id)
+        self.assertFalse(third["has_more"])
+
+    def test_since_zero_starts_from_oldest_retained_entry(self):
+        Reservation.objects.create(user=self.student, activity_slot=self.slot)
+        compacted = list(ChangeLogEntry.objects.order_by("id").values_list("id", flat=True)[:2])
+        ChangeLogEntry.objects.filter(id__in=compacted).delete()
+        self.age_entries()
+
+        data = self.feed(0)
+
+        self.assertEqual(data["changes"][0]["seq"], ChangeLogEntry.objects.order_by("id").first().id)
+        self.assertEqual(data["cursor"], ChangeLogEntry.objects.order_by("id").last().id)
+        response = self.get(self.student, self.url, {"since": compacted[0]})
+        self.assertEqual(response.status_code, 410)
+
+    def test_paging_does_not_loop_on_young_entries(self):
+        for hour in range(1, 4):
+            self.make_slot(self.start + timedelta(hours=hour))
+
+        response = self.get(self.student, self.url, {"since": 0, "limit": 1})
+
+        self.assertFalse(response.json()["has_more"])
+        self.assertEqual(response.json()["cursor"], 0)
+
+    def test_bootstrap_cursor_stops_before_young_entries_in_one_query(self):
+        self.age_entries()
+        old = ChangeLogEntry.objects.order_by("id").last()
+        Reservation.objects.create(user=self.student, activity_slot=self.slot)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(current_cursor(), old.id)
+        self.age_entries()
+        self.assertEqual(current_cursor(), ChangeLogEntry.objects.order_by("id").last().id)
+
+
+class SearchTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        student = cls.roles["student"]
+        cls.gym = Activity.objects.create(name="Posilňovňa", description="Činky", capacity=5, available_hours="7:30-16:00", room="12", role=student)
+        cls.described = Activity.objects.create(
+            name="Šatne", description="Pri posilňovni", capacity=5, available_hours="7:30-16:00", room="13", role=student,
+        )
+        cls.staff_only = Activity.objects.create(
+            name="Posilňovňa pre učiteľov", description="", capacity=5, available_hours="7:30-16:00", room="14", role=cls.roles["teacher"],
+        )
+
+    def search(self, user, q):
+        response = self.get(user, "/api/activities/search/", {"q": q})
+        self.assertEqual(response.status_code, 200)
+        return [activity["id"] for activity in response.json()]
+
+    def test_search_ignores_diacritics_and_matches_prefixes(self):
+        self.assertEqual(self.search(self.student, "posilnov")[0], self.gym.id)
+        self.assertEqual(self.search(self.student, "CINKY"), [self.gym.id])
+
+    def test_name_match_ranks_before_description_match(self):
+        self.assertEqual(self.search(self.student, "posilnov"), [self.gym.id, self.described.id])
+
+    def test_students_see_only_their_role(self):
+        self.assertNotIn(self.staff_only.id, self.search(self.student, "posilnovna"))
+        self.assertIn(self.staff_only.id, self.search(self.teacher, "posilnovna"))
+
+    def test_deleted_activity_leaves_the_index(self):
+        self.gym.delete()
+        self.assertEqual(self.search(self.student, "cinky"), [])
+
+    def test_search_without_index_uses_the_orm(self):
+        with patch("api.search.is_supported", return_value=False):
+            self.assertEqual(self.search(self.student, "satne"), [])
+            self.assertEqual(self.search(self.student, "Činky"), [self.gym.id])
+            self.assertEqual(self.search(self.student, "POSIL"), [self.gym.id, self.described.id])
+            self.assertNotIn(self.staff_only.id, self.search(self.student, "posil"))
+
+
+class BulkStatusTests(ApiTestCase):
+    url = "/api/reservations/change_status/bulk/"
+
+    def test_results_match_what_was_updated(self):
+        other_teacher = self.make_user("teacher2", "teacher")
+        pending = Reservation.objects.create(user=self.student, activity_slot=self.slot, status=Reservation.Status.PENDING)
+        cancelled = Reservation.objects.create(
+            user=self.make_user("student2", "student"), activity_slot=self.slot, status=Reservation.Status.CANCELLED,
+        )
+        foreign = Reservation.objects.create(
+            user=self.student, activity_slot=self.make_slot(self.start + timedelta(hours=1), teacher=other_teacher),
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.send("patch", self.teacher, self.url, {"status": "approved", "ids": [pending.id, cancelled.id, foreign.id]})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["updated"], 1)
+        self.assertEqual(
+            {item["id"]: item["result"] for item in response.json()["results"]},
+            {pending.id: "updated", cancelled.id: "invalid_transition", foreign.id: "not_found"},
+        )
+        self.assertEqual(
+            dict(Reservation.objects.values_list("id", "status")),
+            {pending.id: "approved", cancelled.id: "cancelled", foreign.id: None},
+        )
+
+
+    def test_single_change_follows_the_same_transitions(self):
+        cancelled = Reservation.objects.create(user=self.student, activity_slot=self.slot, status=Reservation.Status.CANCELLED)
+        pending = Reservation.objects.create(user=self.make_user("student2", "student"), activity_slot=self.slot)
+        url = "/api/reservations/change_status/{}/"
+
+        response = self.send("patch", self.teacher, url.format(cancelled.id), {"status": "approved"})
+        self.assertEqual((response.status_code, response.json()["code"]), (400, "invalid_transition"))
+        self.assertEqual(self.send("patch", self.teacher, url.format(pending.id), {"status": "approved"}).status_code, 200)
+        self.assertEqual(self.send("patch", self.teacher, url.format(pending.id), {"status": "approved"}).status_code, 200)
+        self.assertEqual(self.send("patch", self.make_user("teacher2", "teacher"), url.format(pending.id), {"status": "cancelled"}).status_code, 404)
+
+        self.assertEqual(
+            dict(Reservation.objects.values_list("id", "status")),
+            {cancelled.id: "cancelled", pending.id: "approved"},
+        )
+
+class ActivityWithSlotsTests(ApiTestCase):
+    url = "/api/activities/create-with-slots/"
+
+    def payload(self, starts, room="28"):
+        return {
+            "name": "Biliard", "description": "Stôl", "capacity": 4, "available_hours": "0:00-23:59", "category": "gaming", "room": room,
+            "role": self.roles["student"].id,
+            "activity_slots": [
+                {"start_date": start.isoformat(), "end_date": (start + timedelta(minutes=45)).isoformat()} for start in starts
+            ],
+        }
+
+    def test_conflicts_are_loaded_only_around_new_slots(self):
+        starts = [self.start + timedelta(days=1), self.start + timedelta(days=6)]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.send("post", self.teacher, self.url, self.payload(starts, room="B1"))
+
+        self.assertEqual(response.status_code, 201, response.content)
+        conflict_sql = [query["sql"] for query in queries if '"api_activityslot"."end_date" >' in query["sql"]]
+        # dotaz podla ucitela a podla miestnosti, kazdy s dvoma rozsahmi namiesto jedneho cez cely tyzden
+        self.assertEqual(len(conflict_sql), 2)
+        self.assertTrue(all(" OR " in sql for sql in conflict_sql))
+        self.assertEqual(ActivitySlot.objects.filter(activity__name="Biliard").count(), 2)
+
+    def test_teacher_and_room_conflicts_are_reported(self):
+        response = self.send("post", self.teacher, self.url, self.payload([self.start + timedelta(minutes=30)]))
+
+        self.assertEqual(response.status_code, 400)
+        reasons = sorted(conflict["reason"] for conflict in response.json()["activity_slots"])
+        self.assertEqual(reasons, ["room", "teacher"])
+        self.assertFalse(Activity.objects.filter(name="Biliard").exists())
+
+    def test_windows_are_coalesced_at_largest_gaps(self):
+        windows = [(30, 31), (0, 1), (2, 3), (10, 11), (12, 13), (12, 14)]
+
+        self.assertEqual(coalesce_windows(windows, 10), [(0, 1), (2, 3), (10, 11), (12, 14), (30, 31)])
+        self.assertEqual(coalesce_windows(windows, 3), [(0, 3), (10, 14), (30, 31)])
+        self.assertEqual(coalesce_windows(windows, 1), [(0, 31)])
+
+
+class OpeningHoursTests(TestCase):
+    def test_batch_check_matches_per_slot_check_across_dst(self):
+        compiled = compile_opening_hours({"mon": [["07:30", "16:00"]], "sat": [["00:00", "03:30"]], "sun": [["22:00", "24:00"]]})
+        # 25.10.2026 konci letny cas
+        first = timezone.make_aware(datetime(2026, 10, 17))
+        intervals = [
+            (first + timedelta(minutes=15 * step), first + timedelta(minutes=15 * step + length))
+            for step in range(0, 3 * 7 * 96, 5) for length in (0, 45, 210)
+        ]
+
+        expected = [index for index, (start, end) in enumerate(intervals) if not compiled.contains(start, end)]
+
+        self.assertEqual(compiled.outside(intervals), expected)
+        self.assertLess(len(expected), len(intervals))
+
+
+class ListQueryCountTests(ApiTestCase):
+    """
+    Pocet dotazov zoznamov nezavisi od poctu riadkov (ziadne N+1).
+    Pouzivatel + rola (snapshot katalogu sa v testovej transakcii nepublikuje) + data.
+    """
+
+    def add_activities(self, count):
+        for index in range(count):
+            activity = Activity.objects.create(
+                name=f"Aktivita {index}", description="", capacity=1, available_hours="7:30-16:00", category="sport",
+                room=f"R{index}", role=self.roles["student"], created_by=self.teacher,
+            )
+            self.make_slot(self.start + timedelta(hours=index + 1), activity=activity)
+
+    def add_reservations(self, count):
+        for index in range(count):
+            Reservation.objects.create(user=self.student, activity_slot=self.make_slot(self.start + timedelta(days=2, hours=index)))
+
+    def assert_constant_queries(self, queries, add_rows, user, url, params=None):
+        for _ in range(2):
+            add_rows(5)
+            with self.assertNumQueries(queries):
+                response = self.get(user, url, params)
+            self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_activities(self):
+        self.assert_constant_queries(3, self.add_activities, self.student, "/api/activities/")
+
+    def test_activities_filtered_and_paginated(self):
+        params = {
+            "category": "sport", "free_from": self.start.isoformat(), "free_to": (self.start + timedelta(days=1)).isoformat(),
+            "ordering": "-name", "page": 1, "page_size": 3,
+        }
+        # + COUNT pre strankovanie
+        data = self.assert_constant_queries(4, self.add_activities, self.teacher, "/api/activities/", params)
+        self.assertEqual(data["count"], 10)
+        self.assertEqual([activity["name"] for activity in data["results"]], ["Aktivita 4", "Aktivita 4", "Aktivita 3"])
+
+    def test_reservations(self):
+        self.assert_constant_queries(3, self.add_reservations, self.student, "/api/reservations/")
+
+
+class AvailabilityIndexTests(ApiTestCase):
+    def test_deleted_reservation_reloads_only_its_activity(self):
+        reservation = Reservation.objects.create(user=self.student, activity_slot=self.slot)
+        index = availability.AvailabilityIndex.build()
+        self.assertEqual(index.slots(self.activity.id).reserved, [1])
+
+        reservation_id = reservation.id
+        reservation.delete()
+        entry = ChangeLogEntry.objects.get(model="reservation", object_id=reservation_id, operation="deleted")
+        self.assertEqual(entry.data["activity_slot_id"], self.slot.id)
+        index.synced_at = 0
+        index.sync()
+
+        self.assertFalse(index.needs_rebuild)
+        self.assertEqual(index.dirty, {self.activity.id})
+        with self.assertNumQueries(1):
+            self.assertEqual(index.slots(self.activity.id).reserved, [0])
+
+    def test_change_feed_keeps_data_of_deleted_entries_private(self):
+        reservation = Reservation.objects.create(user=self.student, activity_slot=self.slot)
+        reservation.delete()
+
+        changes = self.get(self.student, "/api/changes/").json()["changes"]
+
+        self.assertEqual([change["data"] for change in changes if change["operation"] == "deleted"], [None])
+
+
+class AvailabilityRebuildTests(TransactionTestCase):
+    def setUp(self):
+        self.previous = availability._index
+
+    def tearDown(self):
+        availability._index = self.previous
+
+    def test_stale_index_is_served_while_another_thread_rebuilds(self):
+        stale = availability.AvailabilityIndex.build()
+        stale.built_at = 0
+        availability._index = stale
+
+        with availability._build_lock:
+            # ine vlakno prave stavia index - request necaka a dostane stary
+            self.assertIs(availability.get_index(), stale)
+
+        rebuilt = availability.get_index()
+        self.assertIsNot(rebuilt, stale)
+        self.assertIs(availability._index, rebuilt)
+
+    def test_index_that_missed_changes_is_not_served_during_rebuild(self):
+        stale = availability.AvailabilityIndex.build()
+        stale.needs_rebuild = True
+        availability._index = stale
+
+        with availability._build_lock:
+            self.assertIsNone(availability.get_index())
+
+
+class RollupTests(ApiTestCase):
+    def rollups(self):
+        return sorted(
+            DailyUtilization.objects.values_list("date", "activity_id", "teacher_id", "slots", "reservations", "active")
+        )
+
+    def expected(self):
+        return sorted(
+            (row.date, row.activity_id, row.teacher_id, row.slots, row.reservations, row.active)
+            for row in aggregate(Q(), Q())
+        )
+
+    def test_request_leaves_rollups_to_the_worker(self):
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as queries:
+            response = self.send("post", self.student, "/api/reservations/create/", {"activity_slot": self.slot.id})
+
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse([query for query in queries if "api_dailyutilization" in query["sql"]])
+        self.assertEqual(self.rollups(), [])
+
+        schedule_periodic()
+        run_jobs()
+
+        self.assertEqual(self.rollups(), [(local_date(self.start), self.activity.id, self.teacher.id, 1, 1, 1)])
+        job = Job.objects.get(task="api.refresh_rollups", status=Job.Status.PENDING)
+        self.assertIn("cursor", job.payload)
+
+    def test_moved_slot_refreshes_its_previous_day(self):
+        Reservation.objects.create(user=self.student, activity_slot=self.slot)
+        cursor = self.refresh(0)
+        self.assertEqual(cursor, ChangeLogEntry.objects.latest("id").id)
+        self.assertEqual(len(self.rollups()), 1)
+
+        self.slot.start_date += timedelta(days=1)
+        self.slot.end_date += timedelta(days=1)
+        self.slot.save()
+        self.refresh(cursor)
+
+        self.assertEqual(self.rollups(), self.expected())
+        self.assertEqual([row[0] for row in self.rollups()], [local_date(self.start + timedelta(days=1))])
+
+    def refresh(self, cursor):
+        # cerstve zaznamy kurzor neposunu, preto sa "zostarnu" o okno change feedu
+        ChangeLogEntry.objects.update(created_at=timezone.now() - timedelta(hours=1))
+        return refresh_rollups({"cursor": cursor})["cursor"]
+
+
+class CalendarFeedTests(ApiTestCase):
+    def setUp(self):
+        # id zaznamov sa po rollbacku testu opakuju, v cache by ostali feedy z inych testov
+        cache.clear()
+
+    def etag(self, user):
+        feed, _ = CalendarFeed.objects.get_or_create(user=user)
+        response = self.client.get(f"/api/calendar/{feed.token}.ics")
+        self.assertEqual(response.status_code, 200)
+        b"".join(response.streaming_content)
+        return response["ETag"]
+
+    def test_reservation_write_does_not_touch_feeds(self):
+        CalendarFeed.objects.create(user=self.student)
+        with CaptureQueriesContext(connection) as queries:
+            self.send("post", self.student, "/api/reservations/create/", {"activity_slot": self.slot.id})
+
+        self.assertFalse([query for query in queries if "api_calendarfeed" in query["sql"]])
+
+    def test_unchanged_feed_answers_304_in_two_queries(self):
+        Reservation.objects.create(user=self.student, activity_slot=self.slot)
+        feed = CalendarFeed.objects.create(user=self.student)
+        etag = self.etag(self.student)
+
+        with self.assertNumQueries(2):
+            response = self.client.get(f"/api/calendar/{feed.token}.ics", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_changes_only_with_changes_in_the_feed(self):
+        other = self.make_user("other", "student")
+        Reservation.objects.create(user=self.student, activity_slot=self.slot)
+        student_etag, teacher_etag = self.etag(self.student), self.etag(self.teacher)
+
+        Reservation.objects.create(user=other, activity_slot=self.make_slot(self.start + timedelta(days=2)))
+        self.assertEqual(self.etag(self.student), student_etag)
+        self.assertNotEqual(self.etag(self.teacher), teacher_etag)
+
+        self.slot.start_date += timedelta(hours=1)
+        self.slot.end_date += timedelta(hours=1)
+        self.slot.save()
+        self.assertNotEqual(self.etag(self.student), student_etag)
+
+    def test_reassigned_slot_changes_previous_teachers_feed(self):
+        etag = self.etag(self.teacher)
+
+        self.slot.teacher = self.make_user("teacher2", "teacher")
+        self.slot.save()
+
+        self.assertNotEqual(self.etag(self.teacher), etag)
+        self.assertNotIn(b"slot-", b"".join(self.client.get(f"/api/calendar/{self.teacher.calendar_feed.token}.ics").streaming_content))
+
+
+    async def test_feed_is_streamed_asynchronously_under_asgi(self):
+        reservation = await Reservation.objects.acreate(user=self.student, activity_slot=self.slot)
+        feed = await CalendarFeed.objects.acreate(user=self.student)
+
+        response = await AsyncClient().get(f"/api/calendar/{feed.token}.ics")
+
+        self.assertEqual(response.status_code, 200)
+        # asynchronny iterator - ASGI handler ho neprecita cely do pamate
+        self.assertTrue(response.is_async)
+        body = b"".join([chunk async for chunk in response.streaming_content])
+        self.assertIn(f"UID:reservation-{reservation.id}@".encode(), body)
+        self.assertTrue(body.rstrip().endswith(b"END:VCALENDAR"))
+
+
+class ReservationWriteTests(ApiTestCase):
+    """Zmena rezervacie zapise len seba a jeden zaznam change logu, zvysok (suhrny, kalendar) sa odvodi z logu."""
+
+    def write(self, method, user, url, data=None, queries=None):
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as captured:
+            response = self.send(method, user, url, data)
+        self.assertLess(response.status_code, 300, response.content)
+        self.assertEqual(written_tables(captured), ["api_reservation", "api_changelogentry"])
+        self.assertEqual(len(captured), queries, "\n".join(query["sql"] for query in captured))
+        return response
+
+    def test_create_status_and_delete(self):
+        # pouzivatel, rola, zamok slotu s aktivitou a ucitelom, kapacita, prekryvanie, 2 zapisy (+ savepoint)
+        response = self.write("post", self.student, "/api/reservations/create/", {"activity_slot": self.slot.id}, queries=9)
+        reservation_id = response.json()["reservation"]["id"]
+
+        # pouzivatel, rola, zamok rezervacie so slotom, 2 zapisy (+ savepoint)
+        self.write("patch", self.teacher, f"/api/reservations/change_status/{reservation_id}/", {"status": "approved"}, queries=7)
+        self.write("delete", self.student, f"/api/reservations/delete/{reservation_id}/", queries=5)
+
+    def test_create_does_not_grow_with_history(self):
+        past = [self.make_slot(self.start - timedelta(days=day + 2)) for day in range(30)]
+        Reservation.objects.bulk_create([Reservation(user=self.student, activity_slot=slot) for slot in past])
+
+        self.write("post", self.student, "/api/reservations/create/", {"activity_slot": self.slot.id}, queries=9)
+
+
+@override_settings(CATALOG_CHECK_SECONDS=0)
+class CatalogPublishTests(ApiTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        override = override_settings(CATALOG_SNAPSHOT_DIR=directory.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        catalog._snapshot = None
+        self.addCleanup(setattr, catalog, "_snapshot", None)
+
+    def publish_jobs(self):
+        return Job.objects.filter(task=catalog.PUBLISH_TASK, status=Job.Status.PENDING)
+
+    def test_changes_are_published_once_by_the_worker(self):
+        for index in range(3):
+            Activity.objects.create(name=f"Nova {index}", capacity=1, available_hours="7:30-16:00", room="1", role=self.roles["student"])
+        self.activity.capacity = 5
+        self.activity.save()
+
+        self.assertEqual(self.publish_jobs().count(), 1)
+        self.assertIsNone(catalog.get_snapshot())
+
+        self.publish_jobs().update(run_at=timezone.now())
+        run_jobs()
+
+        snapshot = catalog.get_snapshot()
+        self.assertEqual(snapshot.version, CatalogVersion.objects.get().version)
+        self.assertEqual(snapshot.activity(self.activity.id)["capacity"], 5)
+        self.assertEqual(snapshot.activities.count, 4)
+
+    def test_read_never_publishes(self):
+        Activity.objects.bulk_create([Activity(name="Bez signalu", capacity=1, available_hours="7:30-16:00", room="1", role=self.roles["student"])])
+        Job.objects.all().delete()
+
+        response = self.get(self.student, "/api/activities/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Job.objects.exists())
+        self.assertIsNone(catalog.get_snapshot())
+
+    def test_unpublished_changes_are_read_from_the_db(self):
+        catalog.publish()
+        role = self.roles["student"]
+        self.activity.capacity = 10
+        self.activity.save()
+        role.description = "Upravena"
+        role.save()
+
+        self.assertIsNone(catalog.get_snapshot())
+        self.assertEqual(catalog.activity(self.activity.id)["capacity"], 10)
+        self.assertEqual(catalog.role(role.id).description, "Upravena")
+
+        self.publish_jobs().update(run_at=timezone.now())
+        run_jobs()
+        self.assertEqual(catalog.get_snapshot().activity(self.activity.id)["capacity"], 10)
+
+    def test_deleted_activity_is_not_served_before_publish(self):
+        catalog.publish()
+        activity_id = self.activity.id
+        self.assertIsNotNone(catalog.get_snapshot().activity(activity_id))
+
+        self.activity.delete()
+
+        self.assertIsNone(catalog.activity(activity_id))
+        url = f"/api/activity-slots/{activity_id}/{self.start.isoformat()}/{(self.start + timedelta(days=1)).isoformat()}/"
+        self.assertEqual(self.get(self.student, url).status_code, 404)
+
+    def test_snapshot_older_than_last_publish_is_not_used(self):
+        catalog.publish()
+        self.assertIsNotNone(catalog.get_snapshot())
+
+        # iny stroj publikoval novsiu verziu, subor na tomto stroji ostal stary
+        CatalogVersion.objects.update(version=catalog.get_snapshot().version + 1)
+
+        self.assertIsNone(catalog.get_snapshot())
+        # verzia z DB (CATALOG_CHECK_SECONDS=0) + aktivita z DB
+        with self.assertNumQueries(2):
+            self.assertEqual(catalog.activity(self.activity.id)["name"], "PS5")
+
+
+class BootstrapTests(ApiTestCase):
+    def test_bootstrap_returns_all_parts(self):
+        reservation = Reservation.objects.create(user=self.student, activity_slot=self.slot)
+        hidden = Activity.objects.create(name="Len ucitelia", capacity=1, available_hours="7:30-16:00", room="2", role=self.roles["teacher"])
+        self.make_slot(self.start, activity=hidden)
+
+        response = self.get(self.student, "/api/bootstrap/")
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["user"]["id"], self.student.id)
+        self.assertEqual([activity["id"] for activity in data["activities"]], [self.activity.id])
+        self.assertEqual([item["id"] for item in data["reservations"]], [reservation.id])
+        availability = data["availability"]["activities"]
+        self.assertEqual([(item["activityId"], item["freePlaces"]) for item in availability], [(self.activity.id, 1)])
+        self.assertIn("cursor", data)
+
+    def test_bootstrap_requires_token(self):
+        self.assertEqual(self.client.get("/api/bootstrap/").status_code, 401)
+        self.assertEqual(self.client.get("/api/bootstrap/", {"days": 40}, HTTP_AUTHORIZATION=bearer(self.student)).status_code, 400)
+
+
+class BootstrapConcurrencyTests(TransactionTestCase):
+    def setUp(self):
+        role, _ = Role.objects.get_or_create(name="student", defaults={"description": "Student"})
+        self.student = User.objects.create_user(username="student", email="student@kp.sk", password="heslo", role=role)
+        self.activity = Activity.objects.create(name="PS5", capacity=2, available_hours="7:30-16:00", room="28", role=role)
+        start = timezone.now() + timedelta(days=1)
+        slot = ActivitySlot.objects.create(activity=self.activity, start_date=start, end_date=start + timedelta(minutes=45))
+        self.reservation = Reservation.objects.create(user=self.student, activity_slot=slot)
+
+    def test_parts_run_concurrently_outside_a_transaction(self):
+        # obe casti cakaju na seba - po sebe by bariera vyprsala
+        barrier = threading.Barrier(2, timeout=5)
+        threads = set()
+
+        def together(func):
+            def run(*args, **kwargs):
+                threads.add(threading.get_ident())
+                barrier.wait()
+                return func(*args, **kwargs)
+            return run
+
+        with patch.object(views, "upcoming_reservations", together(views.upcoming_reservations)), \
+                patch.object(views, "availability_summary", together(views.availability_summary)):
+            response = self.client.get("/api/bootstrap/", HTTP_AUTHORIZATION=bearer(self.student))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(threads), 2)
+        data = response.json()
+        self.assertEqual([activity["id"] for activity in data["activities"]], [self.activity.id])
+        self.assertEqual([item["id"] for item in data["reservations"]], [self.reservation.id])
+        self.assertEqual([item["freePlaces"] for item in data["availability"]["activities"]], [1])
+        self.assertEqual(data["cursor"], current_cursor())
+
+
+@override_settings(IDEMPOTENCY_WAIT_SECONDS=0, IDEMPOTENCY_LOCK_SECONDS=120)
+class IdempotencyTests(ApiTestCase):
+    url = "/api/reservations/create/"
+
+    def create(self, key="k-1", slot=None):
+        data = {"activity_slot": (slot or self.slot).id}
+        return self.send("post", self.student, self.url, data, HTTP_IDEMPOTENCY_KEY=key)
+
+    def lock(self, key="k-1", locked_at=None, **fields):
+        now = timezone.now()
+        first = self.create(key)
+        IdempotencyKey.objects.filter(key=key).update(
+            status_code=None, response=None, locked_at=locked_at or now, **fields,
+        )
+        Reservation.objects.all().delete()
+        return first
+
+    def test_retry_replays_the_stored_response(self):
+        first = self.create()
+        second = self.create()
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual((second.status_code, second.json()), (201, first.json()))
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertEqual(Reservation.objects.count(), 1)
+
+    def test_same_key_with_other_body_is_rejected(self):
+        self.create()
+        response = self.create(slot=self.make_slot(self.start + timedelta(hours=2)))
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Reservation.objects.count(), 1)
+
+    def test_duplicate_of_running_request_gets_409(self):
+        self.lock()
+
+        self.assertEqual(self.create().status_code, 409)
+        self.assertFalse(Reservation.objects.exists())
+
+    @override_settings(IDEMPOTENCY_WAIT_SECONDS=5)
+    def test_duplicate_waits_for_running_request(self):
+        first = self.lock()
+
+        def finish(seconds):
+            # prvy request medzitym dobehol a ulozil odpoved
+            IdempotencyKey.objects.update(status_code=201, response=encode_response(first.json()))
+
+        with patch("api.idempotency.time.sleep", side_effect=finish) as sleep:
+            response = self.create()
+
+        self.assertEqual(sleep.call_count, 1)
+        self.assertEqual((response.status_code, response.json()), (201, first.json()))
+        self.assertFalse(Reservation.objects.exists())
+
+    def test_abandoned_lock_is_taken_over(self):
+        self.lock(locked_at=timezone.now() - timedelta(seconds=121))
+
+        response = self.create()
+
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn("Idempotent-Replayed", response)
+        self.assertEqual(IdempotencyKey.objects.get().status_code, 201)
+
+    def test_expired_key_can_be_used_again(self):
+        self.lock(expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(self.create().status_code, 201)
+        self.assertEqual(Reservation.objects.count(), 1)
+
+    def test_purge_deletes_only_expired_keys(self):
+        self.create("old")
+        self.create("new", slot=self.make_slot(self.start + timedelta(hours=2)))
+        IdempotencyKey.objects.filter(key="old").update(expires_at=timezone.now() - timedelta(seconds=1))
+        output = StringIO()
+
+        call_command("purge_idempotency_keys", "--batch-size", "1", stdout=output)
+
+        self.assertEqual(list(IdempotencyKey.objects.values_list("key", flat=True)), ["new"])
+        self.assertIn("Zmazaných záznamov: 1", output.getvalue())
+
+
+@override_settings(ARCHIVE_RETENTION_DAYS=180)
+class ArchiveTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other = cls.make_user("other", "student")
+        old = cls.start - timedelta(days=200)
+        cls.old_slots = [cls.make_slot(old + timedelta(days=day)) for day in range(3)]
+        cls.old_reservations = [
+            Reservation.objects.create(user=user, activity_slot=slot, note=f"pozn {index}", status=Reservation.Status.APPROVED)
+            for index, slot in enumerate(cls.old_slots)
+            for user in (cls.student, cls.other)
+        ]
+        # slot tesne vnutri retencneho okna
+        cls.recent_slot = cls.make_slot(cls.start - timedelta(days=178))
+        cls.recent = Reservation.objects.create(user=cls.student, activity_slot=cls.recent_slot)
+
+    def test_archived_rows_match_the_originals(self):
+        originals = {
+            reservation.id: (reservation.user_id, reservation.activity_slot_id, reservation.note, reservation.status, reservation.created_at)
+            for reservation in self.old_reservations
+        }
+        changes = ChangeLogEntry.objects.count()
+
+        self.assertEqual(archive_batch(retention_cutoff()), (3, 6))
+
+        archived = {
+            reservation.id: (reservation.user_id, reservation.activity_slot_id, reservation.note, reservation.status, reservation.created_at)
+            for reservation in ArchivedReservation.objects.all()
+        }
+        self.assertEqual(archived, originals)
+        for slot in self.old_slots:
+            copy = ArchivedActivitySlot.objects.get(id=slot.id)
+            self.assertEqual((copy.activity_id, copy.teacher_id, copy.start_date, copy.end_date), (slot.activity_id, slot.teacher_id, slot.start_date, slot.end_date))
+            self.assertEqual(
+                set(ArchivedReservation.objects.filter(activity_slot=copy).values_list("start_date", "end_date", "activity_id")),
+                {(slot.start_date, slot.end_date, slot.activity_id)},
+            )
+        self.assertFalse(ActivitySlot.objects.filter(id__in=[slot.id for slot in self.old_slots]).exists())
+        self.assertFalse(Reservation.objects.filter(id__in=originals).exists())
+        # archivacia nie je zmazanie pre klientov
+        self.assertEqual(ChangeLogEntry.objects.count(), changes)
+
+    def test_rows_inside_retention_window_are_untouched(self):
+        list(archive_past(retention_cutoff()))
+
+        self.assertEqual(set(ActivitySlot.objects.values_list("id", flat=True)), {self.slot.id, self.recent_slot.id})
+        self.assertEqual(list(Reservation.objects.values_list("id", flat=True)), [self.recent.id])
+        self.assertFalse(ArchivedActivitySlot.objects.filter(id__in=[self.slot.id, self.recent_slot.id]).exists())
+
+    def test_partial_batches_and_rerun_are_idempotent(self):
+        cutoff = retention_cutoff()
+        self.assertEqual(list(archive_past(cutoff, batch_size=2, max_batches=1)), [(2, 4)])
+        self.assertEqual(list(archive_past(cutoff, batch_size=2)), [(1, 2)])
+        self.assertEqual(list(archive_past(cutoff, batch_size=2)), [])
+
+        self.assertEqual(ArchivedActivitySlot.objects.count(), 3)
+        self.assertEqual(ArchivedReservation.objects.count(), 6)
+
+    def test_history_pages_have_no_gaps_or_duplicates(self):
+        list(archive_past(retention_cutoff()))
+        # rovnaky start_date - poradie urci id
+        same_start = self.make_slot(self.old_slots[0].start_date, activity=self.activity)
+        Reservation.objects.create(user=self.student, activity_slot=same_start)
+        list(archive_past(retention_cutoff()))
+
+        seen, cursor = [], None
+        while True:
+            response = self.get(self.student, "/api/reservations/history/", {"limit": 2, **({"cursor": cursor} if cursor else {})})
+            self.assertEqual(response.status_code, 200)
+            seen += [item["id"] for item in response.json()["results"]]
+            cursor = response.json()["next_cursor"]
+            if cursor is None:
+                break
+
+        expected = list(
+            ArchivedReservation.objects.filter(user=self.student).order_by("-start_date", "-id").values_list("id", flat=True)
+        )
+        self.assertEqual(len(expected), 4)
+        self.assertEqual(seen, expected)
+
+    def test_history_page_boundary(self):
+        list(archive_past(retention_cutoff()))
+        queryset = ArchivedReservation.objects.filter(user=self.student)
+
+        items, cursor = history_page(queryset, limit=3)
+        self.assertEqual((len(items), cursor), (3, None))
+        items, cursor = history_page(queryset, limit=2)
+        rest, last = history_page(queryset, cursor=cursor, limit=2)
+        self.assertEqual((len(rest), last), (1, None))
+
+
+class FreeRoomTests(ApiTestCase):
+    def setUp(self):
+        self.window = self.start + timedelta(days=3)
+        Activity.objects.create(name="Prazdna", capacity=1, available_hours="7:30-16:00", room="B2", role=self.roles["student"])
+        for start, minutes in [(-30, 45), (60, 30), (75, 45), (230, 40), (-60, 60), (240, 30)]:
+            self.make_slot(self.window + timedelta(minutes=start), minutes=minutes)
+
+    def free_rooms(self, **params):
+        response = self.get(self.teacher, "/api/rooms/free/", {
+            "start": self.window.isoformat(), "end": (self.window + timedelta(hours=4)).isoformat(), **params,
+        })
+        self.assertEqual(response.status_code, 200)
+        return {
+            room["room"]: [
+                (int((datetime.fromisoformat(gap["start_date"]) - self.window).total_seconds() // 60),
+                 int((datetime.fromisoformat(gap["end_date"]) - self.window).total_seconds() // 60), gap["minutes"])
+                for gap in room["free"]
+            ]
+            for room in response.json()["rooms"]
+        }
+
+    def test_gaps_are_clipped_to_the_window(self):
+        # slot konciaci presne na zaciatku okna a slot zacinajuci presne na jeho konci okno neobsadzuju
+        self.assertEqual(self.free_rooms(), {
+            "28": [(15, 60, 45), (120, 230, 110)],
+            "B2": [(0, 240, 240)],
+        })
+
+    def test_min_duration_drops_short_gaps(self):
+        self.assertEqual(self.free_rooms(min_duration=46)["28"], [(120, 230, 110)])
+        self.assertEqual(self.free_rooms(min_duration=45)["28"], [(15, 60, 45), (120, 230, 110)])
+
+    def test_window_is_validated(self):
+        end = self.window + timedelta(days=32)
+        self.assertEqual(self.get(self.teacher, "/api/rooms/free/", {"start": self.window.isoformat(), "end": end.isoformat()}).status_code, 400)
+        self.assertEqual(self.get(self.teacher, "/api/rooms/free/", {"start": self.window.isoformat(), "end": self.window.isoformat()}).status_code, 400)
+
+
+class AdminChangelistTests(ApiTestCase):
+    url = "/admin/api/reservation/"
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username="admin", email="admin@kp.sk", password="heslo", role=self.roles["admin"])
+        self.client.force_login(self.admin)
+        self.other = Activity.objects.create(name="Posilňovňa", capacity=50, available_hours="7:30-16:00", room="12", role=self.roles["student"])
+        self.other_slot = self.make_slot(self.start, activity=self.other)
+
+    def reserve(self, count, activity_slot=None):
+        users = [self.make_user(f"user{Reservation.objects.count()}-{index}", "student") for index in range(count)]
+        return [Reservation.objects.create(user=user, activity_slot=activity_slot or self.slot) for user in users]
+
+    def changelist(self, params=None):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return {reservation.id for reservation in response.context["cl"].result_list}, len(captured)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.reserve(2)
+        _, few = self.changelist()
+        self.reserve(20, self.other_slot)
+        shown, many = self.changelist()
+
+        self.assertEqual(len(shown), 22)
+        self.assertEqual(many, few)
+
+    def test_search_and_filters(self):
+        console = self.reserve(2)
+        gym = self.reserve(3, self.other_slot)
+        gym[0].status = Reservation.Status.APPROVED
+        gym[0].save()
+
+        self.assertEqual(self.changelist({"q": "posilnovna"})[0], {reservation.id for reservation in gym})
+        self.assertEqual(self.changelist({"q": console[0].user.username})[0], {console[0].id})
+        # cislo hlada aj podla id (fulltext moze navyse trafit aktivitu s miestnostou "28")
+        by_id = self.changelist({"q": str(gym[1].id)})[0]
+        self.assertIn(gym[1].id, by_id)
+        self.assertFalse(by_id & {gym[0].id, gym[2].id})
+        self.assertEqual(self.changelist({"activity": self.activity.id})[0], {reservation.id for reservation in console})
+        self.assertEqual(self.changelist({"status__exact": "approved"})[0], {gym[0].id})
+
+    def test_paginator_estimates_large_unfiltered_tables(self):
+        reservations = self.reserve(5)
+        with patch.object(EstimatedCountPaginator, "COUNT_LIMIT", 3):
+            # nefiltrovany zoznam - odhad velkosti tabulky (MAX(id) na SQLite)
+            self.assertEqual(EstimatedCountPaginator(Reservation.objects.order_by("-pk"), 2).count, reservations[-1].id)
+            # filtrovany zoznam - najviac COUNT_LIMIT
+            self.assertEqual(EstimatedCountPaginator(Reservation.objects.filter(status=None).order_by("-pk"), 2).count, 3)
+        self.assertEqual(EstimatedCountPaginator(Reservation.objects.order_by("-pk"), 2).count, 5)
+
+
+class HeatmapTests(ApiTestCase):
+    url = "/api/stats/heatmap/"
+    params = {"start": "2026-10-19", "end": "2026-10-26"}
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        def local(*args):
+            return timezone.make_aware(datetime(*args))
+
+        cls.slots = [
+            cls.make_slot(local(2026, 10, 19, 10, 7), minutes=75),
+            # 25.10. o 3:00 sa posuva cas spat - slot cez zmenu casu
+            cls.make_slot(datetime(2026, 10, 25, 0, 50, tzinfo=dt_timezone.utc), minutes=60),
+            # z nedele na pondelok cez polnoc
+            cls.make_slot(local(2026, 10, 25, 23, 30), minutes=70),
+            # zacina pred oknom
+            cls.make_slot(local(2026, 10, 18, 23, 0), minutes=90),
+            cls.make_slot(local(2026, 10, 26, 15, 0)),
+        ]
+        users = [cls.make_user(f"heat{index}", "student") for index in range(3)]
+        for slot, statuses in zip(cls.slots, ([None, "cancelled"], [None], [None, "approved"], ["approved"], [])):
+            for user, status in zip(users, statuses):
+                Reservation.objects.create(user=user, activity_slot=slot, status=status)
+        other = Activity.objects.create(name="Xbox", capacity=4, available_hours="7:30-16:00", room="28", role=cls.roles["student"])
+        cls.make_slot(local(2026, 10, 20, 10, 0), activity=other)
+        cls.window = (local(2026, 10, 19, 0, 0), local(2026, 10, 27, 0, 0))
+
+    def setUp(self):
+        cache.clear()
+
+    def reference(self, slots, start_day, end_day):
+        """Po minútach v lokálnom čase, bez NumPy."""
+        tz = timezone.get_default_timezone()
+        start = timezone.make_aware(datetime.combine(start_day, datetime.min.time()), tz)
+        end = timezone.make_aware(datetime.combine(end_day + timedelta(days=1), datetime.min.time()), tz)
+        offered = [[0.0] * heatmap.BUCKETS_PER_DAY for _ in range(7)]
+        booked = [[0.0] * heatmap.BUCKETS_PER_DAY for _ in range(7)]
+        for slot in slots:
+            count = Reservation.objects.filter(activity_slot=slot).exclude(status=Reservation.Status.CANCELLED).count()
+            moment, stop = max(slot.start_date, start), min(slot.end_date, end)
+            while moment < stop:
+                local = moment.astimezone(tz)
+                bucket = (local.hour * 60 + local.minute) // heatmap.BUCKET_MINUTES
+                offered[local.weekday()][bucket] += slot.activity.capacity
+                booked[local.weekday()][bucket] += count
+                moment += timedelta(minutes=1)
+        days = [0] * 7
+        for index in range((end_day - start_day).days + 1):
+            days[(start_day + timedelta(days=index)).weekday()] += 1
+        occupancy = [[booked[d][b] / offered[d][b] if offered[d][b] else None for b in range(heatmap.BUCKETS_PER_DAY)] for d in range(7)]
+        reserved = [[booked[d][b] / (heatmap.BUCKET_MINUTES * days[d]) if days[d] else 0.0 for b in range(heatmap.BUCKETS_PER_DAY)] for d in range(7)]
+        return occupancy, reserved
+
+    def assertGridEqual(self, actual, expected, places):
+        mismatched = [
+            (day, bucket, value, reference)
+            for day, (actual_row, expected_row) in enumerate(zip(actual, expected))
+            for bucket, (value, reference) in enumerate(zip(actual_row, expected_row))
+            if (value is None) != (reference is None) or (reference is not None and round(abs(value - reference), places) > 0)
+        ]
+        self.assertEqual(mismatched, [])
+
+    def test_buckets_match_scalar_reference(self):
+        response = self.get(self.teacher, self.url, {**self.params, "activity": self.activity.id})
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        # zakladny slot z ApiTestCase moze (podla dnesneho datumu) tiez padnut do okna
+        slots = [slot for slot in ActivitySlot.objects.filter(activity=self.activity) if slot.end_date > self.window[0] and slot.start_date < self.window[1]]
+        self.assertGreaterEqual(len(slots), len(self.slots))
+        self.assertEqual(data["slots"], len(slots))
+        occupancy, reserved = self.reference(slots, date(2026, 10, 19), date(2026, 10, 26))
+        self.assertGridEqual(data["occupancy"], occupancy, 3)
+        self.assertGridEqual(data["reserved"], reserved, 2)
+
+    def test_room_includes_every_activity_in_it(self):
+        data = self.get(self.teacher, self.url, {**self.params, "room": "28"}).json()
+
+        slots = [slot for slot in ActivitySlot.objects.filter(activity__room="28") if slot.end_date > self.window[0] and slot.start_date < self.window[1]]
+        self.assertEqual(data["slots"], len(slots))
+        occupancy, _ = self.reference(slots, date(2026, 10, 19), date(2026, 10, 26))
+        self.assertGridEqual(data["occupancy"], occupancy, 3)
+
+    def test_cached_until_slots_or_reservations_change(self):
+        params = {**self.params, "activity": self.activity.id}
+        with patch.object(heatmap, "compute_heatmap", wraps=heatmap.compute_heatmap) as compute:
+            before = self.get(self.teacher, self.url, params).json()
+            self.assertEqual(self.get(self.teacher, self.url, params).json(), before)
+            self.assertEqual(compute.call_count, 1)
+
+            Reservation.objects.create(user=self.student, activity_slot=self.slots[-1])
+            after = self.get(self.teacher, self.url, params).json()
+
+        self.assertEqual(compute.call_count, 2)
+        self.assertNotEqual(after["occupancy"], before["occupancy"])
+
+
+@override_settings(HOT_READ_COALESCING=True, HOT_READ_FRESH_SECONDS=1, HOT_READ_STALE_SECONDS=10, HOT_READ_WAIT_SECONDS=5)
+class SingleflightTests(SimpleTestCase):
+    key = "test:singleflight"
+
+    def setUp(self):
+        cache.clear()
+        singleflight.stats.clear()
+        self.now = 1000.0
+        self.calls = 0
+        clock = patch.object(singleflight, "time", Mock(time=lambda: self.now))
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def compute(self):
+        self.calls += 1
+        return self.calls
+
+    def wait_for(self, condition):
+        deadline = time.monotonic() + 5
+        while not condition():
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+
+    def test_concurrent_callers_share_one_computation(self):
+        release = threading.Event()
+        results = []
+
+        def slow():
+            release.wait(5)
+            return self.compute()
+
+        def call():
+            results.append(singleflight.do(self.key, slow))
+
+        threads = [threading.Thread(target=call) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        self.wait_for(lambda: singleflight.stats["shared"] == 4)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, [1] * 5)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(singleflight.stats["computed"], 1)
+
+    def test_error_is_raised_in_every_waiting_caller(self):
+        release = threading.Event()
+        errors = []
+
+        def failing():
+            release.wait(5)
+            raise ValueError("db down")
+
+        def call():
+            try:
+                singleflight.do(self.key, failing)
+            except ValueError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        self.wait_for(lambda: singleflight.stats["shared"] == 2)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(errors), 3)
+        self.assertEqual(singleflight._calls, {})
+
+    def test_fresh_stale_and_expired_entries(self):
+        self.assertEqual(singleflight.cached(self.key, self.compute), 1)
+
+        # cerstvy vysledok - bez vypoctu
+        self.now += 0.5
+        self.assertEqual(singleflight.cached(self.key, self.compute), 1)
+        self.assertEqual(self.calls, 1)
+
+        # zastarany - vrati sa stary vysledok a na pozadi prebehne jeden refresh
+        self.now += 1
+        release = threading.Event()
+
+        def slow():
+            release.wait(5)
+            return self.compute()
+
+        self.assertEqual(singleflight.cached(self.key, slow), 1)
+        self.assertEqual(singleflight.cached(self.key, slow), 1)
+        release.set()
+        self.wait_for(lambda: singleflight.stats["refreshed"] == 1 and self.key not in singleflight._refreshing)
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(singleflight.cached(self.key, self.compute), 2)
+
+        # po HOT_READ_FRESH_SECONDS + HOT_READ_STALE_SECONDS sa pocita znova a caka sa na vysledok
+        self.now += 11
+        self.assertEqual(singleflight.cached(self.key, self.compute), 3)
+        self.assertEqual(dict(singleflight.stats), {"computed": 3, "fresh": 2, "stale": 2, "refreshed": 1})
+
+    @override_settings(HOT_READ_COALESCING=False)
+    def test_disabled_coalescing_always_computes(self):
+        self.assertEqual(singleflight.cached(self.key, self.compute), 1)
+        self.assertEqual(singleflight.cached(self.key, self.compute), 2)
+
+
+class FieldSelectionTests(ApiTestCase):
+    def fetch(self, user, url, params, table):
+        """Response and the select list of the main query from ``table``."""
+        with CaptureQueriesContext(connection) as captured:
+            response = self.get(user, url, params)
+        selects = [
+            query["sql"].partition(" FROM ")[0] for query in captured
+            if query["sql"].partition(" FROM ")[2].startswith(f'"{table}"')
+        ]
+        self.assertEqual(len(selects), 1, selects)
+        return response, selects[0]
+
+    def test_fields_prune_output_and_columns(self):
+        response, select = self.fetch(self.student, "/api/activities/", {"fields": "id,name"}, "api_activity")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [{"id": self.activity.id, "name": "PS5"}])
+        self.assertIn('"name"', select)
+        for column in ("description", "available_hours", "opening_hours", "room"):
+            self.assertNotIn(f'"{column}"', select)
+
+    def test_exclude_prunes_output_and_columns(self):
+        response, select = self.fetch(self.student, "/api/activities/", {"exclude": "description,opening_hours"}, "api_activity")
+
+        self.assertEqual(response.status_code, 200)
+        [activity] = response.json()
+        self.assertNotIn("description", activity)
+        self.assertNotIn("opening_hours", activity)
+        self.assertEqual(activity["room"], "28")
+        self.assertNotIn('"description"', select)
+        self.assertNotIn('"opening_hours"', select)
+        self.assertIn('"room"', select)
+
+    def test_reservation_fields_skip_unneeded_joins(self):
+        Reservation.objects.create(user=self.student, activity_slot=self.slot)
+
+        response, select = self.fetch(self.student, "/api/reservations/", {"fields": "id,status_label"}, "api_reservation")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([set(reservation) for reservation in response.json()], [{"id", "status_label"}])
+        self.assertIn('"status"', select)
+        self.assertNotIn('"api_activityslot".', select)
+        self.assertNotIn('"note"', select)
+
+        response, select = self.fetch(self.student, "/api/reservations/", {"exclude": "user,status_label"}, "api_reservation")
+        self.assertEqual(response.json()[0]["activity_slot"]["activity"]["name"], "PS5")
+        self.assertIn('"api_activityslot".', select)
+
+    def test_search_fields_prune_output(self):
+        response = self.get(self.student, "/api/activities/search/", {"q": "ps5", "fields": "id,room"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [{"id": self.activity.id, "room": "28"}])
+
+    def test_unknown_fields_return_400(self):
+        for url, params in (
+            ("/api/activities/", {"fields": "id,bogus"}),
+            ("/api/activities/", {"exclude": "bogus"}),
+            ("/api/activities/search/", {"q": "ps5", "fields": "bogus"}),
+            ("/api/reservations/", {"exclude": "activity"}),
+        ):
+            response = self.get(self.student, url, params)
+            self.assertEqual(response.status_code, 400, (url, params))
+            self.assertIn("Neznáme polia", response.json()["error"])
+
+
+class NextAvailableSlotsTests(ApiTestCase):
+    url = "/api/slots/next-available/"
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        hour = timedelta(hours=1)
+        cls.gym = Activity.objects.create(name="Posilňovňa", capacity=1, available_hours="7:30-16:00", room="12", category="sport", role=cls.roles["student"])
+        staff = Activity.objects.create(name="Zborovňa", capacity=5, available_hours="7:30-16:00", room="1", role=cls.roles["teacher"])
+        users = [cls.make_user(f"next{index}", "student") for index in range(2)]
+
+        cls.full = cls.make_slot(cls.start + hour)
+        cls.staff_slot = cls.make_slot(cls.start + hour, activity=staff)
+        cls.gym_cancelled = cls.make_slot(cls.start + 2 * hour, activity=cls.gym)
+        cls.last_place = cls.make_slot(cls.start + 3 * hour)
+        cls.gym_same_start = cls.make_slot(cls.start + 3 * hour, minutes=60, activity=cls.gym)
+        cls.gym_full = cls.make_slot(cls.start + 4 * hour, activity=cls.gym)
+        cls.long = cls.make_slot(cls.start + 5 * hour, minutes=90)
+
+        for user in users:
+            Reservation.objects.create(user=user, activity_slot=cls.full)
+        Reservation.objects.create(user=users[0], activity_slot=cls.gym_cancelled, status=Reservation.Status.CANCELLED)
+        Reservation.objects.create(user=users[0], activity_slot=cls.last_place)
+        Reservation.objects.create(user=users[1], activity_slot=cls.last_place, status=Reservation.Status.CANCELLED)
+        Reservation.objects.create(user=users[0], activity_slot=cls.gym_full, status=Reservation.Status.APPROVED)
+
+    def slot_ids(self, user, **params):
+        response = self.get(user, self.url, {"after": self.start.isoformat(), **params})
+        self.assertEqual(response.status_code, 200)
+        return [slot["slotId"] for slot in response.json()]
+
+    def test_free_slots_in_start_order(self):
+        expected = [self.slot, self.gym_cancelled, self.last_place, self.gym_same_start, self.long]
+
+        self.assertEqual(self.slot_ids(self.student), [slot.id for slot in expected])
+
+    def test_capacity_counts_only_active_reservations(self):
+        slots = {slot["slotId"]: slot for slot in self.get(self.student, self.url, {"after": self.start.isoformat()}).json()}
+
+        self.assertNotIn(self.full.id, slots)
+        self.assertNotIn(self.gym_full.id, slots)
+        self.assertEqual((slots[self.last_place.id]["reservedCount"], slots[self.last_place.id]["freeCapacity"]), (1, 1))
+        self.assertEqual((slots[self.gym_cancelled.id]["reservedCount"], slots[self.gym_cancelled.id]["freeCapacity"]), (0, 1))
+        self.assertEqual(slots[self.gym_cancelled.id]["activity"]["name"], "Posilňovňa")
+
+        Reservation.objects.filter(activity_slot=self.full).first().delete()
+        self.assertIn(self.full.id, self.slot_ids(self.student))
+
+    def test_window_limit_and_filters(self):
+        hour = timedelta(hours=1)
+        # after je vratane, before nie
+        self.assertEqual(self.slot_ids(self.student, after=(self.start + 3 * hour).isoformat(), before=(self.start + 5 * hour).isoformat()), [self.last_place.id, self.gym_same_start.id])
+        self.assertEqual(self.slot_ids(self.student, limit=2), [self.slot.id, self.gym_cancelled.id])
+        self.assertEqual(self.slot_ids(self.student, min_duration=60), [self.gym_same_start.id, self.long.id])
+        self.assertEqual(self.slot_ids(self.student, category="sport"), [self.gym_cancelled.id, self.gym_same_start.id])
+        self.assertEqual(self.slot_ids(self.student, room="28", limit=1), [self.slot.id])
+
+    def test_role_of_the_user(self):
+        self.assertNotIn(self.staff_slot.id, self.slot_ids(self.student))
+        self.assertIn(self.staff_slot.id, self.slot_ids(self.teacher))
+        self.assertEqual(self.slot_ids(self.teacher, role=self.roles["teacher"].id), [self.staff_slot.id])
+        # student filter role ignoruje
+        self.assertNotIn(self.staff_slot.id, self.slot_ids(self.student, role=self.roles["teacher"].id))
+
+    def test_index_merge_matches_database(self):
+        index = availability.AvailabilityIndex.build()
+        before = self.start + timedelta(days=1)
+        for min_duration, limit in ((None, 100), (None, 3), (timedelta(minutes=60), 100)):
+            merged = availability._merge_free(index.activities, self.start, before, min_duration, limit)
+            params = {"before": before.isoformat(), "limit": limit}
+            if min_duration:
+                params["min_duration"] = 60
+            self.assertEqual([slot[0] for slot in merged], self.slot_ids(self.teacher, **params))
+
+    def test_invalid_parameters(self):
+        for params in ({"after": "zajtra"}, {"limit": "x"}, {"min_duration": "hodina"}, {"before": (self.start - timedelta(days=2)).isoformat()}):
+            self.assertEqual(self.get(self.student, self.url, params).status_code, 400, params)
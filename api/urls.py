@@ -1,7 +1,9 @@
 from django.urls import path
 from .views import (
     get_init, 
+    bootstrap,
     get_user_reservations, 
+    get_reservation_history,
     change_reservation_status, 
     delete_reservation,
     create_reservation,
@@ -9,16 +11,38 @@ from .views import (
     create_activity,
     get_activity_slots,
     create_activity_with_slots,
+    stream_activity_occupancy,
+    get_change_feed,
+    bulk_change_reservation_status,
+    get_free_rooms,
+    get_next_available_slots,
+    search_activities,
+    get_utilization_stats,
+    get_occupancy_heatmap,
+    calendar_feed_url,
+    calendar_ics,
 )
 
 urlpatterns = [
     path("", get_init, name="get_init"),
+    path("bootstrap/", bootstrap, name="bootstrap"),  # GET, vsetko pre start aplikacie v jednom requeste
     path("activity-slots/<int:activity_id>/<str:start_date>/<str:end_date>/", get_activity_slots, name="get_activity_slots"),
+    path("activity-slots/<int:activity_id>/<str:start_date>/<str:end_date>/stream/", stream_activity_occupancy, name="stream_activity_occupancy"),
     path("reservations/", get_user_reservations, name="get_user_reservations"),  # GET
+    path("reservations/history/", get_reservation_history, name="get_reservation_history"),  # GET
     path("reservations/create/", create_reservation, name="create_reservation"),  # POST
     path("reservations/change_status/<int:reservation_id>/", change_reservation_status, name="change_reservation_status"),
+    path("reservations/change_status/bulk/", bulk_change_reservation_status, name="bulk_change_reservation_status"),  # PATCH
     path("reservations/delete/<int:reservation_id>/", delete_reservation, name="delete_reservation"),
     path("activities/", get_activities, name="get_activities"),
+    path("activities/search/", search_activities, name="search_activities"),
     path("activities/create/", create_activity, name="create_activity"),
+    path("rooms/free/", get_free_rooms, name="get_free_rooms"),
+    path("slots/next-available/", get_next_available_slots, name="get_next_available_slots"),  # GET
+    path("changes/", get_change_feed, name="get_change_feed"),
+    path("calendar/", calendar_feed_url, name="calendar_feed_url"),  # GET, POST (novy token)
+    path("calendar/<str:token>.ics", calendar_ics, name="calendar_ics"),
+    path("stats/utilization/", get_utilization_stats, name="get_utilization_stats"),
+    path("stats/heatmap/", get_occupancy_heatmap, name="get_occupancy_heatmap"),
     path("activities/create-with-slots/", create_activity_with_slots, name="create_activity_with_slots"),
 ]
\ No newline at end of file
@@ -3,6 +3,7 @@ from rest_framework.response import Response
 from rest_framework import status
 from .models import Activity, ActivitySlot, Reservation
 from .serializer import ActivitySerializer, ActivitySlotSerializer, ReservationSerializer, ActivityWithSlotsSerializer, CreateReservationSerializer
+from .serializer import ArchivedReservationSerializer
 from accounts.permissions import (
     IsAuthenticatedWithValidToken,
     IsStudent,
@@ -10,8 +11,49 @@ from accounts.permissions import (
     IsTeacherOrAdmin,
     IsStudentOrTeacher
 )
+from .intervals import free_gaps_by_key
+from .search import search_activity_ids
+from .changefeed import CursorExpired, current_cursor, get_changes
+from .reservations import RESULT_INVALID_TRANSITION, RESULT_NOT_FOUND, bulk_change_status
+from .models import ArchivedReservation, CalendarFeed, ChangeLogEntry, DailyUtilization
+from .ical import cached_feed, feed_etag, feed_state, stream_async
+from .archive import history_page
+from .idempotency import idempotent
+from . import availability, catalog
+from .singleflight import cached
+from .rollups import day_range
+from .events import activity_channel, get_broadcast, publish_slot_occupancy
+from accounts.authentication import authenticate_jwt
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.pagination import PageNumberPagination
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIRequest
+from django.db import connections, transaction
+from django.db.models import Count, F, Q, Sum
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.http import parse_etags
+from django.views.decorators.http import require_safe
 from django.utils import timezone
-from django.utils.dateparse import parse_datetime
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import timedelta, timezone as dt_timezone
+import asyncio
+import json
+
+
+def parse_aware_datetime(value):
+    """
+    Parse datetime from URL/query param. Expected format: 2026-01-02T22:10:28+01:00
+    Naive values are interpreted in the current timezone. Returns None for invalid input.
+    """
+    try:
+        parsed = parse_datetime(value) if value else None
+    except ValueError:
+        return None
+    if parsed is not None and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, timezone.get_current_timezone())
+    return parsed
 
 
 # view pre vseobecne api veci ako aktivity, rezervacie atd(keby bol v tom chaos, tak sa vie popripadne spravit pre kazdu vec vlastna appka
@@ -43,58 +85,147 @@ def get_init(request):
 @api_view(["GET"])
 @permission_classes([IsAuthenticatedWithValidToken])
 def get_user_reservations(request):
-    user = request.user
-    now = timezone.now()
+    # ?fields= / ?exclude= (napr. exclude=user,activity_slot) - nevybrane polia sa nenacitaju ani nepocitaju
+    try:
+        fields = ReservationSerializer.requested_fields(request.GET)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    serializer = ReservationSerializer(
+        ReservationSerializer.sparse_queryset(upcoming_reservations(request.user, timezone.now()), fields),
+        many=True,
+        context={"request": request, "fields": fields}
+    )
 
+
+    return Response(serializer.data)
+
+
+def upcoming_reservations(user, now):
+    """Reservations that have not ended yet - the student's own, or all on the teacher's slots."""
     if user.role and user.role.name == "teacher":
         reservations = Reservation.objects.filter(
             activity_slot__teacher=user,
             activity_slot__end_date__gte=now  # iba tie rezervacie, ktore este neprebehli
-        ).select_related(
-            "user",
-            "activity_slot",
-            "activity_slot__activity"
         )
     else:
         reservations = Reservation.objects.filter(
             user=user,
             activity_slot__end_date__gte=now  # iba tie rezervacie, ktore este neprebehli
-        ).select_related(
-            "user",
-            "activity_slot",
-            "activity_slot__activity"
         )
 
-
-    serializer = ReservationSerializer(
-        reservations,
-        many=True,
-        context={"request": request}
+    # ucitel a rola studenta (ReservationSerializer) v tom istom dotaze, nie jeden dotaz na rezervaciu
+    return reservations.select_related(
+        "user",
+        "user__role",
+        "activity_slot",
+        "activity_slot__activity",
+        "activity_slot__teacher"
     )
 
 
-    return Response(serializer.data)
+def sees_all_activities(user):
+    return bool(user.role) and user.role.name in ["teacher", "admin"]
+
+
+def visible_activities(user):
+    """Students see activities of their role, teachers and admins all activities."""
+    if sees_all_activities(user):
+        return Activity.objects.all()
+    return Activity.objects.filter(role=user.role)
+
+
+# historia rezervacii z archivu (sloty, ktore skoncili pred retencnym oknom - api.archive)
+@api_view(["GET"])
+@permission_classes([IsAuthenticatedWithValidToken])
+def get_reservation_history(request):
+    """
+    Vráti archivované rezervácie od najnovších, stránkované kurzorom.
+    Študent vidí svoje rezervácie, učiteľ rezervácie na svojich slotoch.
+
+    Query parametre:
+    - cursor: hodnota next_cursor z predchádzajúcej stránky
+    - limit: počet položiek (default 50, max 200)
+    """
+    user = request.user
+    try:
+        limit = min(max(int(request.GET.get("limit", 50)), 1), 200)
+    except ValueError:
+        return Response({"error": "limit musí byť číslo."}, status=status.HTTP_400_BAD_REQUEST)
+
+    if user.role and user.role.name == "teacher":
+        reservations = ArchivedReservation.objects.filter(teacher=user)
+    else:
+        reservations = ArchivedReservation.objects.filter(user=user)
+    reservations = reservations.select_related("user__role", "teacher", "activity")
+
+    try:
+        items, next_cursor = history_page(reservations, request.GET.get("cursor"), limit)
+    except ValueError:
+        return Response({"error": "Neplatný kurzor."}, status=status.HTTP_400_BAD_REQUEST)
+
+    serializer = ArchivedReservationSerializer(items, many=True, context={"request": request})
+    return Response({"results": serializer.data, "next_cursor": next_cursor})
 
 
 # tento endpoint zmeni status rezervacie (len pre ucitelov, ktori su priradeni k danej aktivite)
 @api_view(["PATCH"])
 @permission_classes([IsTeacher])
 def change_reservation_status(request, reservation_id):
-    user = request.user
-    try:
-        reservation = Reservation.objects.get(id=reservation_id, activity_slot__teacher=user)
-    except Reservation.DoesNotExist:
+    new_status = request.data.get("status")
+    if new_status not in Reservation.Status.values:
+        return Response({"error": "Neplatný status."}, status=status.HTTP_400_BAD_REQUEST)
+
+    # rovnaka cesta ako hromadna zmena (zamok, povolene prechody, change log, obsadenost)
+    result = bulk_change_status(new_status, ids=[reservation_id], teacher=request.user)[reservation_id]
+    if result == RESULT_NOT_FOUND:
         return Response({"error": "Rezervácia neexistuje alebo nemáte právo ju upraviť."}, status=status.HTTP_404_NOT_FOUND)
+    if result == RESULT_INVALID_TRANSITION:
+        return Response(
+            {"error": "Zmena na tento status nie je povolená.", "code": RESULT_INVALID_TRANSITION},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
 
+    return Response({"detail": "Status rezervácie bol úspešne zmenený."}, status=status.HTTP_200_OK)
+
+
+# tento endpoint zmeni status viacerych rezervacii naraz (napr. ucitel schvali vsetky cakajuce rezervacie na hodinu)
+@api_view(["PATCH"])
+@permission_classes([IsTeacher])
+def bulk_change_reservation_status(request):
+    """
+    Hromadná zmena statusu rezervácií učiteľa.
+
+    Body: {"status": "approved", "ids": [1, 2, 3]} alebo {"status": "approved", "slot_id": 5}
+    Zmena prebehne jedným UPDATE len pre rezervácie slotov prihláseného učiteľa.
+    Vráti výsledok pre každú rezerváciu: updated / unchanged / not_found / invalid_transition.
+    """
     new_status = request.data.get("status")
     if new_status not in Reservation.Status.values:
         return Response({"error": "Neplatný status."}, status=status.HTTP_400_BAD_REQUEST)
 
-    reservation.status = new_status
-    reservation.save()
+    ids = request.data.get("ids")
+    slot_id = request.data.get("slot_id")
+    if (ids is None) == (slot_id is None):
+        return Response({"error": "Zadajte buď zoznam ids, alebo slot_id."}, status=status.HTTP_400_BAD_REQUEST)
 
+    if ids is not None:
+        if not isinstance(ids, list) or not ids or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+            return Response({"error": "ids musí byť neprázdny zoznam čísel."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > 1000:
+            return Response({"error": "Naraz je možné zmeniť najviac 1000 rezervácií."}, status=status.HTTP_400_BAD_REQUEST)
+        ids = list(dict.fromkeys(ids))
+    elif not isinstance(slot_id, int) or isinstance(slot_id, bool):
+        return Response({"error": "slot_id musí byť číslo."}, status=status.HTTP_400_BAD_REQUEST)
 
-    return Response({"detail": "Status rezervácie bol úspešne zmenený."}, status=status.HTTP_200_OK)
+    results = bulk_change_status(new_status, ids=ids, slot_id=slot_id, teacher=request.user)
+    updated = sum(1 for result in results.values() if result == "updated")
+
+    return Response({
+        "detail": f"Zmenený status {updated} rezervácií.",
+        "updated": updated,
+        "results": [{"id": reservation_id, "result": result} for reservation_id, result in results.items()],
+    }, status=status.HTTP_200_OK)
 
 
 #tento endpoint zmaze rezervaciu pre aktualne prihlaseneho usera
@@ -104,17 +235,20 @@ def delete_reservation(request, reservation_id):
     user = request.user
 
     try:
-        reservation = Reservation.objects.get(id=reservation_id, user=user)
+        reservation = Reservation.objects.select_related("activity_slot").get(id=reservation_id, user=user)
     except Reservation.DoesNotExist:
         return Response({"error": "Rezervácia neexistuje alebo nemáte oprávnenie ju zmazať."}, status=status.HTTP_404_NOT_FOUND)
 
     reservation.delete()
+    publish_slot_occupancy(reservation.activity_slot.activity_id, reservation.activity_slot_id)
     return Response({"detail": "Rezervácia bola úspešne zmazaná."}, status=status.HTTP_200_OK)
 
 
 # tento endpoint vytvori novu rezervaciu (studenti, ucitelia, admini)
 @api_view(["POST"])
 @permission_classes([IsAuthenticatedWithValidToken])
+@idempotent
+@transaction.atomic
 def create_reservation(request):
     """
     Vytvorí novú rezerváciu pre aktuálne prihláseného používateľa.
@@ -125,8 +259,12 @@ def create_reservation(request):
     2. Overí, že slot je v budúcnosti
     3. Overí role-based prístup (študenti len svoje aktivity)
     4. Overí, že kapacita nie je prekročená
-    5. Overí, že používateľ už nemá rezerváciu pre tento slot
+    5. Overí, že používateľ už nemá rezerváciu pre tento slot ani pre iný slot v rovnakom čase
     6. Vytvorí rezerváciu so statusom PENDING
+
+    Celý view beží v jednej transakcii a slot je zamknutý (select_for_update), takže
+    dve súbežné rezervácie nemôžu obísť kontrolu kapacity ani prekrývania.
+    Opakovanie s rovnakou hlavičkou Idempotency-Key vráti pôvodnú odpoveď (api.idempotency).
     """
     user = request.user
     serializer = CreateReservationSerializer(data=request.data)
@@ -134,16 +272,10 @@ def create_reservation(request):
     if not serializer.is_valid():
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
-    # Serializer už validoval a načítal activity_slot objekt
+    # Serializer už validoval a načítal activity_slot objekt - zamknutý do konca transakcie, s aktivitou, rolou a učiteľom
     activity_slot = serializer.validated_data.get('activity_slot')
     note = serializer.validated_data.get('note', '')
     
-    # Načítame activity s role pre validáciu (select_related pre optimalizáciu)
-    try:
-        activity_slot = ActivitySlot.objects.select_related('activity', 'activity__role').get(id=activity_slot.id)
-    except ActivitySlot.DoesNotExist:
-        return Response({"error": "Časový slot neexistuje."}, status=status.HTTP_404_NOT_FOUND)
-    
     activity = activity_slot.activity
     now = timezone.now()
     
@@ -173,16 +305,22 @@ def create_reservation(request):
             "error": f"Kapacita aktivity je naplnená ({reserved_count}/{activity.capacity})."
         }, status=status.HTTP_400_BAD_REQUEST)
     
-    # Validácia 4: Overenie, že používateľ už nemá rezerváciu pre tento slot
-    existing_user_reservation = Reservation.objects.filter(
+    # Validácia 4: Overenie, že používateľ nemá aktívnu rezerváciu, ktorá sa časovo prekrýva s týmto slotom
+    # (pokrýva aj rovnaký slot) - jeden indexovaný range dotaz namiesto samostatnej kontroly pre rovnaký slot
+    overlapping_slot_id = Reservation.objects.filter(
         user=user,
-        activity_slot=activity_slot
-    ).exclude(status=Reservation.Status.CANCELLED)
-    
-    if existing_user_reservation.exists():
+        activity_slot__start_date__lt=activity_slot.end_date,
+        activity_slot__end_date__gt=activity_slot.start_date
+    ).exclude(status=Reservation.Status.CANCELLED).values_list("activity_slot_id", flat=True).first()
+
+    if overlapping_slot_id == activity_slot.id:
         return Response({
             "error": "Už máte aktívnu rezerváciu pre tento časový slot."
         }, status=status.HTTP_400_BAD_REQUEST)
+    if overlapping_slot_id is not None:
+        return Response({
+            "error": "V tomto čase už máte rezerváciu na inú aktivitu."
+        }, status=status.HTTP_400_BAD_REQUEST)
     
     # Vytvorenie rezervácie
     reservation = Reservation.objects.create(
@@ -191,6 +329,7 @@ def create_reservation(request):
         note=note,
         status=Reservation.Status.PENDING
     )
+    publish_slot_occupancy(activity_slot.activity_id, activity_slot.id)
     
     # Serializácia výsledku pre odpoveď
     result_serializer = ReservationSerializer(reservation, context={"request": request})
@@ -201,24 +340,89 @@ def create_reservation(request):
     }, status=status.HTTP_201_CREATED)
 
 
+# povolene hodnoty ?ordering= pre get_activities (id je vzdy posledny kluc kvoli stabilnemu strankovaniu)
+ACTIVITY_ORDERING = {"name", "-name", "category", "-category", "room", "-room", "capacity", "-capacity", "id", "-id"}
+
+
+class ActivityPagination(PageNumberPagination):
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+
+
 # tento endpoint vrati vsetky aktivity (studenti vidi len aktivity pre svoju rolu, ucitelia/admini vidi vsetky)
 @api_view(["GET"])
 @permission_classes([IsAuthenticatedWithValidToken])
 def get_activities(request):
     """
-    Vráti všetky aktivity.
+    Vráti aktivity.
     Študenti vidia len aktivity pre svoju rolu, učitelia/admini vidia všetky aktivity.
+
+    Query parametre (všetky voliteľné):
+    - category, room: presná zhoda
+    - role: id role (učitelia/admini)
+    - created_by: id používateľa alebo "me"
+    - free_from, free_to: len aktivity, ktoré majú v rozsahu aspoň jeden slot s voľnou kapacitou
+    - ordering: name, category, room, capacity, id (s "-" zostupne), default name
+    - page, page_size: stránkovanie; bez nich sa vráti celý zoznam ako doteraz
+    - fields / exclude: čiarkou oddelené polia, ktoré vrátiť / vynechať (napr. fields=id,name)
     """
     user = request.user
+    params = request.GET
 
-    if user.role and user.role.name in ["teacher", "admin"]:
-        # ucitelia a admini vidi vsetky aktivity
-        activities = Activity.objects.all()
-    else:
-        # studenti vidi len aktivity pre svoju rolu
-        activities = Activity.objects.filter(role=user.role)
+    # ucitelia a admini vidia vsetky aktivity, studenti len aktivity pre svoju rolu
+    activities = visible_activities(user)
+    if params.get("role") and user.role and user.role.name in ["teacher", "admin"]:
+        if not params["role"].isdigit():
+            return Response({"error": "role musí byť id role."}, status=status.HTTP_400_BAD_REQUEST)
+        activities = activities.filter(role_id=params["role"])
+
+    if params.get("category"):
+        activities = activities.filter(category=params["category"])
+    if params.get("room"):
+        activities = activities.filter(room=params["room"])
+
+    created_by = params.get("created_by")
+    if created_by == "me":
+        activities = activities.filter(created_by=user)
+    elif created_by:
+        if not created_by.isdigit():
+            return Response({"error": "created_by musí byť id používateľa alebo 'me'."}, status=status.HTTP_400_BAD_REQUEST)
+        activities = activities.filter(created_by_id=created_by)
+
+    if params.get("free_from") or params.get("free_to"):
+        free_from = parse_aware_datetime(params.get("free_from"))
+        free_to = parse_aware_datetime(params.get("free_to"))
+        if free_from is None or free_to is None:
+            return Response({"error": "Neplatný formát dátumu a času (free_from, free_to)."}, status=status.HTTP_400_BAD_REQUEST)
+        # sloty v rozsahu sa vyberu cez index (end_date, start_date), nie skenom vsetkych aktivit
+        free_slots = ActivitySlot.objects.filter(
+            start_date__gte=free_from,
+            end_date__lte=free_to
+        ).annotate(
+            reserved_count=Count("reservation", filter=~Q(reservation__status=Reservation.Status.CANCELLED))
+        ).filter(reserved_count__lt=F("activity__capacity"))
+        activities = activities.filter(id__in=free_slots.values("activity_id"))
+
+    ordering = params.get("ordering", "name")
+    if ordering not in ACTIVITY_ORDERING:
+        return Response({"error": f"Neplatné ordering, povolené: {', '.join(sorted(ACTIVITY_ORDERING))}."}, status=status.HTTP_400_BAD_REQUEST)
+    activities = activities.order_by(ordering, "id")
 
-    serializer = ActivitySerializer(activities, many=True)
+    # ?fields= / ?exclude= - nacitaju sa a serializuju len vybrane polia
+    try:
+        fields = ActivitySerializer.requested_fields(params)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    activities = ActivitySerializer.sparse_queryset(activities, fields)
+    context = {"request": request, "fields": fields}
+
+    if "page" in params or "page_size" in params:
+        paginator = ActivityPagination()
+        page = paginator.paginate_queryset(activities, request)
+        return paginator.get_paginated_response(ActivitySerializer(page, many=True, context=context).data)
+
+    serializer = ActivitySerializer(activities, many=True, context=context)
     return Response(serializer.data)
 
 
@@ -241,26 +445,6 @@ def create_activity(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-# tento endpoint vrati vsetky aktivity (studenti vidi len aktivity pre svoju rolu, ucitelia/admini vidi vsetky)
-@api_view(["GET"])
-@permission_classes([IsAuthenticatedWithValidToken])
-def get_activities(request):
-    """
-    Vráti všetky aktivity.
-    Študenti vidia len aktivity pre svoju rolu, učitelia/admini vidia všetky aktivity.
-    """
-    user = request.user
-
-    if user.role and user.role.name in ["teacher", "admin"]:
-        # ucitelia a admini vidi vsetky aktivity
-        activities = Activity.objects.all()
-    else:
-        # studenti vidi len aktivity pre svoju rolu
-        activities = Activity.objects.filter(role=user.role)
-
-    serializer = ActivitySerializer(activities, many=True)
-    return Response(serializer.data)
-
 # endpoint pre získanie aktivity slotov pre rezervation page
 @api_view(["GET"])
 @permission_classes([IsAuthenticatedWithValidToken])
@@ -273,59 +457,68 @@ def get_activity_slots(request, activity_id, start_date, end_date):
     1. Overí existenciu aktivity.
     2. Vyfiltruje sloty prislúchajúce k danej aktivite a spadajúce do rozsahu start_date - end_date.
     3. Serializuje dáta vrátane počtu rezervácií a informácie o naplnení kapacity.
-    """
-    try:
-        # Skúsime nájsť aktivitu podľa ID
-        activity = Activity.objects.get(id=activity_id)
-    except Activity.DoesNotExist:
-        return Response({"error": "Aktivita nebola nájdená."}, status=status.HTTP_404_NOT_FOUND)
 
-    # Parse datetime values from incoming params. Expected format: 2026-01-02T22:10:28+01:00
-    start_dt = parse_datetime(start_date)
-    end_dt = parse_datetime(end_date)
+    Výsledok je zdieľaný medzi súbežnými rovnakými requestmi a môže byť zastaraný najviac
+    HOT_READ_FRESH_SECONDS + HOT_READ_STALE_SECONDS (api.singleflight); živé počty sú v /stream/.
+    """
+    start_dt = parse_aware_datetime(start_date)
+    end_dt = parse_aware_datetime(end_date)
     if start_dt is None or end_dt is None:
         return Response({"error": "Neplatný formát dátumu a času."}, status=status.HTTP_400_BAD_REQUEST)
 
-    # Ensure timezone-aware datetimes
-    if timezone.is_naive(start_dt):
-        start_dt = timezone.make_aware(start_dt, timezone.get_current_timezone())
-    if timezone.is_naive(end_dt):
-        end_dt = timezone.make_aware(end_dt, timezone.get_current_timezone())
-
-    # Filtrovanie slotov podľa aktivity a časového rozsahu s presnosťou na čas
-    slots = ActivitySlot.objects.filter(
-        activity=activity,
-        start_date__gte=start_dt,
-        end_date__lte=end_dt
-    ).select_related('activity')
+    # pri otvoreni rezervacii chodia stovky rovnakych requestov naraz -> jeden vypocet pre vsetky
+    # (rovnaka aktivita, rozsah v UTC a rola), kratko zastarany vysledok sa vrati pocas obnovy na pozadi
+    role = request.user.role_id if request.user.role_id else "none"
+    key = (
+        f"api:activity-slots:{activity_id}:{start_dt.astimezone(dt_timezone.utc).isoformat()}:"
+        f"{end_dt.astimezone(dt_timezone.utc).isoformat()}:{role}"
+    )
+    result = cached(key, lambda: activity_slots_payload(activity_id, start_dt, end_dt))
+    if result is None:
+        return Response({"error": "Aktivita nebola nájdená."}, status=status.HTTP_404_NOT_FOUND)
+    return Response(result)
 
-    # Serializácia základných údajov o aktivite (použijeme ActivitySerializer pre konzistentný formát)
-    activity_data = ActivitySerializer(activity).data
 
-    # Príprava výsledného zoznamu s vypočítanými poliami
-    result = []
-    for slot in slots:
-        # Spočítame všetky rezervácie pre tento slot, ktoré nie sú zrušené
-        reserved_count = slot.reservation_set.exclude(status=Reservation.Status.CANCELLED).count()
+def activity_slots_payload(activity_id, start_dt, end_dt):
+    """Slots of the activity in [start_dt, end_dt] with reservation counts, None if the activity does not exist."""
+    # údaje o aktivite v rovnakom formáte ako ActivitySerializer, zo snapshotu katalógu (bez dotazu do DB)
+    activity_data = catalog.activity(activity_id)
+    if activity_data is None:
+        return None
 
-        # Určíme, či je kapacita naplnená
-        is_full = reserved_count >= activity.capacity
+    # Sloty aktivity v časovom rozsahu s počtom nezrušených rezervácií - z indexu voľnej kapacity
+    # v pamäti (api.availability), mimo neho jedným dotazom do DB
+    slots = availability.slots_in_range(activity_id, start_dt, end_dt)
 
-        result.append({
-            "slotId": slot.id,
-            "start_date": slot.start_date.isoformat(),
-            "end_date": slot.end_date.isoformat(),
+    return [
+        {
+            "slotId": slot_id,
+            "start_date": slot_start.isoformat(),
+            "end_date": slot_end.isoformat(),
             "activity": activity_data,
-            "reservedCount": reserved_count,
-            "isFull": is_full
-        })
-
-    return Response(result)
+            "reservedCount": reserved,
+            "isFull": reserved >= activity_data["capacity"]
+        }
+        for slot_id, slot_start, slot_end, reserved in slots
+    ]
 
 # endpoint pre vytvorenie aktivity a prislusnymi aktivity slotmi naraz
 @api_view(["POST"])
 @permission_classes([IsTeacherOrAdmin])
+@idempotent
+@transaction.atomic
 def create_activity_with_slots(request):
+    """
+    Vytvorí aktivitu spolu s termínmi.
+
+    Kontrola kolízií aj vytvorenie bežia v jednej transakcii pod zámkom učiteľa (a aktivít
+    v tej istej miestnosti), takže dva súbežné requesty nevytvoria prekrývajúce sa termíny.
+    """
+    # zamok v poradi ucitel -> aktivity miestnosti, rovnako pre vsetky requesty
+    list(get_user_model().objects.select_for_update().filter(pk=request.user.pk).values_list("pk", flat=True))
+    room = request.data.get("room")
+    if isinstance(room, str) and room:
+        list(Activity.objects.select_for_update().filter(room=room).order_by("pk").values_list("pk", flat=True))
 
     serializer = ActivityWithSlotsSerializer(
         data=request.data,
@@ -340,3 +533,594 @@ def create_activity_with_slots(request):
         )
 
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+# interval keepalive komentara v SSE streame (proxy inak zatvori necinne spojenie)
+SSE_KEEPALIVE_SECONDS = 15
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _occupancy_snapshot(activity, start_dt, end_dt):
+    slots = ActivitySlot.objects.filter(
+        activity=activity,
+        start_date__gte=start_dt,
+        end_date__lte=end_dt
+    ).annotate(
+        reserved_count=Count("reservation", filter=~Q(reservation__status=Reservation.Status.CANCELLED))
+    ).order_by("start_date")
+
+    return [
+        {
+            "slotId": slot.id,
+            "start_date": slot.start_date.isoformat(),
+            "end_date": slot.end_date.isoformat(),
+            "reservedCount": slot.reserved_count,
+            "isFull": slot.reserved_count >= activity.capacity,
+        }
+        for slot in slots
+    ]
+
+
+# SSE endpoint - live obsadenost slotov aktivity v casovom rozsahu (namiesto opakovaneho pollovania activity-slots/)
+async def stream_activity_occupancy(request, activity_id, start_date, end_date):
+    """
+    Server-Sent Events stream obsadenosti slotov aktivity.
+
+    Najprv pošle event "snapshot" so všetkými slotmi v rozsahu, potom event "occupancy"
+    pri každej zmene rezervácie slotu v rozsahu (create/delete/change_status).
+    EventSource nevie poslať Authorization header, preto sa token dá poslať aj ako ?token=<jwt>.
+
+    Funguje len pod ASGI serverom (app.asgi). WSGI server by nekonečný stream najprv celý
+    načítal do pamäte a každé spojenie by navždy držalo thread workera - vráti 501 a klient
+    ostane pri pollovaní activity-slots/.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({
+            "error": "Live obsadenosť vyžaduje ASGI server, použite activity-slots/.",
+            "code": "stream_not_supported",
+        }, status=status.HTTP_501_NOT_IMPLEMENTED)
+
+    try:
+        user = await sync_to_async(authenticate_jwt)(request, allow_query_token=True)
+    except AuthenticationFailed as e:
+        return JsonResponse(e.detail, status=status.HTTP_401_UNAUTHORIZED)
+    if user is None or not user.is_authenticated:
+        return JsonResponse({"detail": "Authentication credentials were not provided.", "code": "no_token"}, status=status.HTTP_401_UNAUTHORIZED)
+
+    try:
+        activity = await Activity.objects.aget(id=activity_id)
+    except Activity.DoesNotExist:
+        return JsonResponse({"error": "Aktivita nebola nájdená."}, status=status.HTTP_404_NOT_FOUND)
+
+    start_dt = parse_aware_datetime(start_date)
+    end_dt = parse_aware_datetime(end_date)
+    if start_dt is None or end_dt is None:
+        return JsonResponse({"error": "Neplatný formát dátumu a času."}, status=status.HTTP_400_BAD_REQUEST)
+
+    async def event_stream():
+        # subscribe este pred snapshotom, aby sa nestratila zmena medzi snapshotom a subscribe
+        subscription = get_broadcast().subscribe(activity_channel(activity.id))
+        try:
+            yield "retry: 5000\n\n"
+            snapshot = await sync_to_async(_occupancy_snapshot)(activity, start_dt, end_dt)
+            yield _sse("snapshot", snapshot)
+            while True:
+                try:
+                    message = await subscription.get(timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if start_dt <= parse_datetime(message["start_date"]) and parse_datetime(message["end_date"]) <= end_dt:
+                    yield _sse("occupancy", message)
+        finally:
+            subscription.close()
+
+    response = StreamingHttpResponse(event_stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # nginx nesmie bufferovat stream
+    return response
+
+
+# bootstrap/ - predvolene a maximalne dni pre prehlad volnych miest
+BOOTSTRAP_DAYS = 7
+BOOTSTRAP_MAX_DAYS = 31
+
+
+def availability_summary(activities, start, end):
+    """Per activity: slots, free slots/places and the next slot with a free place in [start, end) - one query."""
+    slots = (
+        ActivitySlot.objects.filter(activity__in=activities, start_date__gte=start, start_date__lt=end)
+        .values("id", "activity_id", "start_date", "end_date", "activity__capacity")
+        .annotate(reserved=Count("reservation", filter=~Q(reservation__status=Reservation.Status.CANCELLED)))
+        .order_by("start_date", "id")
+    )
+    summary = {}
+    for slot in slots:
+        item = summary.setdefault(slot["activity_id"], {
+            "activityId": slot["activity_id"],
+            "slots": 0,
+            "freeSlots": 0,
+            "freePlaces": 0,
+            "nextFreeSlot": None,
+        })
+        free = max(slot["activity__capacity"] - slot["reserved"], 0)
+        item["slots"] += 1
+        if free:
+            item["freeSlots"] += 1
+            item["freePlaces"] += free
+            if item["nextFreeSlot"] is None:
+                item["nextFreeSlot"] = {
+                    "slotId": slot["id"],
+                    "start_date": slot["start_date"].isoformat(),
+                    "end_date": slot["end_date"].isoformat(),
+                    "freePlaces": free,
+                }
+    return list(summary.values())
+
+
+def _bootstrap_authenticate(request):
+    """JWT user, cursor for changes/ (read before any data) and whether a transaction is open."""
+    user = authenticate_jwt(request)
+    cursor = current_cursor() if user is not None and user.is_authenticated else None
+    return user, cursor, transaction.get_connection().in_atomic_block
+
+
+def _in_own_thread(func):
+    """sync_to_async in a separate thread (parts run concurrently); closes the thread's DB connections."""
+
+    def run():
+        try:
+            return func()
+        finally:
+            connections.close_all()
+
+    return sync_to_async(run, thread_sensitive=False)
+
+
+# jeden request pri starte aplikacie namiesto api/, activities/, reservations/ a activity-slots/ pre kazdu aktivitu
+@require_safe
+async def bootstrap(request):
+    """
+    Vráti naraz profil používateľa, aktivity viditeľné pre jeho rolu, nadchádzajúce rezervácie
+    (ako reservations/) a prehľad voľných miest pre každú aktivitu na najbližších N dní.
+
+    Query parametre:
+    - days: počet dní prehľadu voľných miest (default 7, max 31)
+
+    `cursor` je kurzor pre changes/ zachytený pred čítaním dát, takže žiadna zmena medzi
+    bootstrapom a prvým changes/?since=<cursor> sa nestratí.
+
+    Počet dotazov je pevný (používateľ + kurzor + aktivity + rezervácie + sloty, rola je zo snapshotu
+    katalógu); aktivity, rezervácie a prehľad voľných miest sa počítajú súbežne v samostatných
+    vláknach (každé s vlastným spojením). V otvorenej transakcii (ATOMIC_REQUESTS, testy) by ich
+    iné spojenia nevideli, vtedy idú po sebe v spojení requestu.
+    """
+    try:
+        days = int(request.GET.get("days", BOOTSTRAP_DAYS))
+    except ValueError:
+        return JsonResponse({"error": "days musí byť číslo."}, status=status.HTTP_400_BAD_REQUEST)
+    if not 1 <= days <= BOOTSTRAP_MAX_DAYS:
+        return JsonResponse({"error": f"days musí byť od 1 do {BOOTSTRAP_MAX_DAYS}."}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        user, cursor, in_transaction = await sync_to_async(_bootstrap_authenticate)(request)
+    except AuthenticationFailed as e:
+        return JsonResponse(e.detail, status=status.HTTP_401_UNAUTHORIZED)
+    if user is None or not user.is_authenticated:
+        return JsonResponse({"detail": "Authentication credentials were not provided.", "code": "no_token"}, status=status.HTTP_401_UNAUTHORIZED)
+    # ReservationSerializer cita pouzivatela z request.user
+    request.user = user
+
+    now = timezone.now()
+    end = now + timedelta(days=days)
+    activities = visible_activities(user).order_by("name", "id")
+    parts = (
+        lambda: ActivitySerializer(activities, many=True).data,
+        lambda: ReservationSerializer(upcoming_reservations(user, now), many=True, context={"request": request}).data,
+        lambda: availability_summary(activities, now, end),
+    )
+    if in_transaction:
+        results = [await sync_to_async(part)() for part in parts]
+    else:
+        results = await asyncio.gather(*(_in_own_thread(part)() for part in parts))
+    activity_data, reservation_data, availability = results
+
+    return JsonResponse({
+        "user": {
+            "id": user.id,
+            "email": user.email,
+            "first_name": user.first_name,
+            "last_name": user.last_name,
+            "role": user.role.name if user.role else None,
+            "must_change_password": user.must_change_password,
+        },
+        "cursor": cursor,
+        "activities": activity_data,
+        "reservations": reservation_data,
+        "availability": {
+            "from": now.isoformat(),
+            "to": end.isoformat(),
+            "activities": availability,
+        },
+    })
+
+
+# endpoint pre inkrementalnu synchronizaciu - vrati len zmeny od kurzora, ktore su viditelne pre rolu pouzivatela
+@api_view(["GET"])
+@permission_classes([IsAuthenticatedWithValidToken])
+def get_change_feed(request):
+    """
+    Vráti zmeny aktivít, slotov a rezervácií od kurzora `since`.
+
+    Query parametre:
+    - since: posledný kurzor, ktorý klient spracoval (default 0 = od najstaršieho zachovaného záznamu)
+    - limit: max počet zmien v odpovedi (default 500, max 1000)
+
+    Ak je `has_more` true, klient hneď pošle ďalší request s novým `cursor`.
+    Kurzor sa neposunie za zmeny mladšie ako CHANGE_FEED_LOOKBACK_SECONDS, tie prídu znova
+    a klient preskočí `seq`, ktoré už spracoval.
+    Ak je kurzor starší ako zachovaný log (kompakcia), vráti 410 a klient musí stiahnuť dáta znova.
+    """
+    try:
+        since = int(request.GET.get("since", 0))
+        limit = min(int(request.GET.get("limit", 500)), 1000)
+    except ValueError:
+        return Response({"error": "Parametre since a limit musia byť čísla."}, status=status.HTTP_400_BAD_REQUEST)
+    if since < 0 or limit < 1:
+        return Response({"error": "Parametre since a limit musia byť kladné."}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        entries, cursor, has_more = get_changes(request.user, since, limit)
+    except CursorExpired:
+        return Response({
+            "error": "Kurzor je príliš starý, je potrebná úplná synchronizácia.",
+            "code": "cursor_expired"
+        }, status=status.HTTP_410_GONE)
+
+    return Response({
+        "cursor": cursor,
+        "has_more": has_more,
+        "changes": [
+            {
+                "seq": entry.id,
+                "model": entry.model,
+                "id": entry.object_id,
+                "operation": entry.operation,
+                "data": None if entry.operation == ChangeLogEntry.Operation.DELETED else entry.data,
+                "created_at": entry.created_at,
+            }
+            for entry in entries
+        ],
+    })
+
+
+# endpoint pre hladanie volnych miestnosti v casovom rozsahu (pre ucitelov/adminov pri planovani)
+@api_view(["GET"])
+@permission_classes([IsTeacherOrAdmin])
+def get_free_rooms(request):
+    """
+    Vráti všetky miestnosti a ich voľné okná v rozsahu start - end.
+
+    Query parametre:
+    - start, end: ISO datetime (povinné, max 31 dní)
+    - min_duration: minimálna dĺžka voľného okna v minútach (default 1)
+
+    Obsadenosť sa počíta z ActivitySlot jedným range dotazom zoradeným podľa začiatku
+    a sweep-line prechodom cez všetky miestnosti naraz (žiadny dotaz pre každú miestnosť).
+    """
+    start_dt = parse_aware_datetime(request.GET.get("start"))
+    end_dt = parse_aware_datetime(request.GET.get("end"))
+    if start_dt is None or end_dt is None:
+        return Response({"error": "Neplatný formát dátumu a času."}, status=status.HTTP_400_BAD_REQUEST)
+    if start_dt >= end_dt or end_dt - start_dt > timedelta(days=31):
+        return Response({"error": "Rozsah musí byť kladný a najviac 31 dní."}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        min_duration = timedelta(minutes=max(int(request.GET.get("min_duration", 1)), 1))
+    except ValueError:
+        return Response({"error": "min_duration musí byť číslo (minúty)."}, status=status.HTTP_400_BAD_REQUEST)
+
+    rooms = list(Activity.objects.exclude(room="").values_list("room", flat=True).distinct().order_by("room"))
+    busy = ActivitySlot.objects.filter(
+        end_date__gt=start_dt,
+        start_date__lt=end_dt
+    ).exclude(activity__room="").order_by("start_date").values_list("activity__room", "start_date", "end_date")
+
+    gaps = free_gaps_by_key(busy.iterator(), rooms, start_dt, end_dt, min_duration)
+    local_tz = timezone.get_current_timezone()
+
+    return Response({
+        "start": start_dt.isoformat(),
+        "end": end_dt.isoformat(),
+        "min_duration": int(min_duration.total_seconds() // 60),
+        "rooms": [
+            {
+                "room": room,
+                "free": [
+                    {
+                        "start_date": gap_start.astimezone(local_tz).isoformat(),
+                        "end_date": gap_end.astimezone(local_tz).isoformat(),
+                        "minutes": int((gap_end - gap_start).total_seconds() // 60),
+                    }
+                    for gap_start, gap_end in room_gaps
+                ],
+            }
+            for room, room_gaps in sorted(gaps.items())
+        ],
+    })
+
+
+# najblizsie volne sloty napriec aktivitami (napr. "kedy najskor mozem ist do posilnovne")
+@api_view(["GET"])
+@permission_classes([IsAuthenticatedWithValidToken])
+def get_next_available_slots(request):
+    """
+    Vráti prvých `limit` slotov s voľnou kapacitou naprieč aktivitami, zoradené podľa začiatku.
+    Študenti hľadajú len v aktivitách svojej roly, učitelia/admini vo všetkých.
+
+    Query parametre (všetky voliteľné):
+    - after: ISO datetime, najskorší začiatok slotu (default teraz)
+    - before: ISO datetime, najneskorší začiatok (default after + 30 dní, max 366 dní)
+    - min_duration: minimálna dĺžka slotu v minútach
+    - category, room: presná zhoda aktivity
+    - role: id role (učitelia/admini)
+    - limit: počet slotov (default 10, max 100)
+
+    Sloty sa spájajú z indexu voľnej kapacity v pamäti (api.availability), bez neho jedným
+    dotazom v poradí indexu na začiatku slotu, ktorý skončí po `limit` riadkoch.
+    """
+    user = request.user
+    params = request.GET
+
+    after = parse_aware_datetime(params.get("after")) if params.get("after") else timezone.now()
+    if after is None:
+        return Response({"error": "Neplatný formát dátumu a času (after)."}, status=status.HTTP_400_BAD_REQUEST)
+    before = parse_aware_datetime(params.get("before")) if params.get("before") else after + timedelta(days=30)
+    if before is None:
+        return Response({"error": "Neplatný formát dátumu a času (before)."}, status=status.HTTP_400_BAD_REQUEST)
+    if after >= before or before - after > timedelta(days=366):
+        return Response({"error": "Rozsah musí byť kladný a najviac 366 dní."}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        limit = min(max(int(params.get("limit", 10)), 1), 100)
+        min_duration = timedelta(minutes=int(params["min_duration"])) if params.get("min_duration") else None
+    except ValueError:
+        return Response({"error": "limit a min_duration musia byť čísla."}, status=status.HTTP_400_BAD_REQUEST)
+
+    # ucitelia a admini hladaju vo vsetkych aktivitach (volitelne podla role), studenti len vo svojej roli
+    if user.role and user.role.name in ["teacher", "admin"]:
+        role_id = params.get("role") or None
+        if role_id is not None and not role_id.isdigit():
+            return Response({"error": "role musí byť id role."}, status=status.HTTP_400_BAD_REQUEST)
+        role_id = int(role_id) if role_id else None
+    elif user.role_id is None:
+        return Response([])
+    else:
+        role_id = user.role_id
+
+    category, room = params.get("category") or None, params.get("room") or None
+    activity_ids = None
+    if role_id is not None or category is not None or room is not None:
+        activity_ids = catalog.activity_ids(role=role_id, category=category, room=room)
+
+    slots = availability.next_free_slots(activity_ids, after, before, min_duration, limit)
+    activities = catalog.activities({activity_id for _, activity_id, *_ in slots})
+    return Response([
+        {
+            "slotId": slot_id,
+            "start_date": slot_start.isoformat(),
+            "end_date": slot_end.isoformat(),
+            "activity": activities.get(activity_id),
+            "reservedCount": reserved,
+            "freeCapacity": capacity - reserved,
+        }
+        for slot_id, activity_id, slot_start, slot_end, reserved, capacity in slots
+    ])
+
+
+# fulltextove vyhladavanie aktivit (nazov, popis, kategoria, miestnost)
+@api_view(["GET"])
+@permission_classes([IsAuthenticatedWithValidToken])
+def search_activities(request):
+    """
+    Vyhľadá aktivity podľa textu `q` (prefixové hľadanie, bez ohľadu na diakritiku), zoradené podľa relevancie.
+    Študenti dostanú len aktivity pre svoju rolu, učitelia/admini všetky.
+
+    Query parametre: q (povinné), limit (default 20, max 100), offset (default 0),
+    fields / exclude (ako activities/)
+    """
+    query = request.GET.get("q", "").strip()
+    if not query:
+        return Response({"error": "Zadajte hľadaný text (q)."}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        limit = min(max(int(request.GET.get("limit", 20)), 1), 100)
+        offset = max(int(request.GET.get("offset", 0)), 0)
+    except ValueError:
+        return Response({"error": "Parametre limit a offset musia byť čísla."}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        fields = ActivitySerializer.requested_fields(request.GET)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    # rovnake pravidlo ako visible_activities - bez role nevidi pouzivatel nic (role_id=None su vsetky)
+    user = request.user
+    if sees_all_activities(user):
+        ids = search_activity_ids(query, limit=limit, offset=offset)
+    elif user.role_id is None:
+        ids = []
+    else:
+        ids = search_activity_ids(query, role_id=user.role_id, limit=limit, offset=offset)
+    # nájdené aktivity zo snapshotu katalógu (api.catalog), nie ďalším dotazom do DB
+    activities = catalog.activities(ids)
+    return Response([
+        activities[activity_id] if fields is None else {name: activities[activity_id][name] for name in fields}
+        for activity_id in ids if activity_id in activities
+    ])
+
+
+# group_by -> polia DailyUtilization, podla ktorych sa suhrny zoskupia
+UTILIZATION_GROUPS = {
+    "day": ("date",),
+    "activity": ("activity_id", "activity__name"),
+    "room": ("room",),
+    "teacher": ("teacher_id", "teacher__username"),
+}
+
+
+# statistiky obsadenosti (cita len denne suhrny DailyUtilization, nie surove rezervacie)
+@api_view(["GET"])
+@permission_classes([IsTeacherOrAdmin])
+def get_utilization_stats(request):
+    """
+    Vráti súhrn obsadenosti za obdobie.
+
+    Query parametre:
+    - start, end: dátum YYYY-MM-DD (povinné, vrátane, max 366 dní)
+    - group_by: day, activity, room alebo teacher (default activity)
+    - activity, room, teacher: voliteľné filtre (id aktivity, miestnosť, id učiteľa)
+
+    utilization = nezrušené rezervácie / kapacita slotov.
+    """
+    start = parse_date(request.GET.get("start") or "")
+    end = parse_date(request.GET.get("end") or "")
+    if start is None or end is None:
+        return Response({"error": "Neplatný formát dátumu (YYYY-MM-DD)."}, status=status.HTTP_400_BAD_REQUEST)
+    if start > end or (end - start).days > 366:
+        return Response({"error": "Rozsah musí byť kladný a najviac 366 dní."}, status=status.HTTP_400_BAD_REQUEST)
+
+    group_by = request.GET.get("group_by", "activity")
+    if group_by not in UTILIZATION_GROUPS:
+        return Response({"error": f"Neplatné group_by, povolené: {', '.join(UTILIZATION_GROUPS)}."}, status=status.HTTP_400_BAD_REQUEST)
+
+    rollups = DailyUtilization.objects.filter(date__gte=start, date__lte=end)
+    for param, field in (("activity", "activity_id"), ("teacher", "teacher_id")):
+        value = request.GET.get(param)
+        if value:
+            if not value.isdigit():
+                return Response({"error": f"{param} musí byť id."}, status=status.HTTP_400_BAD_REQUEST)
+            rollups = rollups.filter(**{field: value})
+    if request.GET.get("room"):
+        rollups = rollups.filter(room=request.GET["room"])
+
+    fields = UTILIZATION_GROUPS[group_by]
+    rows = rollups.values(*fields).annotate(
+        slots=Sum("slots"),
+        capacity=Sum("capacity"),
+        reservations=Sum("reservations"),
+        active=Sum("active"),
+        approved=Sum("approved"),
+        cancelled=Sum("cancelled"),
+    ).order_by(fields[-1] if group_by != "day" else "date")
+
+    results = []
+    for row in rows:
+        row["utilization"] = round(row["active"] / row["capacity"], 3) if row["capacity"] else None
+        results.append(row)
+
+    return Response({
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "group_by": group_by,
+        "results": results,
+    })
+
+
+# heatmapa obsadenosti den v tyzdni x 15 minut (pre aktivitu, miestnost alebo kategoriu)
+@api_view(["GET"])
+@permission_classes([IsTeacherOrAdmin])
+def get_occupancy_heatmap(request):
+    """
+    Vráti heatmapu obsadenosti 7 x 96 (pondelok-nedeľa x 15-minútové úseky v lokálnom čase).
+
+    Query parametre:
+    - start, end: dátum YYYY-MM-DD (povinné, vrátane, max 366 dní)
+    - práve jeden z: activity (id), room, category
+
+    occupancy[d][b] = rezervované / ponúknuté miesta v úseku (null = žiadny slot),
+    reserved[d][b] = priemerný počet obsadených miest v úseku za jeden takýto deň.
+    """
+    start_day = parse_date(request.GET.get("start") or "")
+    end_day = parse_date(request.GET.get("end") or "")
+    if start_day is None or end_day is None:
+        return Response({"error": "Neplatný formát dátumu (YYYY-MM-DD)."}, status=status.HTTP_400_BAD_REQUEST)
+    if start_day > end_day or (end_day - start_day).days > 366:
+        return Response({"error": "Rozsah musí byť kladný a najviac 366 dní."}, status=status.HTTP_400_BAD_REQUEST)
+
+    targets = [target for target in ("activity", "room", "category") if request.GET.get(target)]
+    if len(targets) != 1:
+        return Response({"error": "Zadajte práve jeden z parametrov activity, room, category."}, status=status.HTTP_400_BAD_REQUEST)
+    target = targets[0]
+    value = request.GET[target]
+    if target == "activity" and not value.isdigit():
+        return Response({"error": "activity musí byť id."}, status=status.HTTP_400_BAD_REQUEST)
+    slot_filter = {
+        "activity": Q(activity_id=value),
+        "room": Q(activity__room=value),
+        "category": Q(activity__category=value),
+    }[target]
+
+    # NumPy sa importuje az pri prvej heatmape, nie pri starte workera (python manage.py profile_startup)
+    from .heatmap import cached_heatmap
+
+    start, _ = day_range(start_day)
+    _, end = day_range(end_day)
+    heatmap = cached_heatmap(target, value, slot_filter, start, end, timezone.get_current_timezone())
+
+    return Response({
+        "start": start_day.isoformat(),
+        "end": end_day.isoformat(),
+        target: value,
+        "bucket_minutes": 15,
+        **heatmap,
+    })
+
+
+# odber kalendara (.ics) - vrati URL feedu prihlaseneho pouzivatela, POST vygeneruje novy token
+@api_view(["GET", "POST"])
+@permission_classes([IsAuthenticatedWithValidToken])
+def calendar_feed_url(request):
+    """
+    GET vráti URL .ics feedu (vytvorí ho pri prvom volaní), POST zneplatní starú URL a vráti novú.
+    URL obsahuje tajný token, kalendárové aplikácie ju môžu odoberať bez prihlásenia.
+    """
+    feed, _ = CalendarFeed.objects.get_or_create(user=request.user)
+    if request.method == "POST":
+        feed.token = CalendarFeed._meta.get_field("token").get_default()
+        feed.version += 1
+        feed.save(update_fields=["token", "version"])
+
+    return Response({"url": request.build_absolute_uri(reverse("calendar_ics", args=[feed.token]))})
+
+
+# samotny .ics feed (bez JWT, autentifikacia tokenom v URL)
+@require_safe
+def calendar_ics(request, token):
+    """
+    iCalendar feed rezervácií používateľa (a slotov, ak je učiteľ).
+    Klient posiela If-None-Match; kým sa jeho dáta nezmenili, dostane 304 po dvoch dotazoch.
+    """
+    feed = CalendarFeed.objects.select_related("user__role").filter(token=token).first()
+    if feed is None or not feed.user.is_active:
+        return HttpResponse("Feed neexistuje.", status=404, content_type="text/plain; charset=utf-8")
+
+    state = feed_state(feed)
+    etag = feed_etag(feed, state)
+    client_etags = parse_etags(request.headers.get("If-None-Match", ""))
+    if etag in client_etags or "*" in client_etags:
+        response = HttpResponseNotModified()
+        response["ETag"] = etag
+        return response
+
+    chunks = cached_feed(feed, feed.user, state)
+    if isinstance(request, ASGIRequest):
+        # synchronny iterator by ASGI handler najprv cely nacital do pamate
+        chunks = stream_async(chunks)
+    response = StreamingHttpResponse(chunks, content_type="text/calendar; charset=utf-8")
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, max-age=300"
+    response["Content-Disposition"] = 'inline; filename="rezervacie.ics"'
+    return response
@@ -9,8 +9,15 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
 application = get_asgi_application()
+
+# volitelne zahriatie workera pred prvym requestom (app.warmup)
+if settings.WARMUP_ON_BOOT:
+    from app.warmup import warmup
+
+    warmup()
@@ -0,0 +1,173 @@
+"""
+Smerovanie čítania na read repliky (DATABASE_REPLICA_URLS).
+
+- ReplicaRouter: zápisy vždy na "default", čítanie na náhodnú zdravú repliku. Na primárnu DB
+  ide čítanie, ak request zapisuje (POST/PATCH/...), ak používateľ nedávno zapisoval
+  (REPLICA_STICKY_SECONDS, read-your-writes) alebo ak beží transakcia na primárnej DB.
+- ReplicaRoutingMiddleware: nastaví to pre každý request (aj pre telo streamovanej odpovede).
+  Používateľa zistí z JWT bez dotazu do DB (podpis + user_id claim). Čas jeho posledného
+  úspešného zápisu je v primárnej DB (api.UserLastWrite, jeden upsert po zápise, jeden dotaz
+  podľa primárneho kľúča pri čítaní prihláseného používateľa) - platí naprieč procesmi
+  aj strojmi a nezávisí od cookies klienta.
+- Oneskorenie repliky sa meria cez change log (api.ChangeLogEntry): ak na replike chýba záznam,
+  ktorý je na primárnej DB dlhšie ako REPLICA_MAX_LAG_SECONDS, replika sa vynechá. Funguje pre
+  PostgreSQL aj lokálne dve SQLite databázy; výsledok sa cachuje na REPLICA_LAG_CHECK_SECONDS.
+"""
+
+import random
+import time
+from contextvars import ContextVar
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.db.models import Max
+from django.utils import timezone
+from rest_framework.permissions import SAFE_METHODS
+
+PRIMARY = "default"
+
+_use_primary = ContextVar("db_use_primary", default=False)
+# alias -> (cas kontroly, zdrava)
+_replica_health = {}
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias.startswith("replica_")]
+
+
+def stick_to_primary(user_id):
+    """Send the user's reads to the primary for REPLICA_STICKY_SECONDS (one upsert on the primary)."""
+    from api.models import UserLastWrite
+
+    UserLastWrite.objects.using(PRIMARY).bulk_create(
+        [UserLastWrite(user_id=user_id, written_at=timezone.now())],
+        update_conflicts=True, unique_fields=["user_id"], update_fields=["written_at"],
+    )
+
+
+def is_sticky(user_id):
+    from api.models import UserLastWrite
+
+    since = timezone.now() - timedelta(seconds=settings.REPLICA_STICKY_SECONDS)
+    return UserLastWrite.objects.using(PRIMARY).filter(user_id=user_id, written_at__gte=since).exists()
+
+
+def replica_lag(alias):
+    """Seconds the replica is behind the primary (0 = up to date), None if the replica is unreachable."""
+    from api.models import ChangeLogEntry
+
+    try:
+        replica_last = ChangeLogEntry.objects.using(alias).aggregate(last=Max("id"))["last"] or 0
+        first_missing = (
+            ChangeLogEntry.objects.using(PRIMARY)
+            .filter(id__gt=replica_last)
+            .order_by("id")
+            .values_list("created_at", flat=True)
+            .first()
+        )
+    except DatabaseError:
+        return None
+    if first_missing is None:
+        return 0.0
+    return max((timezone.now() - first_missing).total_seconds(), 0.0)
+
+
+def replica_is_healthy(alias):
+    checked = _replica_health.get(alias)
+    if checked and time.monotonic() - checked[0] < settings.REPLICA_LAG_CHECK_SECONDS:
+        return checked[1]
+    lag = replica_lag(alias)
+    healthy = lag is not None and lag <= settings.REPLICA_MAX_LAG_SECONDS
+    _replica_health[alias] = (time.monotonic(), healthy)
+    return healthy
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = replica_aliases()
+        if not replicas or _use_primary.get() or connections[PRIMARY].in_atomic_block:
+            return PRIMARY
+        healthy = [alias for alias in replicas if replica_is_healthy(alias)]
+        return random.choice(healthy) if healthy else PRIMARY
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # repliky su kopie primarnej DB
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
+
+
+def token_user_id(request):
+    """User id from the Bearer access token (signature and expiry checked, no database query)."""
+    from rest_framework_simplejwt.exceptions import TokenError
+    from rest_framework_simplejwt.settings import api_settings
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    header = request.headers.get("Authorization", "")
+    if not header.startswith("Bearer "):
+        return None
+    try:
+        return AccessToken(header[len("Bearer "):]).get(api_settings.USER_ID_CLAIM)
+    except TokenError:
+        return None
+
+
+def _routed(content, use_primary):
+    """Iterate streaming content with the routing of its request (the body runs after the middleware)."""
+    iterator = iter(content)
+    while True:
+        token = _use_primary.set(use_primary)
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            _use_primary.reset(token)
+        yield chunk
+
+
+async def _arouted(content, use_primary):
+    iterator = aiter(content)
+    while True:
+        token = _use_primary.set(use_primary)
+        try:
+            chunk = await anext(iterator)
+        except StopAsyncIteration:
+            return
+        finally:
+            _use_primary.reset(token)
+        yield chunk
+
+
+class ReplicaRoutingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not replica_aliases():
+            return self.get_response(request)
+
+        user_id = token_user_id(request)
+        writes = request.method not in SAFE_METHODS
+        use_primary = writes or (user_id is not None and is_sticky(user_id))
+        token = _use_primary.set(use_primary)
+        try:
+            response = self.get_response(request)
+        finally:
+            _use_primary.reset(token)
+
+        if response.streaming:
+            wrap = _arouted if response.is_async else _routed
+            response.streaming_content = wrap(response.streaming_content, use_primary)
+        if writes and response.status_code < 400:
+            # DRF nastavi request.user aj na povodnom HttpRequest (napr. login bez tokenu v hlavicke)
+            user = getattr(request, "user", None)
+            user_id = user_id or (user.pk if user is not None and user.is_authenticated else None)
+            if user_id is not None:
+                stick_to_primary(user_id)
+        return response
@@ -0,0 +1,183 @@
+"""
+Rozpočet SQL dotazov a časov pre každý endpoint.
+
+QueryBudgetMiddleware pri každom requeste zistí view (resolver_match) a zmeria:
+- počet dotazov a čas v DB (connection.execute_wrapper na spojeniach vlákna requestu),
+- čas serializácie odpovede (render DRF Response / TemplateResponse do JSON/HTML),
+- celkový čas requestu vrátane ostatných middleware.
+
+Súčty a maximá po view sú v ``stats`` (v rámci procesu). Request, ktorý prekročí rozpočet svojho
+view (QUERY_BUDGETS, inak QUERY_BUDGET_DEFAULT), sa zapíše ako warning do logu app.query_budget.
+S QUERY_BUDGET_HEADERS=1 (default v DEBUG) má odpoveď hlavičky Server-Timing a X-Query-Count.
+
+Meno view je modul + funkcia (napr. "api.views.get_activities"), pri ViewSet aj akcia. Dotazy
+z iných vlákien a z tela streamovanej odpovede sa nerátajú.
+
+Pre testy a CI: ``with query_budget(): client.get(...)`` zlyhá (AssertionError), ak niektorý request
+v bloku prekročí rozpočet dotazov; test app.tests.QueryBudgetTests (aj príkaz check_query_budgets)
+zavolá každú URL z api.urls a accounts.urls.
+"""
+
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# view -> Counter(requests, queries, max_queries, db_ms, render_ms, total_ms, max_total_ms, over_budget)
+stats = defaultdict(Counter)
+
+_lock = threading.Lock()
+_current = ContextVar("query_budget_measurement", default=None)
+# aktivne bloky query_budget() - kazdy dostane zoznam zmeranych requestov
+_observers = []
+
+
+def view_name(func):
+    """Stable name of a URL callback: module.function, for ViewSets module.Class.action."""
+    view = getattr(func, "view_class", None) or func
+    # DRF @api_view: WrappedAPIView nesie __module__ a __name__ povodnej funkcie
+    name = f"{view.__module__}.{view.__name__}"
+    actions = getattr(func, "actions", None)
+    if actions:
+        name = f"{name}.{'/'.join(sorted(set(actions.values())))}"
+    return name
+
+
+def get_budget(view):
+    """{"queries": int, "ms": float} for the view (missing keys from QUERY_BUDGET_DEFAULT)."""
+    return {**settings.QUERY_BUDGET_DEFAULT, **settings.QUERY_BUDGETS.get(view, {})}
+
+
+class Measurement:
+    def __init__(self):
+        self.view = None
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.render_seconds = 0.0
+        self.total_seconds = 0.0
+        self._render_started = None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_seconds += time.perf_counter() - started
+
+    def render_started(self):
+        self._render_started = time.perf_counter()
+
+    def render_finished(self, response):
+        if self._render_started is not None:
+            self.render_seconds += time.perf_counter() - self._render_started
+
+    def over_budget(self, budget, timing=True):
+        """Human readable list of exceeded limits (empty when within budget)."""
+        over = []
+        if budget.get("queries") is not None and self.queries > budget["queries"]:
+            over.append(f"{self.queries} dotazov (rozpočet {budget['queries']})")
+        if timing and budget.get("ms") is not None and self.total_seconds * 1000 > budget["ms"]:
+            over.append(f"{self.total_seconds * 1000:.1f} ms (rozpočet {budget['ms']:.0f} ms)")
+        return over
+
+    def server_timing(self):
+        return (
+            f"db;dur={self.db_seconds * 1000:.1f}, render;dur={self.render_seconds * 1000:.1f}, "
+            f"total;dur={self.total_seconds * 1000:.1f}"
+        )
+
+
+def record(measurement, request):
+    view = measurement.view
+    budget = get_budget(view)
+    over = measurement.over_budget(budget)
+    with _lock:
+        entry = stats[view]
+        entry["requests"] += 1
+        entry["queries"] += measurement.queries
+        entry["max_queries"] = max(entry["max_queries"], measurement.queries)
+        entry["db_ms"] += measurement.db_seconds * 1000
+        entry["render_ms"] += measurement.render_seconds * 1000
+        entry["total_ms"] += measurement.total_seconds * 1000
+        entry["max_total_ms"] = max(entry["max_total_ms"], measurement.total_seconds * 1000)
+        entry["over_budget"] += bool(over)
+        for observer in _observers:
+            observer.append(measurement)
+    if over:
+        logger.warning(
+            "%s %s (%s) over budget: %s; db %.1f ms, render %.1f ms",
+            request.method, request.path, view, ", ".join(over),
+            measurement.db_seconds * 1000, measurement.render_seconds * 1000,
+        )
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.QUERY_BUDGET_ENABLED:
+            return self.get_response(request)
+
+        measurement = Measurement()
+        token = _current.set(measurement)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(measurement))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        measurement.total_seconds = time.perf_counter() - started
+
+        match = getattr(request, "resolver_match", None)
+        if match is None:
+            return response
+        measurement.view = view_name(match.func)
+        record(measurement, request)
+        if settings.QUERY_BUDGET_HEADERS:
+            response["Server-Timing"] = measurement.server_timing()
+            response["X-Query-Count"] = str(measurement.queries)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF Response sa renderuje az po view - cas od tohto bodu po post-render callback je serializacia
+        measurement = _current.get()
+        if measurement is not None:
+            measurement.render_started()
+            response.add_post_render_callback(measurement.render_finished)
+        return response
+
+
+@contextmanager
+def query_budget(timing=False):
+    """
+    Fail with AssertionError when a request made inside the block exceeds the query budget of its
+    view (and the time budget with ``timing=True``). Yields the list of measurements.
+    """
+    measurements = []
+    with _lock:
+        _observers.append(measurements)
+    try:
+        yield measurements
+    finally:
+        with _lock:
+            _observers.remove(measurements)
+
+    failures = [
+        f"{measurement.view}: {', '.join(over)}"
+        for measurement in measurements
+        for over in [measurement.over_budget(get_budget(measurement.view), timing=timing)]
+        if over
+    ]
+    if failures:
+        raise AssertionError("Prekročený rozpočet:\n" + "\n".join(failures))
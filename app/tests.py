@@ -0,0 +1,323 @@
+import json
+import os
+import re
+import tempfile
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth.tokens import default_token_generator
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+from djoser.utils import encode_uid
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts import urls as accounts_urls
+from accounts.models import Role, User
+from api import catalog
+from api import urls as api_urls
+from api.models import Activity, ActivitySlot, CalendarFeed, Reservation, UserLastWrite
+
+from . import db_router
+from .query_budget import get_budget, query_budget, view_name
+from .warmup import warmup
+
+
+class ReplicaStickinessTests(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.routed = []
+
+        def view(request):
+            self.routed.append(db_router._use_primary.get())
+            if request.path.endswith("/stream/"):
+                return StreamingHttpResponse(db_router._use_primary.get() for _ in range(2))
+            return HttpResponse(status=201 if request.method == "POST" else 200)
+
+        self.middleware = db_router.ReplicaRoutingMiddleware(view)
+        patcher = patch.object(db_router, "replica_aliases", return_value=["replica_1"])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def request(self, method, user_id, path="/api/reservations/"):
+        request = getattr(self.factory, method)(path)
+        with patch.object(db_router, "token_user_id", return_value=user_id):
+            return self.middleware(request)
+
+    def test_write_makes_reads_of_the_same_user_go_to_primary(self):
+        self.request("post", 7)
+
+        # bez cookies - stav je na serveri
+        self.request("get", 7)
+        self.request("get", 8)
+        self.request("get", None)
+
+        self.assertEqual(self.routed, [True, True, False, False])
+        self.assertTrue(UserLastWrite.objects.filter(user_id=7).exists())
+
+    def test_stickiness_expires(self):
+        self.request("post", 7)
+        UserLastWrite.objects.filter(user_id=7).update(written_at=timezone.now() - timedelta(seconds=11))
+
+        with self.settings(REPLICA_STICKY_SECONDS=10):
+            self.request("get", 7)
+
+        self.assertEqual(self.routed, [True, False])
+
+    def test_streaming_body_keeps_the_routing_of_its_request(self):
+        self.request("post", 7)
+        response = self.request("get", 7, "/api/reservations/stream/")
+
+        self.assertEqual(list(response.streaming_content), [b"True", b"True"])
+        self.assertFalse(db_router._use_primary.get())
+
+
+# modul s URL -> prefix v app.urls
+URLCONFS = [(api_urls, "/api"), (accounts_urls, "/api/accounts")]
+
+# endpointy, ktore sa nedaju zavolat jednym requestom
+SKIP = {
+    "api:stream_activity_occupancy": "SSE stream bez konca",
+    "accounts:microsoft_users": "volá Microsoft Graph API",
+    "accounts:microsoft_user_by_id": "volá Microsoft Graph API",
+}
+
+
+class Fixtures:
+    """Data pre requesty: ucitel, student, aktivita so slotmi a rezervacie."""
+
+    def __init__(self):
+        roles = {role.name: role for role in Role.objects.all()}
+        self.teacher = self.user("teacher", roles["teacher"])
+        self.student = self.user("student", roles["student"])
+        self.role = roles["student"]
+
+        start = timezone.localtime().replace(hour=10, minute=0, second=0, microsecond=0) + timedelta(days=2)
+        self.start, self.end = start, start + timedelta(days=7)
+        self.activity = Activity.objects.create(
+            name="Budget PS5", description="", capacity=10, available_hours="7:30-16:00", category="budget",
+            room="B1", role=self.role, created_by=self.teacher,
+        )
+        self.slots = ActivitySlot.objects.bulk_create([
+            ActivitySlot(activity=self.activity, teacher=self.teacher, start_date=start + timedelta(days=day),
+                         end_date=start + timedelta(days=day, minutes=45))
+            for day in range(5)
+        ])
+        self.approve, self.delete = Reservation.objects.bulk_create([
+            Reservation(user=self.student, activity_slot=self.slots[0], status=Reservation.Status.PENDING),
+            Reservation(user=self.student, activity_slot=self.slots[1], status=Reservation.Status.PENDING),
+        ])
+        self.feed = CalendarFeed.objects.create(user=self.student)
+
+    def user(self, name, role):
+        return User.objects.create_user(
+            username=f"budget-{name}", email=f"budget-{name}@budget.local", password="budget", role=role,
+        )
+
+    def day(self, offset=0):
+        return (self.start + timedelta(days=offset)).date().isoformat()
+
+
+# "prefix:meno URL" -> funkcia(fixtures) vracajuca request: method, user, args, params, data
+SPECS = {
+    "api:get_init": lambda f: {"user": f.student},
+    "api:bootstrap": lambda f: {"user": f.student},
+    "api:get_activity_slots": lambda f: {
+        "user": f.student, "args": [f.activity.id, f.start.isoformat(), f.end.isoformat()],
+    },
+    "api:get_user_reservations": lambda f: {"user": f.student},
+    "api:get_reservation_history": lambda f: {"user": f.student},
+    "api:create_reservation": lambda f: {
+        "method": "post", "user": f.student, "data": {"activity_slot": f.slots[2].id},
+    },
+    "api:change_reservation_status": lambda f: {
+        "method": "patch", "user": f.teacher, "args": [f.approve.id], "data": {"status": "approved"},
+    },
+    "api:bulk_change_reservation_status": lambda f: {
+        "method": "patch", "user": f.teacher, "data": {"status": "approved", "slot_id": f.slots[0].id},
+    },
+    "api:delete_reservation": lambda f: {"method": "delete", "user": f.student, "args": [f.delete.id]},
+    "api:get_activities": lambda f: {"user": f.student},
+    "api:search_activities": lambda f: {"user": f.student, "params": {"q": "budget"}},
+    "api:create_activity": lambda f: {
+        "method": "post", "user": f.teacher, "data": {
+            "name": "Budget gym", "description": "Budget", "capacity": 5, "available_hours": "7:30-16:00",
+            "room": "B2", "role": f.role.id,
+        },
+    },
+    "api:get_free_rooms": lambda f: {
+        "user": f.teacher, "params": {"start": f.start.isoformat(), "end": f.end.isoformat()},
+    },
+    "api:get_next_available_slots": lambda f: {"user": f.student},
+    "api:get_change_feed": lambda f: {"user": f.student},
+    "api:calendar_feed_url": lambda f: {"user": f.student},
+    "api:calendar_ics": lambda f: {"args": [f.feed.token]},
+    "api:get_utilization_stats": lambda f: {
+        "user": f.teacher, "params": {"start": f.day(), "end": f.day(7)},
+    },
+    "api:get_occupancy_heatmap": lambda f: {
+        "user": f.teacher, "params": {"start": f.day(), "end": f.day(7), "activity": f.activity.id},
+    },
+    "api:create_activity_with_slots": lambda f: {
+        "method": "post", "user": f.teacher, "data": {
+            "name": "Budget lab", "description": "Budget", "capacity": 5, "available_hours": "7:30-16:00",
+            "room": "B3", "role": f.role.id, "activity_slots": [
+                {"start_date": (f.start + timedelta(days=day, hours=2)).isoformat(),
+                 "end_date": (f.start + timedelta(days=day, hours=3)).isoformat()}
+                for day in range(3)
+            ],
+        },
+    },
+    "accounts:get_init": lambda f: {"user": f.student},
+    "accounts:login": lambda f: {
+        "method": "post", "data": {"email": f.student.email, "password": "budget"},
+    },
+    "accounts:refresh_token": lambda f: {
+        "method": "post", "data": {"refresh_token": str(RefreshToken.for_user(f.student))},
+    },
+    # zmena hesla zneplatni tokeny pouzivatela -> vlastny pouzivatel
+    "accounts:change_password": lambda f: {
+        "method": "post", "user": f.user("password", f.role),
+        "data": {"old_password": "budget", "new_password": "Budget-new-password-1"},
+    },
+    "accounts:reset_password": lambda f: {"method": "post", "data": {"email": f.student.email}},
+    "accounts:reset_password_confirm": lambda f: (lambda user: {
+        "method": "post", "data": {
+            "uid": encode_uid(user.pk), "token": default_token_generator.make_token(user),
+            "new_password": "Budget-new-password-1",
+        },
+    })(f.user("reset", f.role)),
+    "accounts:microsoft_login": lambda f: {},
+    "accounts:auth_success": lambda f: {},
+}
+
+
+def endpoints():
+    """(key, url module, prefix, pattern) for every named URL in api.urls and accounts.urls."""
+    for module, prefix in URLCONFS:
+        namespace = module.__name__.split(".")[0]
+        for pattern in module.urlpatterns:
+            yield f"{namespace}:{pattern.name}", module, prefix, pattern
+
+
+# savepointy su v teste navyse (TestCase bezi v transakcii), v produkcii je transakcia view BEGIN/COMMIT mimo dotazov
+SAVEPOINT = re.compile(r"^(RELEASE |ROLLBACK TO )?SAVEPOINT ")
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Každá URL z api.urls a accounts.urls zavolaná raz v rozpočte dotazov svojho view (QUERY_BUDGETS).
+    Počítajú sa aj on_commit callbacky, ktoré v produkcii bežia ešte v requeste. TestCase beží
+    v transakcii, index dostupnosti a snapshot katalógu sa preto nepoužijú (cesta cez DB = horná hranica).
+    Časový rozpočet len s QUERY_BUDGET_CHECK_TIMING=1 (python manage.py check_query_budgets --timing).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.fixtures = Fixtures()
+
+    def request(self, key, module, prefix, pattern):
+        spec = SPECS[key](self.fixtures)
+        url = prefix + reverse(pattern.name, urlconf=module, args=spec.get("args", []))
+        headers = {}
+        if spec.get("user"):
+            headers["HTTP_AUTHORIZATION"] = f"Bearer {RefreshToken.for_user(spec['user']).access_token}"
+        method = spec.get("method", "get")
+        client = self.client
+
+        with CaptureQueriesContext(connection) as captured, self.captureOnCommitCallbacks(execute=True):
+            started = time.perf_counter()
+            if method == "get":
+                response = client.get(url, spec.get("params"), **headers)
+            else:
+                response = getattr(client, method)(url, spec.get("data", {}), content_type="application/json", **headers)
+            if getattr(response, "streaming", False):
+                b"".join(response.streaming_content)
+        total_ms = (time.perf_counter() - started) * 1000
+        queries = [query["sql"] for query in captured if not SAVEPOINT.match(query["sql"])]
+        return url, response, queries, total_ms
+
+    def test_every_url_is_within_budget(self):
+        known = set()
+        for key, module, prefix, pattern in endpoints():
+            known.add(key)
+            if key in SKIP:
+                continue
+            with self.subTest(key):
+                self.assertIn(key, SPECS, "chýba request v SPECS (alebo dôvod v SKIP)")
+                url, response, queries, total_ms = self.request(key, module, prefix, pattern)
+                # chybova odpoved by merala len validaciu, nie skutocnu cestu endpointu
+                if response.status_code >= 400:
+                    self.fail(f"{url} -> {response.status_code} {response.content[:200]!r}")
+
+                budget = get_budget(view_name(resolve(url).func))
+                self.assertLessEqual(len(queries), budget["queries"], "\n".join(queries))
+                if settings.QUERY_BUDGET_CHECK_TIMING:
+                    self.assertLessEqual(total_ms, budget["ms"])
+
+        self.assertEqual(sorted((set(SPECS) | set(SKIP)) - known), [], "URL neexistuje")
+
+
+class QueryBudgetHelperTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.fixtures = Fixtures()
+
+    def get_activities(self):
+        token = RefreshToken.for_user(self.fixtures.student).access_token
+        return self.client.get("/api" + reverse("get_activities", urlconf=api_urls), HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def test_request_within_budget_passes(self):
+        with query_budget() as measurements:
+            self.assertEqual(self.get_activities().status_code, 200)
+
+        self.assertEqual([measurement.view for measurement in measurements], ["api.views.get_activities"])
+
+    @override_settings(QUERY_BUDGETS={"api.views.get_activities": {"queries": 0}})
+    def test_request_over_budget_fails(self):
+        with self.assertRaisesMessage(AssertionError, "api.views.get_activities"):
+            with self.assertLogs("app.query_budget", "WARNING"), query_budget():
+                self.get_activities()
+
+
+class WarmupTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        override = override_settings(CATALOG_SNAPSHOT_DIR=directory.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        catalog._snapshot = None
+        self.addCleanup(setattr, catalog, "_snapshot", None)
+
+    def test_warmup_maps_the_catalog_snapshot(self):
+        with self.assertLogs("app.warmup", "INFO"):
+            timings = warmup()
+
+        self.assertEqual(list(timings), ["resolver", "imports", "catalog", "databases"])
+        self.assertIsNotNone(catalog.get_snapshot())
+
+
+class ProfileStartupTests(SimpleTestCase):
+    def test_result_is_appended_to_history_and_checked_against_limit(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        history = os.path.join(directory.name, "startup.jsonl")
+
+        # --max-ms 0 zlyha az po zapise do historie
+        with self.assertRaisesMessage(CommandError, "povolené najviac 0 ms"):
+            call_command("profile_startup", runs=1, top=3, history=history, max_ms=0, stdout=StringIO())
+
+        with open(history, encoding="utf-8") as lines:
+            records = [json.loads(line) for line in lines]
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]["runs"], 1)
+        self.assertGreater(records[0]["boot_ms"], 0)
+        self.assertLessEqual(len(records[0]["top_imports"]), 3)
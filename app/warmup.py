@@ -0,0 +1,70 @@
+"""
+Zahriatie workera pred prvým requestom (voliteľné, WARMUP_ON_BOOT=1).
+
+Bez neho platí prvý request každého workera aj za import URLconf a všetkých views
+(DRF, serializéry, ...), namapovanie snapshotu katalógu a prvé pripojenie k DB. warmup() to urobí pri štarte:
+
+- načíta URLconf a naplní resolver (aj reverse() tabuľky),
+- naimportuje moduly z WARMUP_IMPORTS (napr. "api.heatmap" - NumPy sa inak načíta lenivo),
+- namapuje snapshot katalógu aktivít a rolí (api.catalog), ak na stroji chýba alebo je starý,
+  vytvorí ho s verziou z DB (requesty ho nikdy nepublikujú),
+- overí pripojenie ku každej DB (default aj replikám) jednoduchým dotazom; ak DB nie je
+  dostupná, worker spadne hneď pri štarte a nie pri prvom requeste.
+
+Spojenia v Django patria vláknu, takže warmup ich po overení zavrie - pri `gunicorn --preload`
+by sa inak otvorený socket zdieľal medzi forknutými workermi.
+"""
+
+import importlib
+import logging
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.urls import get_resolver
+
+logger = logging.getLogger(__name__)
+
+
+def _timed(timings, name, func):
+    started = time.perf_counter()
+    func()
+    timings[name] = round((time.perf_counter() - started) * 1000, 2)
+
+
+def prime_resolver():
+    resolver = get_resolver()
+    # reverse_dict naplni aj url_patterns -> import app.urls a vsetkych views
+    resolver.reverse_dict
+
+
+def prime_imports():
+    for module in getattr(settings, "WARMUP_IMPORTS", []):
+        importlib.import_module(module)
+
+
+def prime_catalog():
+    from api.catalog import get_snapshot, publish
+
+    if get_snapshot() is None:
+        publish(bump=False)
+        get_snapshot()
+
+
+def prime_databases():
+    for alias in settings.DATABASES:
+        connection = connections[alias]
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        connection.close()
+
+
+def warmup():
+    """Run all warmup steps; returns {step: milliseconds}."""
+    timings = {}
+    _timed(timings, "resolver", prime_resolver)
+    _timed(timings, "imports", prime_imports)
+    _timed(timings, "catalog", prime_catalog)
+    _timed(timings, "databases", prime_databases)
+    logger.info("Warmup done: %s", ", ".join(f"{name} {ms} ms" for name, ms in timings.items()))
+    return timings
@@ -9,8 +9,15 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
 application = get_wsgi_application()
+
+# volitelne zahriatie workera pred prvym requestom (app.warmup)
+if settings.WARMUP_ON_BOOT:
+    from app.warmup import warmup
+
+    warmup()
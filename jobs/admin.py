@@ -0,0 +1,14 @@
+from django.contrib import admin
+from django.contrib.admin import ModelAdmin
+from .models import Job
+
+
+class JobAdmin(ModelAdmin):
+    model = Job
+    list_display = ("id", "task", "status", "attempts", "run_at", "created_at", "finished_at")
+    list_filter = ("status", "task")
+    search_fields = ("=dedup_key",)
+    readonly_fields = ("created_at", "finished_at", "locked_at")
+
+
+admin.site.register(Job, JobAdmin)
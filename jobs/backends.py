@@ -0,0 +1,46 @@
+"""
+E-mail backend that does not send anything inside the request.
+
+Messages are serialized into the job queue (task 'jobs.send_email') and the
+worker delivers them through settings.JOBS_EMAIL_BACKEND (Mailgun in
+production), so djoser reset_password and other mails return immediately.
+"""
+
+import hashlib
+import json
+
+from django.core.mail.backends.base import BaseEmailBackend
+
+from .queue import enqueue
+
+
+def serialize_message(message):
+    return {
+        "subject": message.subject,
+        "body": message.body,
+        "from_email": message.from_email,
+        "to": list(message.to),
+        "cc": list(message.cc),
+        "bcc": list(message.bcc),
+        "reply_to": list(message.reply_to),
+        "headers": dict(message.extra_headers),
+        "alternatives": [[content, mimetype] for content, mimetype in getattr(message, "alternatives", [])],
+    }
+
+
+def dedup_key_for(payload):
+    # rovnaky mail tomu istemu adresatovi (napr. dvojklik na "zabudol som heslo") sa nezaradi dvakrat
+    digest = hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+    return f"email:{digest}"
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        count = 0
+        for message in email_messages:
+            if not message.recipients():
+                continue
+            payload = serialize_message(message)
+            enqueue("jobs.send_email", payload, dedup_key=dedup_key_for(payload))
+            count += 1
+        return count
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from jobs.queue import run_jobs, schedule_periodic
+
+
+class Command(BaseCommand):
+    help = "Worker pre databázovú frontu jobov (e-maily a iné pomalé veci mimo requestu)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Spracuje jednu dávku a skončí.")
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--sleep", type=float, default=2.0, help="Pauza v sekundách, keď je fronta prázdna.")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        self.stdout.write("Job worker spustený.")
+        # periodicke tasky (napr. suhrny obsadenosti) maju vzdy jeden cakajuci job
+        schedule_periodic()
+        try:
+            while True:
+                close_old_connections()
+                processed = run_jobs(batch_size)
+                if processed:
+                    self.stdout.write(f"Spracovaných jobov: {processed}")
+                if options["once"]:
+                    break
+                if not processed:
+                    time.sleep(options["sleep"])
+        except KeyboardInterrupt:
+            self.stdout.write("Job worker zastavený.")
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:07
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task', models.CharField(help_text="Meno registrovaného tasku, napr. 'jobs.send_email'.", max_length=100)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('dedup_key', models.CharField(blank=True, help_text='Kým je job aktívny, druhý job s rovnakým kľúčom sa nevytvorí.', max_length=200, null=True)),
+                ('status', models.CharField(choices=[('pending', 'Čaká'), ('running', 'Beží'), ('done', 'Hotovo'), ('failed', 'Zlyhalo')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('max_attempts', models.PositiveIntegerField(default=5)),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now, help_text='Najskorší čas spustenia (posúva sa pri retry).')),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'run_at'], name='jobs_job_status_run_at_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'running'])), fields=('dedup_key',), name='jobs_job_unique_active_dedup_key')],
+            },
+        ),
+    ]
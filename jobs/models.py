@@ -0,0 +1,39 @@
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+
+# job v databazovej fronte - spracuvava ho worker (python manage.py run_jobs), nie request
+class Job(models.Model):
+    class Status(models.TextChoices):
+        PENDING = "pending", "Čaká"
+        RUNNING = "running", "Beží"
+        DONE = "done", "Hotovo"
+        FAILED = "failed", "Zlyhalo"
+
+    task = models.CharField(max_length=100, help_text="Meno registrovaného tasku, napr. 'jobs.send_email'.")
+    payload = models.JSONField(default=dict, blank=True)
+    dedup_key = models.CharField(max_length=200, null=True, blank=True, help_text="Kým je job aktívny, druhý job s rovnakým kľúčom sa nevytvorí.")
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now, help_text="Najskorší čas spustenia (posúva sa pri retry).")
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "run_at"], name="jobs_job_status_run_at_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["dedup_key"],
+                condition=Q(status__in=["pending", "running"]),
+                name="jobs_job_unique_active_dedup_key",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.task} #{self.pk} ({self.status})"
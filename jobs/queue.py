@@ -0,0 +1,205 @@
+"""
+Lightweight database-backed job queue.
+
+Slow side effects (e-mail, notifications, ...) are stored as Job rows inside the
+request and executed later by the worker (python manage.py run_jobs), so the
+HTTP response does not wait for external services. No broker is required.
+
+Usage:
+    from jobs.queue import task, enqueue
+
+    @task("notifications.send_push")
+    def send_push(payload):
+        ...
+
+    enqueue("notifications.send_push", {"user_id": 1}, dedup_key="push:1")
+
+Batch tasks (@task(..., batch=True)) receive a list of payloads and return a
+list of per-payload errors (None for success), which lets the e-mail task reuse
+one SMTP/HTTP connection for many messages.
+
+Periodic tasks (@task(..., every=seconds)) always have exactly one active job.
+When it finishes, the next run is enqueued ``every`` seconds later with the
+payload the task returned (e.g. a cursor), or with the same payload if the task
+returned None or failed. The worker creates missing periodic jobs on start
+(schedule_periodic).
+"""
+
+import logging
+import traceback
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+_periodic = {}
+
+
+def task(name, batch=False, every=None):
+    """Register a function as a job task under ``name`` (periodic every ``every`` seconds)."""
+    def decorator(func):
+        _registry[name] = (func, batch)
+        if every is not None:
+            _periodic[name] = every
+        return func
+    return decorator
+
+
+def get_task(name):
+    return _registry.get(name)
+
+
+def enqueue(task_name, payload=None, dedup_key=None, run_at=None, max_attempts=None):
+    """
+    Store a job for the worker and return it.
+
+    If ``dedup_key`` is given and an active (pending/running) job with the same
+    key already exists, no new job is created and the existing one is returned.
+    """
+    fields = {
+        "task": task_name,
+        "payload": payload or {},
+        "dedup_key": dedup_key,
+        "run_at": run_at or timezone.now(),
+        "max_attempts": max_attempts or getattr(settings, "JOBS_MAX_ATTEMPTS", 5),
+    }
+
+    if dedup_key is None:
+        return Job.objects.create(**fields)
+
+    try:
+        with transaction.atomic():
+            return Job.objects.create(**fields)
+    except IntegrityError:
+        existing = Job.objects.filter(
+            dedup_key=dedup_key,
+            status__in=[Job.Status.PENDING, Job.Status.RUNNING],
+        ).first()
+        if existing is None:
+            # medzitym dobehol, skusime este raz
+            return Job.objects.create(**fields)
+        return existing
+
+
+def periodic_dedup_key(task_name):
+    return f"periodic:{task_name}"
+
+
+def schedule_periodic():
+    """Enqueue every periodic task that has no active job yet. Returns the active jobs."""
+    return [enqueue(name, dedup_key=periodic_dedup_key(name)) for name in _periodic]
+
+
+def retry_delay(attempts):
+    """Exponential backoff: base * 2^(attempts - 1), capped."""
+    base = getattr(settings, "JOBS_RETRY_BASE_SECONDS", 30)
+    cap = getattr(settings, "JOBS_RETRY_MAX_SECONDS", 3600)
+    return timedelta(seconds=min(cap, base * (2 ** max(attempts - 1, 0))))
+
+
+def release_stale_jobs():
+    """Return jobs stuck in RUNNING (worker died) back to the queue."""
+    timeout = getattr(settings, "JOBS_LOCK_TIMEOUT_SECONDS", 600)
+    cutoff = timezone.now() - timedelta(seconds=timeout)
+    return Job.objects.filter(status=Job.Status.RUNNING, locked_at__lt=cutoff).update(
+        status=Job.Status.PENDING, locked_at=None
+    )
+
+
+def claim_jobs(limit):
+    """
+    Claim up to ``limit`` due jobs for this worker.
+
+    Each job is claimed with a conditional UPDATE (status=pending -> running),
+    so several workers can run side by side without a broker or row locks.
+    """
+    now = timezone.now()
+    candidate_ids = list(
+        Job.objects.filter(status=Job.Status.PENDING, run_at__lte=now)
+        .order_by("run_at", "id")
+        .values_list("id", flat=True)[:limit]
+    )
+    claimed = []
+    for job_id in candidate_ids:
+        if Job.objects.filter(id=job_id, status=Job.Status.PENDING).update(status=Job.Status.RUNNING, locked_at=now):
+            claimed.append(job_id)
+    return list(Job.objects.filter(id__in=claimed).order_by("run_at", "id"))
+
+
+def _finish(job, error, result=None):
+    now = timezone.now()
+    job.attempts += 1
+    job.locked_at = None
+    if error is None:
+        job.status = Job.Status.DONE
+        job.finished_at = now
+        job.last_error = ""
+    elif job.attempts >= job.max_attempts:
+        job.status = Job.Status.FAILED
+        job.finished_at = now
+        job.last_error = error
+        logger.error(f"Job {job.pk} ({job.task}) failed permanently: {error}")
+    else:
+        job.status = Job.Status.PENDING
+        job.run_at = now + retry_delay(job.attempts)
+        job.last_error = error
+        logger.warning(f"Job {job.pk} ({job.task}) failed, retry #{job.attempts} at {job.run_at}: {error}")
+    job.save(update_fields=["attempts", "locked_at", "status", "finished_at", "last_error", "run_at"])
+
+    every = _periodic.get(job.task)
+    if every is not None and job.status != Job.Status.PENDING:
+        enqueue(
+            job.task,
+            job.payload if result is None else result,
+            dedup_key=periodic_dedup_key(job.task),
+            run_at=now + timedelta(seconds=every),
+        )
+
+
+def run_jobs(limit=100):
+    """Claim and execute one batch of due jobs. Returns number of processed jobs."""
+    release_stale_jobs()
+    jobs = claim_jobs(limit)
+
+    grouped = defaultdict(list)
+    for job in jobs:
+        grouped[job.task].append(job)
+
+    for task_name, task_jobs in grouped.items():
+        registered = get_task(task_name)
+        if registered is None:
+            for job in task_jobs:
+                _finish(job, f"Unknown task '{task_name}'.")
+            continue
+
+        func, batch = registered
+        if batch:
+            try:
+                errors = func([job.payload for job in task_jobs])
+                errors = [None] * len(task_jobs) if errors is None else list(errors)
+            except Exception:
+                errors = [traceback.format_exc()] * len(task_jobs)
+            if len(errors) != len(task_jobs):
+                # task vratil iny pocet vysledkov - nevieme, ktory job prebehol, ziadny nesmie ostat RUNNING
+                logger.error(f"Batch task '{task_name}' returned {len(errors)} results for {len(task_jobs)} jobs.")
+                errors = [f"Batch task returned {len(errors)} results for {len(task_jobs)} jobs."] * len(task_jobs)
+            for job, error in zip(task_jobs, errors):
+                _finish(job, error)
+        else:
+            for job in task_jobs:
+                result = None
+                try:
+                    result = func(job.payload)
+                    error = None
+                except Exception:
+                    error = traceback.format_exc()
+                _finish(job, error, result)
+
+    return len(jobs)
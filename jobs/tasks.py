@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+
+from .queue import task
+
+
+@task("jobs.send_email", batch=True)
+def send_email(payloads):
+    """Deliver queued e-mails over a single connection of the real backend."""
+    errors = []
+    connection = get_connection(settings.JOBS_EMAIL_BACKEND)
+    connection.open()
+    try:
+        for payload in payloads:
+            message = EmailMultiAlternatives(
+                subject=payload.get("subject", ""),
+                body=payload.get("body", ""),
+                from_email=payload.get("from_email"),
+                to=payload.get("to"),
+                cc=payload.get("cc"),
+                bcc=payload.get("bcc"),
+                reply_to=payload.get("reply_to"),
+                headers=payload.get("headers"),
+                connection=connection,
+            )
+            for content, mimetype in payload.get("alternatives", []):
+                message.attach_alternative(content, mimetype)
+            try:
+                message.send()
+                errors.append(None)
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+    finally:
+        connection.close()
+    return errors
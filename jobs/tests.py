@@ -0,0 +1,194 @@
+from datetime import timedelta
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .models import Job
+from .queue import enqueue, run_jobs, schedule_periodic, task
+
+calls = []
+
+
+@task("jobs.tests.failing")
+def failing(payload):
+    raise ValueError(payload.get("reason", "boom"))
+
+
+@task("jobs.tests.short_batch", batch=True)
+def short_batch(payloads):
+    # vrati o jeden vysledok menej, nez dostal payloadov
+    calls.append(len(payloads))
+    return [None] * (len(payloads) - 1)
+
+
+@task("jobs.tests.periodic", every=60)
+def periodic(payload):
+    if payload.get("fail"):
+        raise ValueError("boom")
+    return {"runs": payload.get("runs", 0) + 1}
+
+
+class FailingEmailBackend(EmailBackend):
+    """locmem backend, ktory odmietne adresata fail@..."""
+
+    def send_messages(self, messages):
+        if any(recipient.startswith("fail@") for message in messages for recipient in message.recipients()):
+            raise ConnectionError("Mailgun je nedostupný.")
+        return super().send_messages(messages)
+
+
+@override_settings(
+    EMAIL_BACKEND="jobs.backends.QueuedEmailBackend",
+    JOBS_EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+    JOBS_RETRY_BASE_SECONDS=30,
+)
+class QueuedEmailTests(TestCase):
+    def test_mail_is_sent_by_worker_not_in_request(self):
+        mail.send_mail("Reset hesla", "Odkaz: ...", "noreply@kp.sk", ["student@kp.sk"])
+
+        self.assertEqual(mail.outbox, [])
+        job = Job.objects.get()
+        self.assertEqual((job.task, job.status), ("jobs.send_email", Job.Status.PENDING))
+
+        self.assertEqual(run_jobs(), 1)
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, "Reset hesla")
+        self.assertEqual(mail.outbox[0].to, ["student@kp.sk"])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.Status.DONE, 1))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_same_mail_is_queued_once(self):
+        for _ in range(2):
+            mail.send_mail("Reset hesla", "Odkaz", "noreply@kp.sk", ["student@kp.sk"])
+
+        self.assertEqual(Job.objects.count(), 1)
+        run_jobs()
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_batch_of_mails_is_sent_in_one_run(self):
+        for index in range(3):
+            mail.send_mail(f"Správa {index}", "Text", "noreply@kp.sk", [f"user{index}@kp.sk"])
+
+        self.assertEqual(run_jobs(), 3)
+        self.assertEqual(sorted(message.subject for message in mail.outbox), ["Správa 0", "Správa 1", "Správa 2"])
+        self.assertFalse(Job.objects.exclude(status=Job.Status.DONE).exists())
+
+    @override_settings(JOBS_EMAIL_BACKEND="jobs.tests.FailingEmailBackend")
+    def test_failed_mail_is_retried_without_blocking_the_batch(self):
+        mail.send_mail("OK", "Text", "noreply@kp.sk", ["ok@kp.sk"])
+        mail.send_mail("Zlyhá", "Text", "noreply@kp.sk", ["fail@kp.sk"])
+
+        with self.assertLogs("jobs.queue", "WARNING"):
+            run_jobs()
+
+        self.assertEqual([message.subject for message in mail.outbox], ["OK"])
+        failed = Job.objects.get(payload__subject="Zlyhá")
+        self.assertEqual((failed.status, failed.attempts), (Job.Status.PENDING, 1))
+        self.assertIn("ConnectionError", failed.last_error)
+
+
+@override_settings(JOBS_RETRY_BASE_SECONDS=30, JOBS_RETRY_MAX_SECONDS=3600)
+class RetryTests(TestCase):
+    def test_failed_job_is_retried_with_exponential_backoff(self):
+        job = enqueue("jobs.tests.failing", {"reason": "timeout"}, max_attempts=5)
+
+        started = timezone.now()
+        with self.assertLogs("jobs.queue", "WARNING"):
+            run_jobs()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.Status.PENDING, 1))
+        self.assertIn("ValueError: timeout", job.last_error)
+        self.assertAlmostEqual((job.run_at - started).total_seconds(), 30, delta=5)
+
+        # pred run_at sa job nespusti
+        self.assertEqual(run_jobs(), 0)
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        started = timezone.now()
+        with self.assertLogs("jobs.queue", "WARNING"):
+            run_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.attempts, 2)
+        self.assertAlmostEqual((job.run_at - started).total_seconds(), 60, delta=5)
+
+    def test_job_fails_permanently_after_max_attempts(self):
+        job = enqueue("jobs.tests.failing", max_attempts=2)
+
+        with self.assertLogs("jobs.queue", "WARNING") as logs:
+            for _ in range(2):
+                Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+                run_jobs()
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.Status.FAILED, 2))
+        self.assertIsNotNone(job.finished_at)
+        self.assertIn("ValueError: boom", job.last_error)
+        self.assertIn("failed permanently", logs.output[-1])
+        # neuspesny job uz dedup kluc neblokuje
+        Job.objects.filter(pk=job.pk).update(dedup_key="failing")
+        self.assertNotEqual(enqueue("jobs.tests.failing", dedup_key="failing").pk, job.pk)
+
+    def test_unknown_task_is_not_left_running(self):
+        job = enqueue("jobs.tests.missing", max_attempts=1)
+
+        with self.assertLogs("jobs.queue", "ERROR"):
+            run_jobs()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.FAILED)
+        self.assertIn("Unknown task", job.last_error)
+
+    def test_batch_with_missing_results_retries_all_jobs(self):
+        calls.clear()
+        jobs = [enqueue("jobs.tests.short_batch", {"index": index}) for index in range(3)]
+
+        with self.assertLogs("jobs.queue", "WARNING") as logs:
+            run_jobs()
+
+        self.assertEqual(calls, [3])
+        self.assertIn("returned 2 results for 3 jobs", logs.output[0])
+        for job in jobs:
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), (Job.Status.PENDING, 1))
+            self.assertIn("returned 2 results for 3 jobs", job.last_error)
+
+    @override_settings(JOBS_LOCK_TIMEOUT_SECONDS=60)
+    def test_stale_running_job_is_released(self):
+        job = enqueue("jobs.tests.failing", max_attempts=1)
+        Job.objects.filter(pk=job.pk).update(status=Job.Status.RUNNING, locked_at=timezone.now() - timedelta(minutes=5))
+
+        with self.assertLogs("jobs.queue", "ERROR"):
+            run_jobs()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.FAILED)
+
+
+class PeriodicTaskTests(TestCase):
+    def active(self):
+        return Job.objects.get(task="jobs.tests.periodic", status=Job.Status.PENDING)
+
+    def test_next_run_gets_returned_payload(self):
+        schedule_periodic()
+        schedule_periodic()
+        self.assertEqual(self.active().payload, {})
+
+        started = timezone.now()
+        run_jobs()
+
+        job = self.active()
+        self.assertEqual(job.payload, {"runs": 1})
+        self.assertAlmostEqual((job.run_at - started).total_seconds(), 60, delta=5)
+        self.assertEqual(run_jobs(), 0)
+
+    def test_failed_periodic_task_is_rescheduled_with_same_payload(self):
+        enqueue("jobs.tests.periodic", {"fail": True, "runs": 3}, dedup_key="periodic:jobs.tests.periodic", max_attempts=1)
+
+        with self.assertLogs("jobs.queue", "ERROR"):
+            run_jobs()
+
+        self.assertEqual(self.active().payload, {"fail": True, "runs": 3})